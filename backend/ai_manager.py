@@ -3,18 +3,100 @@ AI Manager - Gemini AI 관리
 """
 
 import os
-from typing import List, Optional, AsyncGenerator, Dict
+import time
+import hashlib
+from typing import List, Optional, AsyncGenerator, Dict, Callable, Iterable, Any
 import asyncio
+import threading
+from history_window import HistoryWindow
+from metrics import REGISTRY, timed, record_stage
+from structured_logging import get_logger
+from client_registry import CLIENTS
+from single_flight import SingleFlight
+
+logger = get_logger("ai_manager")
 
 # Google Gemini
 try:
-    from google import genai
     from google.genai import types
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
 
 
+# 스트리밍 브리지 버퍼 크기 (가득 차면 생산 스레드가 소비를 기다림)
+STREAM_BUFFER_SIZE = int(os.getenv("GEMINI_STREAM_BUFFER", "32"))
+
+# 응답 생성 temperature
+GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
+# 이 값 이하의 (거의 결정적인) 일반 응답 호출은 같은 요청끼리 합쳐서 한 번만 호출
+SINGLE_FLIGHT_MAX_TEMPERATURE = float(os.getenv("GEMINI_SINGLE_FLIGHT_MAX_TEMPERATURE", "0.3"))
+
+_STREAM_DONE = object()
+
+MODEL_RETRIES = REGISTRY.counter("mate_model_retries_total", "Model calls retried after a transient error", ("mode",))
+MODEL_ERRORS = REGISTRY.counter("mate_model_errors_total", "Model calls that failed after all retries", ("mode",))
+
+
+class _StreamError:
+    """생산 스레드에서 발생한 예외를 이벤트 루프로 전달하기 위한 래퍼"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def iterate_in_thread(
+    make_iterator: Callable[[], Iterable[Any]],
+    max_buffered: int = STREAM_BUFFER_SIZE
+) -> AsyncGenerator[Any, None]:
+    """
+    동기 이터레이터를 전용 스레드에서 소비하고 asyncio.Queue로 전달
+
+    네트워크 읽기는 스레드에서 블로킹되므로 이벤트 루프는 다른 요청을 계속 처리한다.
+    큐가 가득 차면 생산 스레드가 대기하고(backpressure), 소비자가 중단하면 스레드도 종료된다.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return False
+
+    def produce():
+        try:
+            for item in make_iterator():
+                if stop.is_set() or not put(item):
+                    return
+            put(_STREAM_DONE)
+        except BaseException as e:
+            if not stop.is_set():
+                put(_StreamError(e))
+
+    threading.Thread(target=produce, name="gemini-stream", daemon=True).start()
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_DONE:
+                return
+            if isinstance(item, _StreamError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        # 대기 중인 put이 풀리도록 남은 버퍼 비우기
+        while not queue.empty():
+            queue.get_nowait()
+
+
 class AIManager:
     """Gemini AI 관리자"""
 
@@ -22,15 +104,24 @@ class AIManager:
         # API 키 로드
         self.gemini_key = os.getenv("GEMINI_API_KEY")
 
-        # 클라이언트 초기화
+        # 클라이언트 (프로세스 전역 연결 풀 공유)
         self.gemini_client = None
 
+        # 토큰 예산 기반 히스토리 윈도우 (오래된 턴은 누적 요약으로 접힘)
+        self.history_window = HistoryWindow(
+            token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "2000")),
+            summary_budget=int(os.getenv("HISTORY_SUMMARY_TOKENS", "400"))
+        )
+
         if GEMINI_AVAILABLE and self.gemini_key:
-            self.gemini_client = genai.Client(api_key=self.gemini_key)
-            print("✅ Google (Gemini) 연결 완료")
+            self.gemini_client = CLIENTS.gemini(self.gemini_key)
+            logger.info("Gemini 클라이언트 연결 완료")
         else:
             raise RuntimeError("Gemini API를 사용할 수 없습니다. GEMINI_API_KEY를 확인해주세요.")
 
+        # 동시에 들어온 같은 저온 요청 합치기
+        self.generate_flight = SingleFlight("gemini_generate")
+
     def get_available_ais(self) -> List[str]:
         """사용 가능한 AI 목록"""
         return ["Gemini"] if self.gemini_client else []
@@ -51,23 +142,19 @@ class AIManager:
         
         return ""
     
-    def format_history(self, history: List[dict], limit: int = 5) -> str:
-        """대화 히스토리 포맷팅"""
-        if not history:
-            return ""
-        
-        recent_history = history[-limit*3:]  # 최근 N개 대화
-        formatted = []
-        
-        for msg in recent_history:
-            if msg["type"] == "user":
-                formatted.append(f"User: {msg['message']}")
-            elif msg["type"] == "ai":
-                formatted.append(f"{msg['ai_name']}: {msg['message']}")
-        
-        if formatted:
-            return "\n\n<이전 대화>\n" + "\n".join(formatted) + "\n</이전 대화>\n"
-        return ""
+    def format_history(self, history: List[dict], limit: Optional[int] = None,
+                       conversation_key: str = "global") -> str:
+        """
+        대화 히스토리 포맷팅
+
+        최근 턴을 토큰 예산(HISTORY_TOKEN_BUDGET) 안에서 채우고, 밀려난 턴은 요약으로 유지한다.
+        limit이 주어지면 최근 limit*3개 항목 안에서만 고른다.
+        """
+        return self.history_window.format(
+            history,
+            conversation_key=conversation_key,
+            max_entries=limit * 3 if limit else None
+        )
     
     async def get_response(
         self,
@@ -76,9 +163,17 @@ class AIManager:
         context: Optional[str] = None,
         history: Optional[List[dict]] = None,
         file_search_context: Optional[dict] = None,
-        character_system_prompt: Optional[str] = None
+        character_system_prompt: Optional[str] = None,
+        cached_content: Optional[str] = None,
+        history_key: str = "global"
     ) -> str:
-        """AI 응답 생성"""
+        """
+        AI 응답 생성
+
+        cached_content(Gemini 컨텍스트 캐시 이름)가 주어지면 정적 시스템 프롬프트는 캐시에 있고,
+        character_system_prompt에는 턴마다 바뀌는 동적 계층만 담겨 있다.
+        history_key는 history가 속한 대화 샤드 키로, 샤드별 누적 요약을 따로 유지한다.
+        """
 
         # 프롬프트 구성
         full_message = message
@@ -102,10 +197,12 @@ class AIManager:
         if context:
             full_message += self.format_context(context)
         if history:
-            full_message = self.format_history(history) + full_message
+            with timed("history"):
+                full_message = self.format_history(history, conversation_key=history_key) + full_message
 
         if ai_name == "Gemini":
-            return await self._get_gemini_response(full_message, file_search_context, character_system_prompt)
+            with timed("model"):
+                return await self._get_gemini_response(full_message, file_search_context, character_system_prompt, cached_content)
         else:
             raise ValueError(f"Gemini만 지원됩니다. 요청된 AI: {ai_name}")
     
@@ -116,9 +213,11 @@ class AIManager:
         context: Optional[str] = None,
         history: Optional[List[dict]] = None,
         file_search_context: Optional[dict] = None,
-        character_system_prompt: Optional[str] = None
+        character_system_prompt: Optional[str] = None,
+        cached_content: Optional[str] = None,
+        history_key: str = "global"
     ) -> AsyncGenerator[str, None]:
-        """AI 응답 스트리밍"""
+        """AI 응답 스트리밍 (cached_content, history_key는 get_response와 동일)"""
 
         # 프롬프트 구성
         full_message = message
@@ -142,21 +241,88 @@ class AIManager:
         if context:
             full_message += self.format_context(context)
         if history:
-            full_message = self.format_history(history) + full_message
+            with timed("history"):
+                full_message = self.format_history(history, conversation_key=history_key) + full_message
 
         if ai_name == "Gemini":
-            async for chunk in self._get_gemini_response_stream(full_message, file_search_context, character_system_prompt):
-                yield chunk
+            with timed("model"):
+                async for chunk in self._get_gemini_response_stream(full_message, file_search_context, character_system_prompt, cached_content):
+                    yield chunk
         else:
             yield f"Gemini만 지원됩니다. 요청된 AI: {ai_name}"
 
     # ==================== Gemini ====================
 
-    async def _get_gemini_response(self, message: str, file_search_context: Optional[dict] = None, character_system_prompt: Optional[str] = None) -> str:
-        """Gemini 응답 (일반) - File Search Store 지원"""
+    def _gemini_request(
+        self,
+        message: str,
+        file_search_context: Optional[dict] = None,
+        character_system_prompt: Optional[str] = None,
+        cached_content: Optional[str] = None
+    ):
+        """Gemini 요청 (contents, config) 구성 - File Search Store / 컨텍스트 캐시 지원"""
+        if cached_content:
+            # 컨텍스트 캐시에 시스템 프롬프트와 File Search 도구가 포함되어 있음
+            # (캐시 사용 시 system_instruction/tools는 요청에 따로 넣을 수 없음)
+            contents = f"{character_system_prompt}\n\n{message}" if character_system_prompt else message
+            config = types.GenerateContentConfig(
+                temperature=GEMINI_TEMPERATURE,
+                max_output_tokens=3000,
+                cached_content=cached_content
+            )
+            return contents, config
+
+        # 캐릭터 시스템 프롬프트 사용 (제공되지 않으면 기본값)
+        system_instruction = character_system_prompt if character_system_prompt else "당신은 친절하고 도움이 되는 AI 어시스턴트입니다."
+
+        # File Search Store 활용 여부 판단
+        if file_search_context and file_search_context.get("store_name"):
+            store_name = file_search_context["store_name"]
+            # 캐릭터 채팅은 검색과 같은 범위(그 캐릭터의 문서)에서만 File Search
+            metadata_filter = file_search_context.get("metadata_filter")
+            logger.debug("File Search Store 사용", extra={"store": store_name, "scoped": bool(metadata_filter)})
+
+            # File Search Tool 설정
+            config = types.GenerateContentConfig(
+                temperature=GEMINI_TEMPERATURE,
+                max_output_tokens=3000,
+                system_instruction=system_instruction,
+                tools=[
+                    types.Tool(
+                        file_search=types.FileSearch(
+                            file_search_store_names=[store_name],
+                            metadata_filter=metadata_filter
+                        )
+                    )
+                ]
+            )
+        else:
+            # File Search 미사용 (일반 모드)
+            config = types.GenerateContentConfig(
+                temperature=GEMINI_TEMPERATURE,
+                max_output_tokens=3000,
+                system_instruction=system_instruction
+            )
+        return message, config
+
+    async def _get_gemini_response(self, message: str, file_search_context: Optional[dict] = None, character_system_prompt: Optional[str] = None, cached_content: Optional[str] = None) -> str:
+        """
+        Gemini 응답 (일반) - File Search Store 지원
+
+        temperature가 GEMINI_SINGLE_FLIGHT_MAX_TEMPERATURE 이하이면 전체 요청(프롬프트 + 설정)이
+        같은 진행 중 호출의 응답을 함께 받는다.
+        """
         if not self.gemini_client:
             return "Gemini를 사용할 수 없습니다. API 키를 확인해주세요."
 
+        contents, config = self._gemini_request(message, file_search_context, character_system_prompt, cached_content)
+        if config.temperature is not None and config.temperature <= SINGLE_FLIGHT_MAX_TEMPERATURE:
+            key = hashlib.sha256(f"{contents}\0{config.model_dump_json(exclude_none=True)}".encode()).hexdigest()
+            return await self.generate_flight.do(key, lambda: self._generate_with_retries(contents, config))
+        return await self._generate_with_retries(contents, config)
+
+    async def _generate_with_retries(self, contents: str, config) -> str:
+        """generate_content 호출 (일시적 오류는 지수 백오프로 재시도, 실패 시 오류 문자열 반환)"""
         max_retries = 3
         retry_delay = 2  # 초
 
@@ -164,48 +330,14 @@ class AIManager:
             try:
                 loop = asyncio.get_event_loop()
 
-                # 캐릭터 시스템 프롬프트 사용 (제공되지 않으면 기본값)
-                system_instruction = character_system_prompt if character_system_prompt else "당신은 친절하고 도움이 되는 AI 어시스턴트입니다."
-
-                # File Search Store 활용 여부 판단
-                if file_search_context and file_search_context.get("store_name"):
-                    store_name = file_search_context["store_name"]
-                    print(f"🔍 File Search Store 사용: {store_name}")
-
-                    # File Search Tool 설정
-                    response = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction,
-                                tools=[
-                                    types.Tool(
-                                        file_search=types.FileSearch(
-                                            file_search_store_names=[store_name]
-                                        )
-                                    )
-                                ]
-                            )
-                        )
-                    )
-                else:
-                    # File Search 미사용 (일반 모드)
-                    response = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction
-                            )
-                        )
+                response = await loop.run_in_executor(
+                    None,
+                    lambda: self.gemini_client.models.generate_content(
+                        model="gemini-2.5-flash",
+                        contents=contents,
+                        config=config
                     )
+                )
 
                 return response.text
             except Exception as e:
@@ -213,15 +345,21 @@ class AIManager:
                 # Rate limit, quota, 서버 오류 등에 대해 재시도
                 if any(keyword in error_msg.lower() for keyword in ["rate_limit", "quota", "timeout", "503", "502", "500", "429", "resource_exhausted"]):
                     if attempt < max_retries - 1:
-                        print(f"⚠️ Gemini API 오류, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
+                        logger.warning("Gemini API 오류, 재시도", extra={
+                            "mode": "generate", "attempt": attempt + 1, "max_retries": max_retries,
+                            "retry_in": retry_delay, "error": error_msg[:200]
+                        })
+                        MODEL_RETRIES.inc(mode="generate")
                         await asyncio.sleep(retry_delay)
                         retry_delay *= 2  # 지수 백오프
                         continue
+                MODEL_ERRORS.inc(mode="generate")
+                logger.error("Gemini 응답 실패", extra={"mode": "generate", "error": error_msg[:200]})
                 return f"Gemini 오류: {error_msg}"
 
         return "Gemini가 현재 응답할 수 없습니다. 잠시 후 다시 시도해주세요."
     
-    async def _get_gemini_response_stream(self, message: str, file_search_context: Optional[dict] = None, character_system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+    async def _get_gemini_response_stream(self, message: str, file_search_context: Optional[dict] = None, character_system_prompt: Optional[str] = None, cached_content: Optional[str] = None) -> AsyncGenerator[str, None]:
         """Gemini 응답 (스트리밍) - File Search Store 지원"""
         if not self.gemini_client:
             yield "Gemini를 사용할 수 없습니다."
@@ -229,68 +367,43 @@ class AIManager:
 
         max_retries = 3
         retry_delay = 2  # 초
+        started = time.perf_counter()  # TTFT는 재시도 대기까지 포함해 첫 청크까지 측정
 
         for attempt in range(max_retries):
             try:
-                loop = asyncio.get_event_loop()
-
-                # 캐릭터 시스템 프롬프트 사용 (제공되지 않으면 기본값)
-                system_instruction = character_system_prompt if character_system_prompt else "당신은 친절하고 도움이 되는 AI 어시스턴트입니다."
-
-                # File Search Store 활용 여부 판단
-                if file_search_context and file_search_context.get("store_name"):
-                    store_name = file_search_context["store_name"]
-                    print(f"🔍 File Search Store 사용 (스트리밍): {store_name}")
-
-                    # File Search Tool 설정
-                    stream = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content_stream(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction,
-                                tools=[
-                                    types.Tool(
-                                        file_search=types.FileSearch(
-                                            file_search_store_names=[store_name]
-                                        )
-                                    )
-                                ]
-                            )
-                        )
-                    )
-                else:
-                    # File Search 미사용 (일반 모드)
-                    stream = await loop.run_in_executor(
-                        None,
-                        lambda: self.gemini_client.models.generate_content_stream(
-                            model="gemini-2.5-flash",
-                            contents=message,
-                            config=types.GenerateContentConfig(
-                                temperature=0.7,
-                                max_output_tokens=3000,
-                                system_instruction=system_instruction
-                            )
-                        )
+                contents, config = self._gemini_request(message, file_search_context, character_system_prompt, cached_content)
+
+                # 스트림 생성과 소비 모두 전용 스레드에서 수행
+                def make_stream():
+                    return self.gemini_client.models.generate_content_stream(
+                        model="gemini-2.5-flash",
+                        contents=contents,
+                        config=config
                     )
 
-                for chunk in stream:
+                first_chunk = True
+                async for chunk in iterate_in_thread(make_stream):
                     if chunk.text:
+                        if first_chunk:
+                            record_stage("model_ttft", time.perf_counter() - started)
+                            first_chunk = False
                         yield chunk.text
-                        await asyncio.sleep(0.01)
                 return  # 성공 시 종료
             except Exception as e:
                 error_msg = str(e)
                 # Rate limit, quota, 서버 오류 등에 대해 재시도
                 if any(keyword in error_msg.lower() for keyword in ["rate_limit", "quota", "timeout", "503", "502", "500", "429", "resource_exhausted"]):
                     if attempt < max_retries - 1:
-                        print(f"⚠️ Gemini API 오류, {retry_delay}초 후 재시도 ({attempt + 1}/{max_retries})")
+                        logger.warning("Gemini API 오류, 재시도", extra={
+                            "mode": "stream", "attempt": attempt + 1, "max_retries": max_retries,
+                            "retry_in": retry_delay, "error": error_msg[:200]
+                        })
+                        MODEL_RETRIES.inc(mode="stream")
                         await asyncio.sleep(retry_delay)
                         retry_delay *= 2  # 지수 백오프
                         continue
+                MODEL_ERRORS.inc(mode="stream")
+                logger.error("Gemini 응답 실패", extra={"mode": "stream", "error": error_msg[:200]})
                 yield f"Gemini 오류: {error_msg}"
                 return
 
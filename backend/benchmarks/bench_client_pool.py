@@ -0,0 +1,216 @@
+"""
+Client Pool Benchmark - 리서치 루프의 검색 호출별 연결 설정 비용 측정
+
+로컬 가짜 Perplexity 서버(HTTP/1.1 keep-alive)에 리서치 루프(검색 → 분석 대기 → 재검색)를
+세션 여러 개로 동시에 돌리면서 두 방식을 비교한다.
+  - per_call: 검색마다 httpx.AsyncClient를 새로 만드는 기존 방식 (SSL 컨텍스트 로드 + 새 연결)
+  - pooled:   client_registry의 풀 설정으로 만든 공유 클라이언트 (keep-alive 재사용)
+
+새 연결마다 --connect-delay 만큼 서버가 첫 응답을 늦춰 TCP/TLS 핸드셰이크 왕복을 흉내 낸다.
+서버가 받은 연결 수와 호출 지연(p50/p95)을 출력하므로, pooled에서는 연결 수가
+동시 세션 수 수준으로 줄고 호출 지연에서 연결 설정 비용이 빠지는 것을 확인할 수 있다.
+
+--url을 주면 가짜 서버 대신 실제 엔드포인트로 보낸다 (인증 없이 보내므로 401이어도
+연결 설정 비용은 그대로 측정되며, 이때 연결 수는 표시하지 않음).
+
+사용법 (backend 디렉터리에서):
+    python benchmarks/bench_client_pool.py --sessions 8 --iterations 3 --connect-delay 0.05
+    python benchmarks/bench_client_pool.py --url https://api.perplexity.ai/chat/completions --sessions 2
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client_registry import pooled_client_args, pool_limits, http2_enabled  # noqa: E402
+
+FAKE_RESPONSE = json.dumps({
+    "choices": [{"message": {"content": "검색 결과 본문"}}],
+    "citations": ["https://example.com/a", "https://example.com/b"],
+    "related_questions": ["관련 질문"],
+    "model": "sonar"
+}).encode()
+
+
+class FakePerplexityServer:
+    """연결 수를 세는 최소 HTTP/1.1 keep-alive 서버"""
+
+    def __init__(self, connect_delay: float, response_delay: float):
+        self.connect_delay = connect_delay
+        self.response_delay = response_delay
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/chat/completions"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def reset(self):
+        self.connections = 0
+        self.requests = 0
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        first = True
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                if length:
+                    await reader.readexactly(length)
+
+                # 새 연결의 첫 요청은 핸드셰이크 왕복만큼 늦게 응답
+                await asyncio.sleep(self.response_delay + (self.connect_delay if first else 0.0))
+                first = False
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: keep-alive\r\n"
+                    + f"Content-Length: {len(FAKE_RESPONSE)}\r\n\r\n".encode() + FAKE_RESPONSE
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def make_payload(query: str) -> dict:
+    return {
+        "model": "sonar",
+        "messages": [{"role": "user", "content": query}],
+        "search_recency_filter": "month",
+        "temperature": 0.2
+    }
+
+
+async def search_per_call(url: str, query: str) -> int:
+    """기존 perplexity_search: 호출마다 새 클라이언트"""
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        response = await client.post(url, headers={"Content-Type": "application/json"}, json=make_payload(query))
+        return response.status_code
+
+
+def make_search_pooled(client: httpx.AsyncClient):
+    async def search(url: str, query: str) -> int:
+        response = await client.post(url, headers={"Content-Type": "application/json"}, json=make_payload(query))
+        return response.status_code
+    return search
+
+
+async def research_session(search, url: str, session: int, iterations: int, analyze_delay: float,
+                           latencies: list):
+    """리서치 루프 한 번 (검색 사이에 Gemini 분석 시간만큼 대기)"""
+    for iteration in range(iterations):
+        started = time.perf_counter()
+        await search(url, f"세션 {session} 검색 {iteration}")
+        latencies.append((iteration, time.perf_counter() - started))
+        await asyncio.sleep(analyze_delay)
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+async def run(label: str, search, url: str, args, server) -> dict:
+    if server:
+        server.reset()
+    latencies: list = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        research_session(search, url, session, args.iterations, args.analyze_delay, latencies)
+        for session in range(args.sessions)
+    ))
+    wall = time.perf_counter() - started
+
+    # 첫 검색(연결 설정 포함)과 이후 검색을 나눠서 표시
+    first = [latency for iteration, latency in latencies if iteration == 0]
+    rest = [latency for iteration, latency in latencies if iteration > 0]
+    latencies = first + rest
+    result = {
+        "mode": label,
+        "calls": len(latencies),
+        "connections": server.connections if server else None,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "repeat_p50_ms": round(percentile(rest, 0.5) * 1000, 1) if rest else None,
+        "first_p50_ms": round(percentile(first, 0.5) * 1000, 1),
+        "wall_s": round(wall, 2)
+    }
+    connections = "-" if result["connections"] is None else result["connections"]
+    print(f"{label:<9} calls={result['calls']:<4} connections={connections!s:<4} "
+          f"p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms "
+          f"repeat p50={result['repeat_p50_ms'] or 0:7.1f}ms wall={wall:6.2f}s")
+    return result
+
+
+async def main_async(args) -> list:
+    server = None
+    url = args.url
+    if not url:
+        server = FakePerplexityServer(args.connect_delay, args.response_delay)
+        url = await server.start()
+
+    limits = pool_limits()
+    print(f"pool: max_connections={limits.max_connections} keepalive={limits.max_keepalive_connections} "
+          f"expiry={limits.keepalive_expiry}s http2={http2_enabled()}")
+
+    results = [await run("per_call", search_per_call, url, args, server)]
+
+    client = httpx.AsyncClient(timeout=60.0, **pooled_client_args())
+    try:
+        results.append(await run("pooled", make_search_pooled(client), url, args, server))
+    finally:
+        await client.aclose()
+
+    if server:
+        await server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8, help="동시 리서치 세션 수")
+    parser.add_argument("--iterations", type=int, default=3, help="세션당 검색 횟수 (그래프 최대 3회)")
+    parser.add_argument("--analyze-delay", type=float, default=0.2, help="검색 사이 분석 시간(초)")
+    parser.add_argument("--connect-delay", type=float, default=0.05, help="새 연결의 핸드셰이크 지연(초)")
+    parser.add_argument("--response-delay", type=float, default=0.01, help="서버 응답 지연(초)")
+    parser.add_argument("--url", default=None, help="가짜 서버 대신 보낼 실제 엔드포인트")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    per_call, pooled = results
+    if per_call["connections"] is not None:
+        print(f"connections: {per_call['connections']} → {pooled['connections']}")
+    if per_call["repeat_p50_ms"] and pooled["repeat_p50_ms"] is not None:
+        print(f"repeat search p50: {per_call['repeat_p50_ms']}ms → {pooled['repeat_p50_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
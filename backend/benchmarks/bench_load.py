@@ -0,0 +1,638 @@
+"""
+Load Benchmark - 가짜 genai 클라이언트로 FastAPI 백엔드 부하/지연 측정 (API 할당량 사용 안 함)
+
+AIManager / FileSearchManager / 프롬프트 캐시의 genai 클라이언트를 TTFT, 초당 토큰 수,
+오류율을 조절할 수 있는 가짜 클라이언트로 바꾸고, ASGI 앱을 프로세스 안에서 직접 호출해
+시나리오별로 동시 요청을 보낸다. 응답 본문 청크가 도착하는 시점을 그대로 기록하므로
+SSE 엔드포인트의 TTFT(첫 텍스트 청크까지 걸린 시간)도 측정된다.
+
+측정 항목: 지연 p50/p95/p99/max, SSE TTFT, 처리량(req/s), 오류 수, 프로세스 RSS.
+결과는 JSON으로 저장되며 --compare로 이전 결과와 비교할 수 있다.
+
+시나리오:
+    chat              POST /api/chat
+    chat_stream       POST /api/chat/stream (SSE)
+    character_chat    POST /api/character/{id}/chat
+    character_stream  POST /api/character/{id}/chat/stream (SSE)
+    upload            POST /api/upload?wait=true (인덱싱 완료까지)
+    resumable_upload  POST /api/uploads → PUT 본문 → POST complete?wait=true (세 호출 합산)
+
+사용법 (backend 디렉터리에서):
+    python benchmarks/bench_load.py --requests 200 --concurrency 20 --ttft 0.3 --tokens-per-sec 80
+    python benchmarks/bench_load.py --scenarios chat_stream --error-rate 0.05 --output after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import mimetypes
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+SCENARIOS = ("chat", "chat_stream", "character_chat", "character_stream", "upload", "resumable_upload")
+
+
+# ==================== 가짜 genai 클라이언트 ====================
+
+class FakeAPIError(Exception):
+    """재시도 대상 서버 오류 (ai_manager의 재시도 키워드에 걸리도록 503 포함)"""
+
+
+class FakeModels:
+    def __init__(self, client: "FakeGenaiClient"):
+        self.client = client
+
+    def generate_content(self, model: str, contents: Any, config: Any = None):
+        self.client.maybe_fail()
+        time.sleep(self.client.ttft + self.client.response_tokens / self.client.tokens_per_sec)
+        return SimpleNamespace(text=self.client.text(self.client.response_tokens))
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None):
+        client = self.client
+        client.maybe_fail()
+        time.sleep(client.ttft)
+        sent = 0
+        while sent < client.response_tokens:
+            n = min(client.chunk_tokens, client.response_tokens - sent)
+            if sent:
+                time.sleep(n / client.tokens_per_sec)
+            sent += n
+            yield SimpleNamespace(text=client.text(n))
+
+    def embed_content(self, model: str, contents: List[str], config: Any = None):
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[random.random() for _ in range(8)])
+                                           for _ in contents])
+
+
+class FakeFileSearchStores:
+    def __init__(self, client: "FakeGenaiClient"):
+        self.client = client
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def create(self, config: Any = None):
+        return SimpleNamespace(name="fileSearchStores/bench")
+
+    def get(self, name: str):
+        return SimpleNamespace(name=name)
+
+    def upload_to_file_search_store(self, file: str, file_search_store_name: str, config: Any = None):
+        # 실제 SDK처럼 mime_type이 없으면 파일 경로의 확장자로 추정하고, 실패하면 거부
+        mime_type = (config or {}).get('mime_type') if isinstance(config, dict) else getattr(config, 'mime_type', None)
+        if not mime_type and not mimetypes.guess_type(file)[0]:
+            raise ValueError(f"Unknown mime type: Could not determine the mimetype for your file {file}")
+        with self._lock:
+            self._counter += 1
+            document_name = f"{file_search_store_name}/documents/bench-{self._counter}"
+        time.sleep(self.client.upload_delay)
+        return SimpleNamespace(
+            name=f"operations/{self._counter}",
+            done=False,
+            ready_at=time.monotonic() + self.client.index_delay,
+            response=SimpleNamespace(document_name=document_name)
+        )
+
+
+class FakeOperations:
+    def get(self, operation):
+        operation.done = time.monotonic() >= operation.ready_at
+        return operation
+
+
+class FakeFiles:
+    def delete(self, name: str):
+        return None
+
+
+class FakeCaches:
+    def create(self, model: str, config: Any = None):
+        return SimpleNamespace(name=f"cachedContents/bench-{random.getrandbits(32):08x}")
+
+    def delete(self, name: str):
+        return None
+
+
+class FakeGenaiClient:
+    """
+    genai.Client 대역 (동기 SDK처럼 호출 스레드를 블로킹)
+
+    Args:
+        ttft: 첫 토큰까지 지연(초)
+        tokens_per_sec: 첫 토큰 이후 생성 속도
+        response_tokens: 응답당 토큰 수
+        chunk_tokens: 스트리밍 청크당 토큰 수
+        error_rate: 요청이 503으로 실패할 확률
+        upload_delay: 파일 업로드 요청 지연(초)
+        index_delay: 업로드 후 인덱싱 완료까지 걸리는 시간(초)
+    """
+
+    def __init__(self, ttft: float = 0.3, tokens_per_sec: float = 80.0, response_tokens: int = 120,
+                 chunk_tokens: int = 8, error_rate: float = 0.0, upload_delay: float = 0.05,
+                 index_delay: float = 0.5, seed: Optional[int] = None):
+        self.ttft = ttft
+        self.tokens_per_sec = max(tokens_per_sec, 1e-3)
+        self.response_tokens = max(1, response_tokens)
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.error_rate = error_rate
+        self.upload_delay = upload_delay
+        self.index_delay = index_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+        self.models = FakeModels(self)
+        self.file_search_stores = FakeFileSearchStores(self)
+        self.operations = FakeOperations()
+        self.files = FakeFiles()
+        self.caches = FakeCaches()
+
+    def maybe_fail(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.failures += 1
+        if failed:
+            time.sleep(self.ttft)
+            raise FakeAPIError("503 UNAVAILABLE: fake overload")
+
+    def text(self, tokens: int) -> str:
+        return "토큰 " * tokens
+
+
+# ==================== ASGI 직접 호출 ====================
+
+class Sample:
+    def __init__(self):
+        self.status = 0
+        self.latency = 0.0
+        self.ttft: Optional[float] = None
+        self.error: Optional[str] = None
+        self.body = b""
+
+
+def is_text_chunk(body: bytes) -> bool:
+    return b'"type": "chunk"' in body or b'"type":"chunk"' in body
+
+
+async def asgi_call(app, method: str, path: str, body: bytes = b"",
+                    headers: Optional[Dict[str, str]] = None, stream: bool = False) -> Sample:
+    """
+    ASGI 앱에 요청 한 건을 보내고 응답 청크 도착 시각을 기록
+
+    httpx.ASGITransport는 응답 본문을 끝까지 모은 뒤 돌려주므로 TTFT를 잴 수 없어 직접 호출한다.
+    """
+    sample = Sample()
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    chunks: List[bytes] = []
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sample.status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk:
+                chunks.append(chunk)
+                if stream and sample.ttft is None and is_text_chunk(chunk):
+                    sample.ttft = time.perf_counter() - started
+            if not message.get("more_body", False):
+                response_done.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception as e:
+        sample.error = f"{type(e).__name__}: {e}"
+    finally:
+        response_done.set()
+    sample.latency = time.perf_counter() - started
+
+    sample.body = b"".join(chunks)
+    if sample.error is None and sample.status >= 400:
+        sample.error = f"HTTP {sample.status}"
+    elif sample.error is None and stream and b'"type": "error"' in sample.body:
+        sample.error = "SSE error event"
+    return sample
+
+
+def json_request(payload: Dict[str, Any]) -> tuple:
+    return json.dumps(payload).encode(), {"content-type": "application/json"}
+
+
+def multipart_request(url: str, files=None, data=None) -> tuple:
+    """httpx로 multipart 본문과 헤더만 만들어 씀"""
+    request = httpx.Request("POST", url, files=files, data=data)
+    return request.read(), dict(request.headers)
+
+
+# ==================== 측정 ====================
+
+def current_rss_mb() -> Optional[float]:
+    if psutil:
+        return psutil.Process().memory_info().rss / MB
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def rounded_rss_mb() -> Optional[float]:
+    rss = current_rss_mb()
+    return round(rss, 1) if rss is not None else None
+
+
+class RSSSampler:
+    """실행 중 RSS 최대값 추적"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            rss = current_rss_mb()
+            if rss is not None:
+                self.peak = max(self.peak or 0.0, rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak = max(self.peak or 0.0, rss)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 2) if value is not None else None
+
+
+def summarize(samples: List[Sample], wall: float) -> Dict[str, Any]:
+    ok = [s for s in samples if s.error is None]
+    latencies = [s.latency for s in ok]
+    ttfts = [s.ttft for s in ok if s.ttft is not None]
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+
+    summary = {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "failed": len(samples) - len(ok),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(max(latencies)) if latencies else None,
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None
+        }
+    }
+    if ttfts:
+        summary["ttft_ms"] = {
+            "p50": ms(percentile(ttfts, 0.50)),
+            "p95": ms(percentile(ttfts, 0.95)),
+            "p99": ms(percentile(ttfts, 0.99))
+        }
+    return summary
+
+
+# ==================== 시나리오 ====================
+
+MESSAGES = [
+    "오늘 날씨 어때?", "주말에 뭐 할까?", "좋아하는 음식이 뭐야?", "요즘 읽는 책 있어?",
+    "업로드한 문서 요약해줘", "어제 했던 얘기 기억나?", "영화 추천해줘", "기분이 좀 안 좋아",
+]
+
+
+def upload_content(i: int, upload_kb: int) -> bytes:
+    # 요청마다 내용이 달라야 중복 제거로 인덱싱이 생략되지 않음
+    line = f"벤치마크 문서 {i} {random.getrandbits(64):016x}\n".encode()
+    return (line * (upload_kb * 1024 // len(line) + 1))[:upload_kb * 1024]
+
+
+def build_request(scenario: str, i: int, character_id: Optional[str], sessions: int,
+                  upload_kb: int) -> tuple:
+    """시나리오별 (method, path, body, headers, stream)"""
+    message = f"{MESSAGES[i % len(MESSAGES)]} ({i % 50})"
+    session_id = f"bench-{i % sessions}"
+
+    if scenario == "chat":
+        body, headers = json_request({"message": message, "session_id": session_id})
+        return "POST", "/api/chat", body, headers, False
+    if scenario == "chat_stream":
+        body, headers = json_request({"message": message, "session_id": session_id})
+        return "POST", "/api/chat/stream", body, headers, True
+    if scenario == "character_chat":
+        body, headers = json_request({"message": message, "session_id": session_id})
+        return "POST", f"/api/character/{character_id}/chat", body, headers, False
+    if scenario == "character_stream":
+        body, headers = json_request({"message": message, "session_id": session_id})
+        return "POST", f"/api/character/{character_id}/chat/stream", body, headers, True
+    if scenario == "upload":
+        body, headers = multipart_request(
+            "http://bench/api/upload", files={"file": (f"bench_{i}.txt", upload_content(i, upload_kb), "text/plain")}
+        )
+        return "POST", "/api/upload?wait=true", body, headers, False
+    raise ValueError(f"알 수 없는 시나리오: {scenario}")
+
+
+async def resumable_upload(app, i: int, upload_kb: int) -> Sample:
+    """이어 올리기 세션 생성 → 본문 전송 → 완료(인덱싱까지 대기)를 한 샘플로 측정"""
+    started = time.perf_counter()
+    content = upload_content(i, upload_kb)
+    body, headers = json_request({"filename": f"bench_resumable_{i}.txt", "total_size": len(content)})
+    sample = await asgi_call(app, "POST", "/api/uploads", body, headers)
+    if sample.error is None:
+        upload_id = json.loads(sample.body)["upload_id"]
+        sample = await asgi_call(app, "PUT", f"/api/uploads/{upload_id}", content,
+                                 {"upload-offset": "0", "content-type": "application/octet-stream"})
+        if sample.error is None:
+            sample = await asgi_call(app, "POST", f"/api/uploads/{upload_id}/complete?wait=true")
+    sample.latency = time.perf_counter() - started
+    return sample
+
+
+async def create_character(app) -> str:
+    body, headers = multipart_request("http://bench/api/character/create", data={
+        "name": "벤치",
+        "gender": "female",
+        "age": "25",
+        "personality": json.dumps(["밝음", "친절함"]),
+        "backstory": "부하 테스트용 캐릭터",
+        "speechStyle": "반말",
+        "interests": json.dumps(["음악", "여행"]),
+    })
+    sample = await asgi_call(app, "POST", "/api/character/create", body, headers)
+    if sample.error:
+        raise RuntimeError(f"캐릭터 생성 실패: {sample.error}")
+    return json.loads(sample.body)["character_id"]
+
+
+async def run_scenario(app, scenario: str, requests: int, concurrency: int,
+                       character_id: Optional[str], sessions: int, upload_kb: int) -> Dict[str, Any]:
+    samples: List[Sample] = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            if scenario == "resumable_upload":
+                samples.append(await resumable_upload(app, i, upload_kb))
+                continue
+            method, path, body, headers, stream = build_request(scenario, i, character_id, sessions, upload_kb)
+            samples.append(await asgi_call(app, method, path, body, headers, stream))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, requests)))))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def check_history_shards(main_module) -> List[str]:
+    """
+    메모리 샤드가 저장소의 최근 항목과 같은지 확인 (다른 샤드 키 목록 반환)
+
+    새 세션의 첫 턴은 샤드가 메모리에 없는 상태에서 기록되므로 복원 경로의 중복/누락도 여기서 드러난다.
+    """
+    def turn(entry: Dict[str, Any]) -> tuple:
+        return entry["type"], entry.get("ai_name"), entry.get("message"), entry["timestamp"]
+
+    shards = main_module.conversation_shards
+    mismatched = []
+    for session_id, character_id in list(shards._shards):
+        in_memory = [turn(e) for e in shards.get(session_id, character_id)]
+        stored = [turn(e) for e in main_module.history_store.recent_in_shard(session_id, character_id, shards.max_turns)]
+        if in_memory != stored:
+            mismatched.append(main_module.shard_key_name(session_id, character_id))
+    return mismatched
+
+
+def install_fake_clients(main_module, fake: FakeGenaiClient):
+    """앱의 모든 genai 클라이언트를 가짜 클라이언트로 교체"""
+    main_module.ai_manager.gemini_client = fake
+    main_module.file_search_manager.client = fake
+    if main_module.prompt_builder.cache_client is not None:
+        main_module.prompt_builder.cache_client = fake
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    import main
+
+    fake = FakeGenaiClient(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        response_tokens=args.response_tokens,
+        chunk_tokens=args.chunk_tokens,
+        error_rate=args.error_rate,
+        upload_delay=args.upload_delay,
+        index_delay=args.index_delay,
+        seed=args.seed
+    )
+    install_fake_clients(main, fake)
+    app = main.app
+
+    results: Dict[str, Any] = {}
+    rss_start = current_rss_mb()
+    sampler = RSSSampler()
+    sampler.start()
+
+    async with app.router.lifespan_context(app):
+        character_id = None
+        if {"character_chat", "character_stream"} & set(args.scenarios):
+            character_id = await create_character(app)
+
+        for scenario in args.scenarios:
+            calls_before = fake.calls
+            summary = await run_scenario(app, scenario, args.requests, args.concurrency,
+                                         character_id, args.sessions, args.upload_kb)
+            summary["model_calls"] = fake.calls - calls_before
+            summary["rss_mb"] = rounded_rss_mb()
+            results[scenario] = summary
+            print_summary(scenario, summary)
+
+        mismatched_shards = check_history_shards(main)
+        # 업로드가 모두 끝났으면 해시별 업로드 잠금도 모두 정리되어 있어야 함
+        upload_locks_left = len(main.file_search_manager._upload_locks)
+
+    await sampler.stop()
+    return {
+        "scenarios": results,
+        "process": {
+            "rss_start_mb": round(rss_start, 1) if rss_start is not None else None,
+            "rss_end_mb": rounded_rss_mb(),
+            "rss_peak_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+            "fake_model_calls": fake.calls,
+            "fake_model_failures": fake.failures
+        },
+        "history_shard_mismatches": mismatched_shards,
+        "upload_locks_left": upload_locks_left
+    }
+
+
+# ==================== 출력 ====================
+
+def print_summary(scenario: str, summary: Dict[str, Any]):
+    latency = summary["latency_ms"]
+    line = (f"{scenario:<17} n={summary['requests']:<5} fail={summary['failed']:<4} "
+            f"{summary['throughput_rps'] or 0:7.2f} req/s  "
+            f"p50={latency['p50'] or 0:8.1f}ms p95={latency['p95'] or 0:8.1f}ms p99={latency['p99'] or 0:8.1f}ms")
+    if "ttft_ms" in summary:
+        line += f"  ttft p50={summary['ttft_ms']['p50']:7.1f}ms p95={summary['ttft_ms']['p95']:7.1f}ms"
+    print(line)
+
+
+def print_comparison(current: Dict[str, Any], previous: Dict[str, Any]):
+    """이전 결과 대비 변화 (지연은 낮을수록, 처리량은 높을수록 좋음)"""
+    print(f"\n📊 비교 기준: {previous.get('git_commit') or '?'} ({previous.get('timestamp', '?')})")
+    for scenario, summary in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        parts = []
+        for section in ("latency_ms", "ttft_ms"):
+            for key in ("p50", "p95", "p99"):
+                new, old = summary.get(section, {}).get(key), before.get(section, {}).get(key)
+                if new is not None and old:
+                    label = "ttft_" + key if section == "ttft_ms" else key
+                    parts.append(f"{label} {(new - old) / old * 100:+.1f}%")
+        new, old = summary.get("throughput_rps"), before.get("throughput_rps")
+        if new is not None and old:
+            parts.append(f"rps {(new - old) / old * 100:+.1f}%")
+        print(f"{scenario:<17} " + "  ".join(parts))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"쉼표로 구분한 시나리오 ({', '.join(SCENARIOS)})")
+    parser.add_argument("--requests", type=int, default=100, help="시나리오당 요청 수")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=20, help="요청을 나눠 담을 세션 수")
+    parser.add_argument("--ttft", type=float, default=0.3, help="가짜 모델 첫 토큰 지연(초)")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--chunk-tokens", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="모델 호출 실패 확률 (503)")
+    parser.add_argument("--upload-kb", type=int, default=64)
+    parser.add_argument("--upload-delay", type=float, default=0.05)
+    parser.add_argument("--index-delay", type=float, default=0.5, help="가짜 인덱싱 완료까지 시간(초)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workdir", default=None, help="data/ 디렉터리를 만들 작업 폴더 (기본: 임시 폴더)")
+    parser.add_argument("--output", default="bench_load.json", help="결과 JSON 경로")
+    parser.add_argument("--compare", default=None, help="비교할 이전 결과 JSON")
+    args = parser.parse_args()
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"알 수 없는 시나리오: {', '.join(unknown)}")
+    output = Path(args.output).resolve()
+    compare = Path(args.compare).resolve() if args.compare else None
+
+    # 앱은 data/ 상대 경로에 저장하므로 작업 폴더를 옮긴 뒤 import
+    os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+    # 가짜 클라이언트로 교체하므로 실제 API로 연결 워밍업하지 않음
+    os.environ.setdefault("CLIENT_WARMUP", "false")
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="bench_load_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+
+    report = asyncio.run(run_benchmark(args))
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir")},
+        **report
+    }
+
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n💾 결과 저장: {output}")
+    process = report["process"]
+    print(f"🧠 RSS 시작 {process['rss_start_mb']}MB / 최대 {process['rss_peak_mb']}MB / 종료 {process['rss_end_mb']}MB")
+
+    if compare and compare.exists():
+        print_comparison(report, json.loads(compare.read_text(encoding="utf-8")))
+
+    if report["history_shard_mismatches"]:
+        print(f"❌ 메모리 샤드와 저장소 히스토리 불일치: {', '.join(report['history_shard_mismatches'][:10])}")
+        sys.exit(1)
+    if report["upload_locks_left"]:
+        print(f"❌ 끝난 업로드의 해시별 잠금이 남음: {report['upload_locks_left']}개")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
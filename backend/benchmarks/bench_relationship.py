@@ -0,0 +1,112 @@
+"""
+Relationship Benchmark - 캐릭터당 초당 처리 턴 수 (기존 방식 vs 레지스트리)
+
+기존 방식: 요청마다 RelationshipTracker를 새로 만들고(JSON 재파싱),
+변경마다 indent=2로 전체 히스토리가 든 파일을 다시 쓴다.
+레지스트리: 프로세스 내 추적기를 재사용하고 턴당 한 번 이벤트 로그에 추가한다
+(스냅샷은 주기적으로만 다시 쓴다).
+
+사용법 (backend 디렉터리에서):
+    python benchmarks/bench_relationship.py --turns 2000 --history 5000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from relationship_tracker import RelationshipTracker, RelationshipRegistry, EVENT_LISTS  # noqa: E402
+
+LIST_FIELDS = {kind: field for field, kind in EVENT_LISTS.items()}
+
+
+class LegacyTracker(RelationshipTracker):
+    """전체 목록을 JSON 한 파일에 두고 변경마다 indent=2로 다시 쓰던 기존 동작 재현"""
+
+    writes = 0
+
+    def _load_relationship_data(self):
+        with open(self.relationship_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _record_event(self, kind, payload):
+        self.relationship_data[LIST_FIELDS[kind]].append(payload)
+
+    def _save_relationship_data(self):
+        LegacyTracker.writes += 1
+        with open(self.relationship_file, 'w', encoding='utf-8') as f:
+            json.dump(self.relationship_data, f, ensure_ascii=False, indent=2)
+
+
+def seed_history(character_id: str, history: int):
+    """오래된 관계(긴 affection_history)를 가진 기존 형식 캐릭터 파일 생성"""
+    data = RelationshipTracker._new_relationship_data()
+    data["affection_history"] = [
+        {"timestamp": "2025-01-01T00:00:00", "change": 1, "reason": "Conversation (daily_chat)",
+         "old_level": 10, "new_level": 11}
+    ] * history
+    with open(Path("data/characters") / f"{character_id}_relationship.json", 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def bench(label: str, run_turn, turns: int) -> float:
+    started = time.perf_counter()
+    for i in range(turns):
+        run_turn(i)
+    elapsed = time.perf_counter() - started
+    rate = turns / elapsed
+    print(f"{label:<10} turns={turns:<6} elapsed={elapsed:7.2f}s  {rate:9.1f} turns/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--history", type=int, default=2000, help="초기 affection_history 길이")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        Path("data/characters").mkdir(parents=True)
+
+        seed_history("char_legacy", args.history)
+
+        def legacy_turn(i: int):
+            tracker = LegacyTracker("char_legacy")
+            tracker.get_relationship_context_for_ai()
+            tracker.record_conversation("오늘 하루 어땠어?", "좋았어요!")
+
+        before = bench("legacy", legacy_turn, args.turns)
+        print(f"           writes/turn={LegacyTracker.writes / args.turns:.2f}")
+
+        seed_history("char_registry", args.history)
+        registry = RelationshipRegistry()
+        registry.get("char_registry")  # 기존 형식 파일 → 이벤트 로그 마이그레이션
+        writes = {"count": 0}
+        original_flush = RelationshipTracker.flush
+
+        def counting_flush(self, snapshot=False):
+            written = original_flush(self, snapshot)
+            writes["count"] += int(written)
+            return written
+
+        RelationshipTracker.flush = counting_flush
+
+        def registry_turn(i: int):
+            tracker = registry.get("char_registry")
+            tracker.get_relationship_context_for_ai()
+            tracker.record_conversation("오늘 하루 어땠어?", "좋았어요!")
+
+        after = bench("registry", registry_turn, args.turns)
+        registry.flush_all()
+        print(f"           writes/turn={writes['count'] / args.turns:.2f}")
+        print(f"speedup x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
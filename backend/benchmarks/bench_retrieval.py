@@ -0,0 +1,119 @@
+"""
+Retrieval Benchmark - 원격 Gemini 추출 vs 로컬 BM25 인덱스 get_context 지연 비교
+
+사용법 (backend 디렉터리에서):
+    python benchmarks/bench_retrieval.py                 # 합성 코퍼스로 로컬 인덱스만 측정
+    python benchmarks/bench_retrieval.py --remote        # 실제 Store로 원격 추출 경로도 측정 (GEMINI_API_KEY 필요)
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from local_retrieval import LocalRetrievalIndex  # noqa: E402
+
+TOPICS = ["여행", "음악", "요리", "영화", "운동", "독서", "고양이", "커피", "바다", "회사", "공부", "게임"]
+VERBS = ["좋아해요", "싫어해요", "자주 생각해요", "얘기했어요", "기억하고 있어요", "계획하고 있어요"]
+QUERIES = [
+    "지난번에 얘기했던 여행 계획 기억나?",
+    "내가 좋아하는 음악이 뭐였지",
+    "요리 레시피 알려줘",
+    "고양이 이야기 다시 해줘",
+    "회사에서 있었던 일",
+]
+
+
+def build_corpus(doc_count: int, lines_per_doc: int) -> list:
+    """캐릭터 대화 로그 형태의 합성 한국어 문서 생성"""
+    rng = random.Random(42)
+    docs = []
+    for i in range(doc_count):
+        lines = []
+        for _ in range(lines_per_doc):
+            topic = rng.choice(TOPICS)
+            lines.append(f"사용자: 나는 {topic}을 {rng.choice(VERBS)}\n캐릭터: {topic} 이야기라니 정말 좋네요!\n")
+        docs.append((f"fileSearchStores/bench/documents/doc-{i}", f"char_bench_conversation_{i}.txt", "\n".join(lines)))
+    return docs
+
+
+def percentile(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(label: str, samples: list):
+    print(
+        f"{label:<28} n={len(samples):<4} "
+        f"p50={percentile(samples, 0.5) * 1000:9.2f}ms "
+        f"p95={percentile(samples, 0.95) * 1000:9.2f}ms "
+        f"mean={statistics.mean(samples) * 1000:9.2f}ms"
+    )
+
+
+def bench_local(doc_count: int, lines_per_doc: int, iterations: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalRetrievalIndex(Path(tmp) / "local_retrieval_index.db")
+
+        started = time.perf_counter()
+        for name, display_name, text in build_corpus(doc_count, lines_per_doc):
+            index.add_document(name, display_name, text)
+        print(f"📦 로컬 인덱스 구축: {doc_count}개 문서, {index.passage_count()}개 패시지, "
+              f"{time.perf_counter() - started:.2f}s")
+
+        samples = []
+        for i in range(iterations):
+            query = QUERIES[i % len(QUERIES)]
+            started = time.perf_counter()
+            index.search(query, top_k=5)
+            samples.append(time.perf_counter() - started)
+        report("local BM25 search", samples)
+
+
+async def bench_remote(iterations: int):
+    from dotenv import load_dotenv
+    load_dotenv()
+    from file_search_manager import FileSearchManager
+
+    manager = FileSearchManager()
+    manager.retrieval_mode = "remote"
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await manager.get_context(QUERIES[i % len(QUERIES)])
+        samples.append(time.perf_counter() - started)
+    report("remote get_context", samples)
+
+    if manager.local_index.passage_count():
+        manager.retrieval_mode = "local"
+        samples = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            await manager.get_context(QUERIES[i % len(QUERIES)])
+            samples.append(time.perf_counter() - started)
+        report("local get_context", samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--remote", action="store_true", help="실제 Gemini File Search 경로 측정")
+    parser.add_argument("--remote-iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    bench_local(args.docs, args.lines, args.iterations)
+    if args.remote:
+        asyncio.run(bench_remote(args.remote_iterations))
+
+
+if __name__ == "__main__":
+    main()
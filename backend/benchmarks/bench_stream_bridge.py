@@ -0,0 +1,100 @@
+"""
+Stream Bridge Benchmark - 동시 스트리밍 중 이벤트 루프 응답성 측정
+
+로컬 가짜 모델(청크마다 블로킹 sleep)로 50개 스트림을 동시에 흘리면서
+10ms 간격 하트비트의 지연을 잰다. 기존 방식(루프 스레드에서 동기 for 순회)과
+iterate_in_thread 브리지를 비교하고, 브리지의 최대 지연이 기준을 넘으면 실패 코드로 종료한다.
+
+사용법 (backend 디렉터리에서):
+    python benchmarks/bench_stream_bridge.py --streams 50 --chunks 20 --chunk-delay 0.02
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai_manager import iterate_in_thread  # noqa: E402
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def fake_model_stream(chunks: int, chunk_delay: float):
+    """네트워크 읽기를 흉내 내는 동기 스트림"""
+    for i in range(chunks):
+        time.sleep(chunk_delay)
+        yield FakeChunk(f"토큰{i} ")
+
+
+async def heartbeat(stop: asyncio.Event, interval: float, lags: list):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def consume_blocking(chunks: int, chunk_delay: float) -> str:
+    """기존 구현: 이벤트 루프 스레드에서 동기 이터레이터 순회"""
+    text = ""
+    for chunk in fake_model_stream(chunks, chunk_delay):
+        text += chunk.text
+        await asyncio.sleep(0.01)
+    return text
+
+
+async def consume_bridge(chunks: int, chunk_delay: float) -> str:
+    text = ""
+    async for chunk in iterate_in_thread(lambda: fake_model_stream(chunks, chunk_delay)):
+        text += chunk.text
+    return text
+
+
+async def run(label: str, consumer, streams: int, chunks: int, chunk_delay: float, interval: float) -> float:
+    stop = asyncio.Event()
+    lags: list = []
+    beat = asyncio.create_task(heartbeat(stop, interval, lags))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(consumer(chunks, chunk_delay) for _ in range(streams)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+
+    assert all(r.count("토큰") == chunks for r in results)
+    lags.sort()
+    max_lag = lags[-1] if lags else elapsed
+    p99 = lags[int(len(lags) * 0.99)] if lags else elapsed
+    print(f"{label:<10} streams={streams} wall={elapsed:7.2f}s "
+          f"heartbeats={len(lags):<5} lag p99={p99 * 1000:8.1f}ms max={max_lag * 1000:8.1f}ms")
+    return max_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--max-lag", type=float, default=0.1, help="브리지 허용 최대 하트비트 지연(초)")
+    parser.add_argument("--skip-blocking", action="store_true", help="기존 방식 측정 생략")
+    args = parser.parse_args()
+
+    if not args.skip_blocking:
+        asyncio.run(run("blocking", consume_blocking, args.streams, args.chunks, args.chunk_delay, args.interval))
+    max_lag = asyncio.run(run("bridge", consume_bridge, args.streams, args.chunks, args.chunk_delay, args.interval))
+
+    if max_lag > args.max_lag:
+        print(f"❌ 이벤트 루프 최대 지연 {max_lag * 1000:.1f}ms > 기준 {args.max_lag * 1000:.0f}ms")
+        sys.exit(1)
+    print("✅ 스트리밍 중 이벤트 루프 응답성 유지")
+
+
+if __name__ == "__main__":
+    main()
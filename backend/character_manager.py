@@ -1,11 +1,18 @@
+import os
+import copy
 import uuid
 import json
 import asyncio
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple, Any, Callable
 from fastapi import UploadFile
 from file_search_manager import FileSearchManager
+from conversation_journal import ConversationJournal
+from structured_logging import get_logger
+
+logger = get_logger("character_manager")
 
 class CharacterManager:
     """캐릭터 생성, 저장, 불러오기 관리"""
@@ -16,6 +23,18 @@ class CharacterManager:
         self.image_dir = self.data_dir / "images"
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.image_dir.mkdir(parents=True, exist_ok=True)
+
+        # 파싱된 캐릭터 메타데이터 캐시 (파일 mtime/size로 검증, LRU 제거)
+        self.cache_size = int(os.getenv("CHARACTER_CACHE_SIZE", "1024"))
+        self._cache: "OrderedDict[str, Tuple[Tuple[int, int], Dict]]" = OrderedDict()
+
+        # 대화 write-behind 저널 (N턴 또는 일정 시간마다 대화록 문서로 업로드)
+        self.journal = ConversationJournal(
+            file_search_manager,
+            self.data_dir / "journal",
+            flush_turns=int(os.getenv("CONVERSATION_FLUSH_TURNS", "10")),
+            flush_interval=float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "300"))
+        )
     
     async def create_character(
         self,
@@ -33,7 +52,7 @@ class CharacterManager:
     ) -> str:
         """캐릭터 생성 및 RAG에 저장"""
         character_id = f"char_{uuid.uuid4().hex[:12]}"
-        print(f"🎨 캐릭터 생성 시작: {name} (ID: {character_id})")
+        logger.info("캐릭터 생성 시작", extra={"character_id": character_id, "character_name": name})
 
         profile_text = self._generate_profile_text(
             name, gender, age, personality, backstory,
@@ -43,17 +62,18 @@ class CharacterManager:
         try:
             temp_file = self.data_dir / f"{character_id}_profile_temp.txt"
             temp_file.write_text(profile_text, encoding='utf-8')
-            await self.fsm.upload_file(str(temp_file), f"{character_id}_profile.txt")
+            await self.fsm.upload_file(str(temp_file), f"{character_id}_profile.txt",
+                                       character_id=character_id, kind="profile")
             temp_file.unlink()
-            print(f"✅ 프로필을 RAG에 저장 완료")
+            logger.info("프로필 RAG 저장 완료", extra={"character_id": character_id})
         except Exception as e:
-            print(f"❌ RAG 저장 실패: {e}")
+            logger.error("프로필 RAG 저장 실패", extra={"character_id": character_id, "error": str(e)})
             raise
         
         image_path = None
         if image:
             image_path = await self._save_image(character_id, image)
-            print(f"✅ 이미지 저장 완료: {image_path}")
+            logger.info("캐릭터 이미지 저장 완료", extra={"character_id": character_id, "path": image_path})
         
         character_data = {
             "character_id": character_id,
@@ -76,7 +96,7 @@ class CharacterManager:
         }
         
         self._save_metadata(character_id, character_data)
-        print(f"✅ 캐릭터 생성 완료: {name} (ID: {character_id})")
+        logger.info("캐릭터 생성 완료", extra={"character_id": character_id, "character_name": name})
         return character_id
     
     def _generate_profile_text(self, name: str, gender: str, age: int,
@@ -154,57 +174,88 @@ class CharacterManager:
             f.write(content)
         return str(image_path)
     
+    def _cache_put(self, character_id: str, signature: Tuple[int, int], data: Dict):
+        self._cache[character_id] = (signature, copy.deepcopy(data))
+        self._cache.move_to_end(character_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _file_signature(path: Path) -> Tuple[int, int]:
+        stat = path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
     def _save_metadata(self, character_id: str, data: dict):
-        """메타데이터 로컬 저장"""
+        """메타데이터 로컬 저장 (캐시도 함께 갱신)"""
         metadata_path = self.data_dir / f"{character_id}.json"
         with open(metadata_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        self._cache_put(character_id, self._file_signature(metadata_path), data)
     
     def load_character(self, character_id: str) -> Optional[Dict]:
-        """저장된 캐릭터 불러오기"""
+        """저장된 캐릭터 불러오기 (파일이 바뀌지 않았으면 캐시 사용)"""
         metadata_path = self.data_dir / f"{character_id}.json"
-        if not metadata_path.exists():
+        try:
+            signature = self._file_signature(metadata_path)
+        except FileNotFoundError:
+            self._cache.pop(character_id, None)
             return None
+
+        cached = self._cache.get(character_id)
+        if cached and cached[0] == signature:
+            self._cache.move_to_end(character_id)
+            return copy.deepcopy(cached[1])
+
         with open(metadata_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+            data = json.load(f)
+        self._cache_put(character_id, signature, data)
+        return data
     
     async def save_conversation(self, character_id: str, user_message: str, ai_response: str):
-        """대화 내용을 RAG에 추가"""
+        """대화 내용을 저널에 기록 (RAG 업로드는 백그라운드에서 묶어서 수행)"""
         timestamp = datetime.now().isoformat()
         char_data = self.load_character(character_id)
         if not char_data:
             return
-        
-        conversation_text = f"[{timestamp}]\n사용자: {user_message}\n{char_data['name']}: {ai_response}\n---\n"
-        temp_file = self.data_dir / f"{character_id}_conv_{timestamp.replace(':', '-')}_temp.txt"
-        temp_file.write_text(conversation_text, encoding='utf-8')
 
         try:
-            await self.fsm.upload_file(str(temp_file), f"{character_id}_conversation_{timestamp.replace(':', '-')}.txt")
-            temp_file.unlink()
+            await self.journal.append(
+                character_id=character_id,
+                character_name=char_data['name'],
+                user_message=user_message,
+                ai_response=ai_response,
+                timestamp=timestamp
+            )
             char_data["conversation_count"] += 1
             char_data["last_chat_at"] = timestamp
             self._save_metadata(character_id, char_data)
         except Exception as e:
-            print(f"❌ 대화 저장 실패: {e}")
-            if temp_file.exists():
-                temp_file.unlink()
+            logger.error("대화 저장 실패", extra={"character_id": character_id, "error": str(e)})
     
-    async def reset_character(self, character_id: str):
-        """캐릭터 완전 초기화"""
-        print(f"🗑️ 캐릭터 초기화: {character_id}")
+    async def get_character_documents(self, character_id: str, cursor: Optional[int] = None,
+                                      limit: int = 100, kind: Optional[str] = None) -> Dict[str, Any]:
+        """캐릭터의 프로필/대화록 문서 목록 (역색인 조회)"""
+        return await self.fsm.list_documents(cursor=cursor, limit=limit, kind=kind, character_id=character_id)
+
+    async def reset_character(self, character_id: str,
+                              progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """캐릭터 완전 초기화 (RAG 문서 삭제 결과 반환)"""
+        logger.info("캐릭터 초기화 시작", extra={"character_id": character_id})
+        self.journal.discard(character_id)
+        report = {"deleted": 0, "dereferenced": 0, "failed": 0, "results": []}
         try:
-            documents = await self.fsm.list_documents()
-            for doc in documents:
-                if character_id in doc.get('name', ''):
-                    await self.fsm.delete_document(doc['document_name'])
+            # 캐릭터 -> 문서 역색인으로 프로필/대화록 문서만 바로 찾아 삭제
+            report = await self.fsm.delete_character_documents(character_id, progress=progress)
         except Exception as e:
-            print(f"RAG 삭제 오류: {e}")
+            logger.error("캐릭터 문서 삭제 오류", extra={"character_id": character_id, "error": str(e)})
         
         metadata_path = self.data_dir / f"{character_id}.json"
         if metadata_path.exists():
             metadata_path.unlink()
+        self._cache.pop(character_id, None)
         
         for img_file in self.image_dir.glob(f"{character_id}.*"):
             img_file.unlink()
-        print(f"✅ 초기화 완료")
+        logger.info("캐릭터 초기화 완료", extra={"character_id": character_id,
+                                              "deleted": report['deleted'], "failed": report['failed']})
+        return report
@@ -0,0 +1,119 @@
+"""
+Client Registry - 프로세스 전역 Gemini 클라이언트 (연결 풀 + keep-alive 공유)
+
+AIManager, FileSearchManager, 프롬프트 컨텍스트 캐시가 같은 genai.Client를 받으므로
+요청 사이에 TCP/TLS 연결이 재사용된다. 기본 httpx 설정은 유휴 연결을 5초 뒤에 닫아
+대화 턴 사이마다 핸드셰이크를 다시 하게 되므로 유지 시간을 늘려 둔다.
+앱 시작 시 warm_up()으로 첫 연결을 미리 열고, 종료 시 aclose()로 풀을 닫는다.
+
+풀 한도/HTTP/2 설정은 LangGraph 에이전트(src/tools)와 공유하는 src/utils/http_pool.py에 있다
+(HTTP_POOL_MAX_CONNECTIONS, HTTP_POOL_MAX_KEEPALIVE, HTTP_POOL_KEEPALIVE_EXPIRY, HTTP2_ENABLED).
+
+설정 (환경 변수):
+    CLIENT_WARMUP               시작 시 연결 미리 열기 (기본 true)
+    CLIENT_WARMUP_TIMEOUT       워밍업 최대 대기 시간(초) (기본 5)
+    CLIENT_WARMUP_MODEL         워밍업에 조회할 모델 (기본 gemini-2.5-flash)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+from typing import Dict, Any
+
+from structured_logging import get_logger
+
+sys.path.append(str(Path(__file__).resolve().parent / "src"))
+from utils.http_pool import pool_limits, http2_enabled, pooled_client_args  # noqa: E402
+
+logger = get_logger("client_registry")
+
+# Google Gemini
+try:
+    from google import genai
+    from google.genai import types
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+class ClientRegistry:
+    """
+    API 키별 genai.Client를 하나씩 유지
+
+    genai.Client는 동기 호출(스레드 풀)과 .aio 호출 모두 내부 httpx 풀을 공유하므로
+    매니저마다 따로 만들지 않고 gemini()로 받아 쓴다.
+    """
+
+    def __init__(self):
+        self._gemini: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def gemini(self, api_key: str):
+        """API 키에 대한 공유 genai.Client (처음 요청할 때 생성)"""
+        if not GEMINI_AVAILABLE:
+            raise RuntimeError("google-genai 패키지가 설치되어 있지 않습니다")
+        with self._lock:
+            client = self._gemini.get(api_key)
+            if client is None:
+                args = pooled_client_args()
+                client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(client_args=args, async_client_args=dict(args))
+                )
+                self._gemini[api_key] = client
+                logger.info("공유 Gemini 클라이언트 생성", extra={"http2": args["http2"]})
+            return client
+
+    async def warm_up(self):
+        """
+        등록된 클라이언트의 첫 연결(DNS, TCP, TLS)을 미리 열어 둠
+
+        실패해도 앱 시작을 막지 않고 경고만 남긴다 (첫 요청에서 다시 연결).
+        """
+        if os.getenv("CLIENT_WARMUP", "true").lower() not in ("1", "true", "yes"):
+            return
+
+        timeout = float(os.getenv("CLIENT_WARMUP_TIMEOUT", "5"))
+        model = os.getenv("CLIENT_WARMUP_MODEL", "gemini-2.5-flash")
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            gemini_clients = list(self._gemini.values())
+
+        async def warm(client):
+            started = time.perf_counter()
+            try:
+                # 동기 풀(스레드 풀에서 쓰는 쪽)을 데움 - 모델 메타데이터 조회는 토큰을 쓰지 않음
+                await asyncio.wait_for(loop.run_in_executor(None, lambda: client.models.get(model=model)), timeout)
+                logger.info("Gemini 연결 워밍업 완료", extra={"ms": round((time.perf_counter() - started) * 1000, 1)})
+            except Exception as e:
+                logger.warning("Gemini 연결 워밍업 실패", extra={"error": str(e)})
+
+        await asyncio.gather(*(warm(client) for client in gemini_clients))
+
+    async def aclose(self):
+        """모든 풀의 연결 닫기"""
+        with self._lock:
+            gemini_clients = list(self._gemini.values())
+            self._gemini.clear()
+
+        for client in gemini_clients:
+            try:
+                client.close()
+                await client.aio.aclose()
+            except Exception as e:
+                logger.warning("Gemini 클라이언트 종료 실패", extra={"error": str(e)})
+
+    def stats(self) -> Dict[str, Any]:
+        limits = pool_limits()
+        return {
+            "gemini_clients": len(self._gemini),
+            "http2": http2_enabled(),
+            "max_connections": limits.max_connections,
+            "max_keepalive_connections": limits.max_keepalive_connections,
+            "keepalive_expiry": limits.keepalive_expiry
+        }
+
+
+CLIENTS = ClientRegistry()
@@ -0,0 +1,229 @@
+"""
+Conversation Journal - 캐릭터 대화의 write-behind 저널
+
+대화 턴마다 File Search Store에 업로드하는 대신 로컬 스풀(JSONL)에 먼저 기록하고,
+N턴 또는 일정 시간마다 묶어서 하나의 대화록 문서로 업로드한다.
+스풀은 턴마다 fsync되므로 서버가 비정상 종료되어도 업로드 전 턴이 보존된다.
+스풀 파일 쓰기는 전용 writer 스레드 하나에서 요청 순서대로 실행되어 이벤트 루프를 막지 않는다.
+"""
+
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Any, TYPE_CHECKING
+
+from structured_logging import get_logger
+
+if TYPE_CHECKING:
+    from file_search_manager import FileSearchManager
+
+logger = get_logger("conversation_journal")
+
+
+class ConversationJournal:
+    """캐릭터별 대화 버퍼 + 백그라운드 업로드"""
+
+    def __init__(
+        self,
+        file_search_manager: "FileSearchManager",
+        spool_dir: Path,
+        flush_turns: int = 10,
+        flush_interval: float = 300.0
+    ):
+        self.fsm = file_search_manager
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_turns = max(1, flush_turns)
+        self.flush_interval = flush_interval
+
+        # character_id -> 업로드 대기 중인 턴 목록
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # character_id -> 초기화 세대 (discard마다 증가, 업로드 도중 초기화됐는지 확인용)
+        self._epochs: Dict[str, int] = {}
+        # 스풀 append/rewrite/unlink를 순서대로 실행하는 writer 스레드
+        self._spool_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-spool")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+        self._recover_spool()
+
+    # ==================== 스풀 ====================
+
+    def _spool_path(self, character_id: str) -> Path:
+        return self.spool_dir / f"{character_id}.jsonl"
+
+    def _recover_spool(self):
+        """재시작 시 업로드되지 못한 턴 복구"""
+        for spool_file in self.spool_dir.glob("*.jsonl"):
+            turns = []
+            with open(spool_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        turns.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 기록 도중 중단된 마지막 줄은 버림
+                        continue
+            if turns:
+                self._pending[spool_file.stem] = turns
+                logger.info("대화 저널 복구", extra={"character_id": spool_file.stem, "turns": len(turns)})
+
+    def _append_spool(self, character_id: str, turn: Dict[str, Any]):
+        with open(self._spool_path(character_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_spool(self, character_id: str, turns: List[Dict[str, Any]]):
+        spool_file = self._spool_path(character_id)
+        if not turns:
+            spool_file.unlink(missing_ok=True)
+            return
+        tmp_file = spool_file.with_suffix(".jsonl.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for turn in turns:
+                f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, spool_file)
+
+    # ==================== 기록 ====================
+
+    async def append(self, character_id: str, character_name: str, user_message: str,
+                     ai_response: str, timestamp: str):
+        """대화 턴을 업로드 대기열에 추가하고 스풀 기록(fsync)이 끝날 때까지 대기"""
+        turn = {
+            "timestamp": timestamp,
+            "character_name": character_name,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "recorded_at": time.time()
+        }
+        pending = self._pending.setdefault(character_id, [])
+        pending.append(turn)
+        # 대기열 갱신과 같은 순서로 writer에 넣어 flush의 스풀 재작성과 순서가 뒤바뀌지 않게 함
+        written = asyncio.get_running_loop().run_in_executor(
+            self._spool_writer, self._append_spool, character_id, turn
+        )
+
+        if len(pending) >= self.flush_turns and self._wakeup:
+            self._wakeup.set()
+        await written
+
+    def pending_count(self, character_id: Optional[str] = None) -> int:
+        """업로드 대기 중인 턴 수"""
+        if character_id:
+            return len(self._pending.get(character_id, []))
+        return sum(len(turns) for turns in self._pending.values())
+
+    def discard(self, character_id: str):
+        """
+        캐릭터 초기화 시 업로드 대기 턴과 스풀 삭제
+
+        세대를 올려 두면 업로드 중이던 flush가 끝난 뒤 초기화 이후의 턴을 건드리지 않고,
+        초기화 이후에 등록된 이전 대화록 문서는 지운다.
+        """
+        self._epochs[character_id] = self._epochs.get(character_id, 0) + 1
+        self._pending.pop(character_id, None)
+        self._spool_writer.submit(self._spool_path(character_id).unlink, missing_ok=True)
+
+    # ==================== 업로드 ====================
+
+    @staticmethod
+    def _format_transcript(turns: List[Dict[str, Any]]) -> str:
+        return "".join(
+            f"[{t['timestamp']}]\n사용자: {t['user_message']}\n{t['character_name']}: {t['ai_response']}\n---\n"
+            for t in turns
+        )
+
+    def _is_due(self, character_id: str, now: float) -> bool:
+        turns = self._pending.get(character_id)
+        if not turns:
+            return False
+        return len(turns) >= self.flush_turns or now - turns[0]["recorded_at"] >= self.flush_interval
+
+    async def flush(self, character_id: str) -> bool:
+        """캐릭터의 대기 턴을 하나의 대화록 문서로 업로드"""
+        lock = self._locks.setdefault(character_id, asyncio.Lock())
+        async with lock:
+            turns = list(self._pending.get(character_id, []))
+            if not turns:
+                return True
+            epoch = self._epochs.get(character_id, 0)
+            loop = asyncio.get_running_loop()
+
+            stamp = turns[0]["timestamp"].replace(':', '-')
+            temp_file = self.spool_dir / f"{character_id}_conv_{stamp}_temp.txt"
+            await loop.run_in_executor(
+                None, lambda: temp_file.write_text(self._format_transcript(turns), encoding='utf-8')
+            )
+
+            try:
+                result = await self.fsm.upload_file(str(temp_file), f"{character_id}_conversation_{stamp}.txt",
+                                                    character_id=character_id, kind="conversation")
+            except Exception as e:
+                logger.error("대화록 업로드 실패", extra={
+                    "character_id": character_id, "turns": len(turns), "error": str(e)
+                })
+                return False
+            finally:
+                temp_file.unlink(missing_ok=True)
+
+            if self._epochs.get(character_id, 0) != epoch:
+                # 업로드 도중 초기화됨: 초기화가 지우지 못한(이후에 등록된) 이전 대화록은 삭제하고,
+                # 대기열/스풀에는 초기화 이후의 턴만 있으므로 그대로 둠
+                if result['file_name'] in self.fsm.documents.owner_references(character_id):
+                    await self.fsm.delete_documents([result['file_name']], character_id=character_id)
+                return True
+
+            # 업로드한 턴만 제거 (업로드 중에 추가된 턴은 남겨 둠)
+            uploaded = {id(turn) for turn in turns}
+            remaining = [turn for turn in self._pending.get(character_id, []) if id(turn) not in uploaded]
+            if remaining:
+                self._pending[character_id] = remaining
+            else:
+                self._pending.pop(character_id, None)
+            await loop.run_in_executor(self._spool_writer, self._rewrite_spool, character_id, list(remaining))
+
+            logger.info("대화록 업로드 완료", extra={"character_id": character_id, "turns": len(turns)})
+            return True
+
+    async def flush_all(self):
+        """모든 캐릭터의 대기 턴 업로드"""
+        for character_id in list(self._pending):
+            await self.flush(character_id)
+
+    async def _run_flusher(self):
+        check_interval = min(30.0, max(1.0, self.flush_interval / 10))
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=check_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            now = time.time()
+            for character_id in [cid for cid in list(self._pending) if self._is_due(cid, now)]:
+                await self.flush(character_id)
+
+    def start(self):
+        """백그라운드 업로드 작업 시작 (이벤트 루프 안에서 호출)"""
+        if self._flusher is None:
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run_flusher())
+            if self._pending:
+                self._wakeup.set()
+
+    async def stop(self):
+        """백그라운드 작업 중지 후 남은 턴 업로드 (실패한 턴은 스풀에 유지)"""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush_all()
@@ -0,0 +1,118 @@
+"""
+Conversation Shards - 세션/캐릭터별 대화 히스토리 샤드
+
+각 요청은 자기 (session_id, character_id) 샤드만 읽고 쓴다. 샤드는 최근 N턴만 담는
+deque이고, 오래 쓰이지 않은 샤드는 LRU로 메모리에서 내린다. 모든 항목은
+ChatHistoryStore(SQLite)에 먼저 기록되므로, 내려간 샤드는 다시 필요할 때 디스크에서 복원된다.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Callable, Tuple, Deque
+
+ShardKey = Tuple[Optional[str], Optional[str]]
+ShardLoader = Callable[[Optional[str], Optional[str], int], List[Dict[str, Any]]]
+
+
+def shard_key_name(session_id: Optional[str], character_id: Optional[str]) -> str:
+    """히스토리 윈도우 요약 상태 등에 쓰는 샤드 문자열 키"""
+    return f"{session_id or '-'}:{character_id or '-'}"
+
+
+class ConversationShards:
+    """(session_id, character_id)별 제한 크기 deque + LRU 축출"""
+
+    def __init__(self, loader: ShardLoader, max_shards: int = 1000, max_turns: int = 200):
+        """
+        Args:
+            loader: (session_id, character_id, limit) -> 최근 항목 목록 (오래된 순)
+            max_shards: 메모리에 유지할 최대 샤드 수
+            max_turns: 샤드당 최대 항목 수
+        """
+        self.loader = loader
+        self.max_shards = max_shards
+        self.max_turns = max_turns
+
+        self._lock = threading.Lock()
+        self._shards: "OrderedDict[ShardKey, Deque[Dict[str, Any]]]" = OrderedDict()
+        # 저장소에서 복원 중인 샤드: key -> [복원 중인 요청 수, 복원 중 추가된 항목 수]
+        self._loading: Dict[ShardKey, List[int]] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, session_id: Optional[str] = None, character_id: Optional[str] = None) -> Deque[Dict[str, Any]]:
+        """샤드 조회 (메모리에 없으면 저장소에서 복원)"""
+        key = (session_id, character_id)
+        while True:
+            with self._lock:
+                shard = self._shards.get(key)
+                if shard is not None:
+                    self._shards.move_to_end(key)
+                    return shard
+                state = self._loading.setdefault(key, [0, 0])
+                state[0] += 1
+                appended_before = state[1]
+
+            try:
+                entries = self.loader(session_id, character_id, self.max_turns)
+            finally:
+                with self._lock:
+                    state[0] -= 1
+                    if not state[0] and self._loading.get(key) is state:
+                        del self._loading[key]
+
+            with self._lock:
+                # 복원하는 사이 다른 요청이 만들었으면 그것을 사용
+                shard = self._shards.get(key)
+                if shard is None:
+                    if state[1] != appended_before:
+                        # 읽는 도중 저장소에 항목이 추가됨 (읽은 목록에 포함됐는지 알 수 없으므로 다시 읽음)
+                        continue
+                    shard = deque(entries, maxlen=self.max_turns)
+                    self._shards[key] = shard
+                    self.loads += 1
+                    while len(self._shards) > self.max_shards:
+                        self._shards.popitem(last=False)
+                        self.evictions += 1
+                self._shards.move_to_end(key)
+                return shard
+
+    def append(self, entry: Dict[str, Any], session_id: Optional[str] = None,
+               character_id: Optional[str] = None):
+        """
+        메모리에 있는 샤드에 항목 추가 (저장소 기록은 호출자가 먼저 수행)
+
+        메모리에 없는 샤드는 추가하지 않는다. 다음 get()에서 저장소로부터 복원할 때
+        이미 기록된 이 항목까지 함께 읽히므로, 여기서 복원 후 추가하면 같은 항목이 두 번 들어간다.
+        """
+        key = (session_id, character_id)
+        with self._lock:
+            shard = self._shards.get(key)
+            if shard is not None:
+                shard.append(entry)
+                return
+            state = self._loading.get(key)
+            if state is not None:
+                state[1] += 1
+
+    def discard_character(self, character_id: str):
+        """캐릭터 초기화 시 해당 캐릭터의 모든 세션 샤드 제거"""
+        with self._lock:
+            for key in [k for k in self._shards if k[1] == character_id]:
+                del self._shards[key]
+
+    def clear(self):
+        """모든 샤드 제거"""
+        with self._lock:
+            self._shards.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """샤드 수/복원/축출 통계"""
+        with self._lock:
+            return {
+                "shards": len(self._shards),
+                "max_shards": self.max_shards,
+                "max_turns": self.max_turns,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
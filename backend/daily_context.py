@@ -226,27 +226,7 @@ class DailyContextManager:
             context += f"- ⭐ 특별한 날: {special_date}\n"
 
         # Check time since last interaction
-        if last_interaction:
-            try:
-                last_time = datetime.fromisoformat(last_interaction)
-                time_diff = now - last_time
-
-                if time_diff < timedelta(hours=1):
-                    context += f"\n[대화 간격] 방금 전에 대화했어요 (조금 전)\n"
-                elif time_diff < timedelta(hours=6):
-                    hours = int(time_diff.total_seconds() / 3600)
-                    context += f"\n[대화 간격] {hours}시간 전에 마지막으로 대화했어요\n"
-                elif time_diff < timedelta(days=1):
-                    context += f"\n[대화 간격] 오늘 아침/오후에 대화했었죠\n"
-                elif time_diff < timedelta(days=3):
-                    days = time_diff.days
-                    context += f"\n[대화 간격] {days}일 만이에요! 오랜만이네요 😊\n"
-                else:
-                    days = time_diff.days
-                    context += f"\n[대화 간격] {days}일 만이에요! 정말 보고 싶었어요! 💕\n"
-
-            except Exception:
-                pass
+        context += cls.get_interaction_gap_context(last_interaction, now)
 
         # Add behavioral guidance based on time (without forcing specific questions)
         hour = now.hour
@@ -261,6 +241,44 @@ class DailyContextManager:
 
         return context
 
+    @classmethod
+    def get_interaction_gap_context(cls, last_interaction: Optional[str] = None,
+                                    now: Optional[datetime] = None) -> str:
+        """
+        Describe how long it has been since the last interaction
+
+        Args:
+            last_interaction: ISO timestamp of last interaction
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Context line for the AI system prompt (empty if unknown)
+        """
+        if not last_interaction:
+            return ""
+
+        now = now or datetime.now()
+        try:
+            last_time = datetime.fromisoformat(last_interaction)
+            time_diff = now - last_time
+
+            if time_diff < timedelta(hours=1):
+                return f"\n[대화 간격] 방금 전에 대화했어요 (조금 전)\n"
+            elif time_diff < timedelta(hours=6):
+                hours = int(time_diff.total_seconds() / 3600)
+                return f"\n[대화 간격] {hours}시간 전에 마지막으로 대화했어요\n"
+            elif time_diff < timedelta(days=1):
+                return f"\n[대화 간격] 오늘 아침/오후에 대화했었죠\n"
+            elif time_diff < timedelta(days=3):
+                days = time_diff.days
+                return f"\n[대화 간격] {days}일 만이에요! 오랜만이네요 😊\n"
+            else:
+                days = time_diff.days
+                return f"\n[대화 간격] {days}일 만이에요! 정말 보고 싶었어요! 💕\n"
+
+        except Exception:
+            return ""
+
     @classmethod
     def should_show_time_awareness(cls, last_interaction: Optional[str] = None) -> Dict[str, any]:
         """
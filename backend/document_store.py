@@ -0,0 +1,409 @@
+"""
+Document Store - File Search 문서 메타데이터 SQLite(WAL) 저장소
+
+file_search_metadata.json을 대체한다. 업로드마다 전체 JSON을 다시 쓰지 않고 한 행만 기록하며,
+문서 이름/소유 캐릭터/종류/업로드 시간 인덱스로 목록 조회와 페이지네이션을 처리한다.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+from structured_logging import get_logger
+
+logger = get_logger("document_store")
+
+# 캐릭터 문서 표시 이름 규칙: {character_id}_profile.txt, {character_id}_conversation_{stamp}.txt
+_CHARACTER_DOC = re.compile(r"^(char_[0-9a-f]+)_(profile|conversation)")
+
+# 문서 행의 기본 컬럼 (나머지 필드는 extra JSON으로 저장)
+_CORE_FIELDS = ("name", "display_name", "uri", "mime_type", "state", "upload_time",
+                "content_hash", "ref_count", "aliases", "character_id", "kind")
+
+
+def classify_document(display_name: str) -> Tuple[str, Optional[str]]:
+    """표시 이름으로 (kind, character_id) 판별 - kind는 profile/conversation/user"""
+    match = _CHARACTER_DOC.match(display_name or "")
+    if match:
+        return match.group(2), match.group(1)
+    return "user", None
+
+
+class DocumentMetadataStore:
+    """이름/캐릭터/종류/업로드 시간 인덱스를 가진 문서 메타데이터 저장소"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        owners_existed = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'document_owners'"
+        ).fetchone() is not None
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                display_name TEXT NOT NULL,
+                uri TEXT,
+                mime_type TEXT,
+                state TEXT,
+                upload_time REAL NOT NULL,
+                content_hash TEXT,
+                ref_count INTEGER NOT NULL DEFAULT 1,
+                aliases TEXT,
+                character_id TEXT,
+                kind TEXT NOT NULL,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_character ON documents(character_id, id);
+            CREATE INDEX IF NOT EXISTS idx_documents_kind ON documents(kind, id);
+            CREATE INDEX IF NOT EXISTS idx_documents_upload_time ON documents(upload_time);
+            CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(content_hash);
+            CREATE TABLE IF NOT EXISTS store_info (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            -- 캐릭터 -> 문서 역색인 (중복 제거로 한 문서를 여러 캐릭터가 참조할 수 있음)
+            CREATE TABLE IF NOT EXISTS document_owners (
+                character_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                ref_count INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (character_id, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_document_owners_name ON document_owners(name);
+        """)
+        # 역색인 도입 전 문서는 표시 이름에서 판별한 소유 캐릭터로 한 번만 채움
+        # (매번 채우면 초기화/삭제로 지운 소유 행이 다시 열 때 되살아남).
+        # 역색인 테이블이 이미 있던 DB는 그때 채워졌으므로 표시만 남긴다.
+        if not self.get_info("document_owners_backfilled"):
+            if not owners_existed:
+                self._conn.execute("""
+                    INSERT OR IGNORE INTO document_owners (character_id, name, kind)
+                        SELECT character_id, name, kind FROM documents WHERE character_id IS NOT NULL
+                """)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_info (key, value) VALUES ('document_owners_backfilled', '1')"
+            )
+        self._conn.commit()
+
+    # ==================== 트랜잭션 ====================
+
+    def _commit(self):
+        if not self._batch_depth:
+            self._conn.commit()
+
+    @contextmanager
+    def batch(self):
+        """블록 안의 변경을 하나의 트랜잭션으로 커밋"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._conn.commit()
+
+    # ==================== Store 정보 ====================
+
+    def get_info(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM store_info WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_info(self, key: str, value: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO store_info (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+            self._commit()
+
+    def generation(self) -> int:
+        """문서 추가/삭제 때마다 증가하는 세대 번호 (검색 캐시 키용)"""
+        return int(self.get_info("generation") or 0)
+
+    def _bump_generation(self):
+        self._conn.execute(
+            "INSERT INTO store_info (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    # ==================== 문서 ====================
+
+    @staticmethod
+    def _row_to_doc(row: sqlite3.Row) -> Dict[str, Any]:
+        doc: Dict[str, Any] = {
+            "id": row["id"],
+            "name": row["name"],
+            "display_name": row["display_name"],
+            "uri": row["uri"],
+            "mime_type": row["mime_type"],
+            "state": row["state"],
+            "upload_time": row["upload_time"],
+            "content_hash": row["content_hash"],
+            "ref_count": row["ref_count"],
+            "kind": row["kind"]
+        }
+        if row["aliases"]:
+            doc["aliases"] = json.loads(row["aliases"])
+        if row["character_id"]:
+            doc["character_id"] = row["character_id"]
+        if row["extra"]:
+            doc.update(json.loads(row["extra"]))
+        return doc
+
+    def add(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
+        """문서 추가 (kind/character_id는 표시 이름으로 판별)"""
+        kind, character_id = classify_document(file_info["display_name"])
+        kind = file_info.get("kind") or kind
+        character_id = file_info.get("character_id") or character_id
+        extra = {k: v for k, v in file_info.items() if k not in _CORE_FIELDS}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (name, display_name, uri, mime_type, state, upload_time, "
+                "content_hash, ref_count, aliases, character_id, kind, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_info["name"],
+                    file_info["display_name"],
+                    file_info.get("uri"),
+                    file_info.get("mime_type"),
+                    file_info.get("state"),
+                    file_info.get("upload_time", 0),
+                    file_info.get("content_hash"),
+                    file_info.get("ref_count", 1),
+                    json.dumps(file_info["aliases"], ensure_ascii=False) if file_info.get("aliases") else None,
+                    character_id,
+                    kind,
+                    json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+                )
+            )
+            if character_id:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO document_owners (character_id, name, kind, ref_count) VALUES (?, ?, ?, 1)",
+                    (character_id, file_info["name"], kind)
+                )
+            self._bump_generation()
+            self._commit()
+        return {**file_info, "kind": kind, **({"character_id": character_id} if character_id else {})}
+
+    # ==================== 캐릭터 역색인 ====================
+
+    def add_owner(self, name: str, character_id: str, kind: str):
+        """캐릭터가 문서를 참조하도록 등록 (이미 참조 중이면 참조 수 증가)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO document_owners (character_id, name, kind) VALUES (?, ?, ?) "
+                "ON CONFLICT(character_id, name) DO UPDATE SET ref_count = ref_count + 1",
+                (character_id, name, kind)
+            )
+            self._commit()
+
+    def owner_references(self, character_id: str) -> Dict[str, int]:
+        """캐릭터가 참조하는 문서 이름 -> 참조 수"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, ref_count FROM document_owners WHERE character_id = ?", (character_id,)
+            ).fetchall()
+        return {row["name"]: row["ref_count"] for row in rows}
+
+    def remove_owner(self, name: str, character_id: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM document_owners WHERE character_id = ? AND name = ?", (character_id, name)
+            )
+            self._commit()
+
+    def trim_owners(self, name: str, ref_count: int) -> Optional[str]:
+        """
+        문서 참조 수가 캐릭터 참조 합계보다 작아졌으면 가장 먼저 등록된 캐릭터의 참조를 하나 줄임
+
+        캐릭터를 지정하지 않은 삭제가 참조 수를 줄일 때 호출해, 소유자 없는 참조(일반 업로드)가
+        남아 있지 않으면 역색인도 같이 줄여 두 값이 어긋나지 않게 한다.
+        참조를 줄인 캐릭터 ID를 반환 (줄이지 않았으면 None).
+        """
+        with self._lock:
+            owned = self._conn.execute(
+                "SELECT COALESCE(SUM(ref_count), 0) FROM document_owners WHERE name = ?", (name,)
+            ).fetchone()[0]
+            if owned <= ref_count:
+                return None
+            row = self._conn.execute(
+                "SELECT rowid, character_id, ref_count FROM document_owners WHERE name = ? "
+                "ORDER BY rowid LIMIT 1", (name,)
+            ).fetchone()
+            if row["ref_count"] > 1:
+                self._conn.execute("UPDATE document_owners SET ref_count = ref_count - 1 WHERE rowid = ?",
+                                   (row["rowid"],))
+            else:
+                self._conn.execute("DELETE FROM document_owners WHERE rowid = ?", (row["rowid"],))
+            self._commit()
+            return row["character_id"]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE name = ?", (name,)).fetchone()
+        return self._row_to_doc(row) if row else None
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """이름 -> 문서 (없는 이름은 생략)"""
+        names = list(names)
+        docs: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for i in range(0, len(names), 500):
+                batch = names[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT * FROM documents WHERE name IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                docs.update((row["name"], self._row_to_doc(row)) for row in rows)
+        return docs
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE content_hash = ? ORDER BY id LIMIT 1", (content_hash,)
+            ).fetchone()
+        return self._row_to_doc(row) if row else None
+
+    def update_references(self, name: str, ref_count: int, aliases: Optional[List[str]] = None):
+        """참조 수/별칭 갱신 (문서 구성은 그대로이므로 세대 번호는 유지)"""
+        with self._lock:
+            if aliases is None:
+                self._conn.execute("UPDATE documents SET ref_count = ? WHERE name = ?", (ref_count, name))
+            else:
+                self._conn.execute(
+                    "UPDATE documents SET ref_count = ?, aliases = ? WHERE name = ?",
+                    (ref_count, json.dumps(aliases, ensure_ascii=False) if aliases else None, name)
+                )
+            self._commit()
+
+    def delete_many(self, names: Iterable[str]) -> int:
+        names = list(names)
+        deleted = 0
+        with self._lock:
+            for i in range(0, len(names), 500):
+                batch = names[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                deleted += self._conn.execute(
+                    f"DELETE FROM documents WHERE name IN ({placeholders})", batch
+                ).rowcount
+                self._conn.execute(f"DELETE FROM document_owners WHERE name IN ({placeholders})", batch)
+            if deleted:
+                self._bump_generation()
+            self._commit()
+        return deleted
+
+    @staticmethod
+    def _filters(kind: Optional[str], character_id: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if character_id:
+            # 역색인 기준 (다른 캐릭터가 올린 같은 내용의 문서도 포함)
+            clauses.append("name IN (SELECT name FROM document_owners WHERE character_id = ?)")
+            params.append(character_id)
+        return (" AND ".join(clauses), params)
+
+    def count(self, kind: Optional[str] = None, character_id: Optional[str] = None) -> int:
+        where, params = self._filters(kind, character_id)
+        sql = "SELECT COUNT(*) FROM documents" + (f" WHERE {where}" if where else "")
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def page(self, cursor: Optional[int] = None, limit: int = 100,
+             kind: Optional[str] = None, character_id: Optional[str] = None
+             ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        커서 기반 페이지 조회 (업로드 순)
+
+        Returns:
+            (문서 목록, 다음 페이지 커서 - 마지막 페이지면 None)
+        """
+        where, params = self._filters(kind, character_id)
+        if cursor is not None:
+            where = f"{where} AND id > ?" if where else "id > ?"
+            params.append(cursor)
+        sql = "SELECT * FROM documents"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        has_more = len(rows) > limit
+        docs = [self._row_to_doc(row) for row in rows[:limit]]
+        next_cursor = docs[-1]["id"] if has_more and docs else None
+        return docs, next_cursor
+
+    def recent(self, limit: int, kind: Optional[str] = None,
+               character_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """최근 업로드 문서 limit개 (오래된 순)"""
+        where, params = self._filters(kind, character_id)
+        sql = "SELECT * FROM documents" + (f" WHERE {where}" if where else "") + " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, [*params, limit]).fetchall()
+        return [self._row_to_doc(row) for row in reversed(rows)]
+
+    def names(self, kind: Optional[str] = None, character_id: Optional[str] = None) -> List[str]:
+        where, params = self._filters(kind, character_id)
+        sql = "SELECT name FROM documents" + (f" WHERE {where}" if where else "") + " ORDER BY id"
+        with self._lock:
+            return [row["name"] for row in self._conn.execute(sql, params)]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM document_owners")
+            self._bump_generation()
+            self._commit()
+
+    # ==================== 마이그레이션 ====================
+
+    def migrate_from_json(self, metadata_file: Path) -> int:
+        """
+        기존 file_search_metadata.json을 한 번만 가져오기
+
+        가져온 뒤 원본은 .migrated로 이름을 바꿔 다시 가져오지 않는다.
+        """
+        metadata_file = Path(metadata_file)
+        if not metadata_file.exists():
+            return 0
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except Exception as e:
+            logger.warning("메타데이터 마이그레이션 실패", extra={"error": str(e)})
+            return 0
+
+        files = metadata.get("uploaded_files", [])
+        with self.batch():
+            if metadata.get("store_name") and not self.get_info("store_name"):
+                self.set_info("store_name", metadata["store_name"])
+            for file_info in files:
+                self.add(file_info)
+
+        os.replace(metadata_file, metadata_file.with_suffix(".json.migrated"))
+        logger.info("문서 메타데이터 마이그레이션 완료", extra={"documents": len(files), "db": self.db_path.name})
+        return len(files)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
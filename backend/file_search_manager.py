@@ -4,12 +4,26 @@ File Search Manager - Gemini File Search Store API 통합
 
 import os
 import time
-import json
 import asyncio
+import hashlib
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from google import genai
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Callable, Tuple
 from google.genai import types
+from local_retrieval import LocalRetrievalIndex, extract_text
+from retrieval_cache import RetrievalCache, normalize_query
+from ingestion_jobs import OperationPoller
+from document_store import DocumentMetadataStore, classify_document
+from metrics import REGISTRY, timed
+from structured_logging import get_logger, log_payload
+from client_registry import CLIENTS
+from single_flight import SingleFlight
+
+logger = get_logger("file_search_manager")
+
+RETRIEVAL_REQUESTS = REGISTRY.counter(
+    "mate_retrieval_requests_total", "get_context calls by cache result and scope", ("cache", "scope")
+)
 
 
 class FileSearchManager:
@@ -21,66 +35,172 @@ class FileSearchManager:
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY 환경 변수가 설정되지 않았습니다")
 
-        # 클라이언트 초기화
-        self.client = genai.Client(api_key=self.api_key)
+        # 클라이언트 (AIManager와 같은 연결 풀 공유)
+        self.client = CLIENTS.gemini(self.api_key)
 
         # 메타데이터 저장 경로
         self.data_dir = Path("data")
         self.data_dir.mkdir(exist_ok=True)
         self.metadata_file = self.data_dir / "file_search_metadata.json"
 
-        # 메타데이터 로드 또는 초기화
-        self.metadata = self._load_metadata()
+        # 문서 메타데이터 저장소 (기존 JSON 파일이 있으면 한 번만 가져옴)
+        self.documents = DocumentMetadataStore(self.data_dir / "file_search_documents.db")
+        self.documents.migrate_from_json(self.metadata_file)
+
+        # 검색 모드: "remote" (Gemini File Search 추출) | "local" (로컬 BM25/하이브리드 인덱스)
+        self.retrieval_mode = os.getenv("RAG_RETRIEVAL_MODE", "remote").lower()
+        self.embedding_model = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-004")
+        use_dense = os.getenv("RAG_DENSE_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+        # 캐릭터 채팅 검색을 그 캐릭터의 문서로 제한 (원격: 메타데이터 필터, 로컬: 문서 범위)
+        self.character_scope = os.getenv("RAG_CHARACTER_SCOPE", "true").lower() in ("1", "true", "yes")
+
+        # 로컬 검색 인덱스 (메타데이터 DB와 같은 위치, 기존 JSON 인덱스가 있으면 한 번만 가져옴)
+        self.local_index = LocalRetrievalIndex(
+            self.data_dir / "local_retrieval_index.db",
+            embed_fn=self._embed_texts if use_dense else None
+        )
+        self.local_index.migrate_from_json(self.data_dir / "local_retrieval_index.json")
+
+        # get_context 결과 캐시 (Store 문서 구성이 바뀌면 무효화)
+        self.context_cache = RetrievalCache(
+            max_entries=int(os.getenv("RAG_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("RAG_CACHE_TTL", "300"))
+        )
+        # 캐시에 없는 같은 검색이 동시에 들어오면 한 번만 검색하고 결과 공유
+        self.retrieval_flight = SingleFlight("retrieval")
+
+        # 인덱싱 operation 완료 확인 (모든 업로드가 하나의 폴러 공유)
+        self.operation_poller = OperationPoller(
+            lambda operation: self.client.operations.get(operation),
+            min_interval=float(os.getenv("INGEST_POLL_MIN_INTERVAL", "1")),
+            max_interval=float(os.getenv("INGEST_POLL_MAX_INTERVAL", "15")),
+            max_concurrency=int(os.getenv("INGEST_POLL_CONCURRENCY", "4"))
+        )
+
+        # 같은 내용의 동시 업로드가 한 번만 인덱싱되도록 해시별 잠금 [잠금, 사용 중인 업로드 수]
+        # (마지막 사용자가 나가면 항목을 지워 고유 업로드마다 잠금이 쌓이지 않게 함)
+        self._upload_locks: Dict[str, List[Any]] = {}
 
         # File Search Store 초기화 또는 로드
         self.store = None
         self.store_name = None
         self._initialized = False
+        self._init_lock = asyncio.Lock()
 
-        print(f"✅ Gemini File Search Manager 초기화 완료")
+        logger.info("File Search Manager 초기화 완료", extra={"retrieval_mode": self.retrieval_mode})
 
-    def _load_metadata(self) -> Dict[str, Any]:
-        """메타데이터 파일 로드"""
-        if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠️ 메타데이터 로드 실패: {e}")
-                return {"store_name": None, "uploaded_files": []}
-        return {"store_name": None, "uploaded_files": []}
+    def batch_metadata(self):
+        """블록 안의 메타데이터 변경을 하나의 트랜잭션으로 커밋"""
+        return self.documents.batch()
 
-    def _save_metadata(self):
-        """메타데이터 파일 저장"""
+    @asynccontextmanager
+    async def _upload_lock(self, content_hash: str):
+        """내용 해시별 업로드 잠금 (참조 수가 0이 되면 제거)"""
+        entry = self._upload_locks.get(content_hash)
+        if entry is None:
+            entry = self._upload_locks[content_hash] = [asyncio.Lock(), 0]
+        entry[1] += 1
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"⚠️ 메타데이터 저장 실패: {e}")
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._upload_locks[content_hash]
+
+    def _document_set_version(self) -> str:
+        """현재 Store 문서 구성의 버전 (문서 추가/삭제마다 증가, 캐시 키에 포함)"""
+        return str(self.documents.generation())
+
+    def _on_store_changed(self):
+        """문서 추가/삭제 시 검색 캐시 무효화"""
+        self.context_cache.invalidate()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """검색 캐시 적중/미스 통계"""
+        return {
+            **self.context_cache.stats(),
+            "store_version": self._document_set_version(),
+            "in_flight": self.retrieval_flight.in_flight()
+        }
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Gemini 임베딩 모델로 텍스트 벡터 생성 (로컬 하이브리드 검색용)"""
+        vectors = []
+        for i in range(0, len(texts), 100):  # 요청당 최대 100개
+            result = self.client.models.embed_content(
+                model=self.embedding_model,
+                contents=texts[i:i + 100]
+            )
+            vectors.extend(embedding.values for embedding in result.embeddings)
+        return vectors
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        """파일 내용의 SHA-256 (청크 단위로 읽음)"""
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def _add_reference(self, file_info: Dict[str, Any], display_name: str) -> Dict[str, Any]:
+        """이미 업로드된 같은 내용의 문서에 참조 추가 (재업로드/재인덱싱 생략)"""
+        file_info['ref_count'] = file_info.get('ref_count', 1) + 1
+        aliases = file_info.get('aliases', [])
+        if display_name != file_info['display_name'] and display_name not in aliases:
+            aliases.append(display_name)
+        self.documents.update_references(file_info['name'], file_info['ref_count'], aliases)
+
+        logger.info("동일 내용 문서 재사용", extra={
+            "display_name": display_name, "document": file_info['name'], "ref_count": file_info['ref_count']
+        })
+        return {
+            "file_name": file_info['name'],
+            "display_name": display_name,
+            "uri": file_info['uri'],
+            "state": file_info.get('state', 'ACTIVE'),
+            "content_hash": file_info['content_hash'],
+            "deduplicated": True
+        }
+
+    def _index_locally(self, file_path: str, document_name: str, display_name: str):
+        """업로드된 파일을 로컬 검색 인덱스에 추가 (텍스트 추출 불가 형식은 생략)"""
+        text = extract_text(file_path)
+        if not text:
+            return
+        passage_count = self.local_index.add_document(document_name, display_name, text)
+        logger.info("로컬 인덱스 추가", extra={"display_name": display_name, "passages": passage_count})
 
     async def _ensure_store_initialized(self):
         """Store가 초기화되었는지 확인하고, 안되어 있으면 초기화"""
         if self._initialized:
             return
 
+        # 동시 업로드가 각자 새 Store를 만들지 않도록 한 번만 초기화
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize_store()
+
+    async def _initialize_store(self):
         loop = asyncio.get_event_loop()
 
         try:
             # 기존 store 확인
-            if self.metadata.get("store_name"):
+            if self.documents.get_info("store_name"):
                 try:
                     self.store = await loop.run_in_executor(
                         None,
                         lambda: self.client.file_search_stores.get(
-                            name=self.metadata["store_name"]
+                            name=self.documents.get_info("store_name")
                         )
                     )
                     self.store_name = self.store.name
-                    print(f"✅ 기존 File Search Store 로드: {self.store_name}")
+                    logger.info("기존 File Search Store 로드", extra={"store": self.store_name})
                     self._initialized = True
                     return
                 except Exception as e:
-                    print(f"⚠️ 기존 store 로드 실패, 새로 생성: {e}")
+                    logger.warning("기존 store 로드 실패, 새로 생성", extra={"error": str(e)})
 
             # 새로운 store 생성
             self.store = await loop.run_in_executor(
@@ -90,93 +210,244 @@ class FileSearchManager:
                 )
             )
             self.store_name = self.store.name
-            self.metadata["store_name"] = self.store_name
-            self._save_metadata()
+            self.documents.set_info("store_name", self.store_name)
 
-            print(f"✅ 새로운 File Search Store 생성: {self.store_name}")
+            logger.info("새 File Search Store 생성", extra={"store": self.store_name})
             self._initialized = True
 
         except Exception as e:
-            print(f"❌ File Search Store 초기화 실패: {e}")
+            logger.error("File Search Store 초기화 실패", extra={"error": str(e)})
             raise
     
-    async def upload_file(self, file_path: str, display_name: str) -> Dict[str, Any]:
+    async def upload_file(self, file_path: str, display_name: str,
+                          content_hash: Optional[str] = None,
+                          progress: Optional[Callable[[str], None]] = None,
+                          character_id: Optional[str] = None,
+                          kind: Optional[str] = None) -> Dict[str, Any]:
         """
         파일을 File Search Store에 업로드
+
+        내용(SHA-256)이 같은 문서가 이미 있으면 업로드/인덱싱 없이 참조 수만 늘린다.
+        content_hash를 넘기면 해시 계산을 생략한다 (스트리밍 업로드에서 계산된 값).
+        progress가 주어지면 단계가 바뀔 때마다 단계 이름으로 호출된다.
+        character_id가 주어지면 캐릭터 -> 문서 역색인에 등록한다 (kind: profile/conversation).
         """
+        progress = progress or (lambda stage: None)
         try:
-            # Store 초기화 확인
-            await self._ensure_store_initialized()
-
             loop = asyncio.get_event_loop()
+            if content_hash is None:
+                progress("hashing")
+                content_hash = await loop.run_in_executor(None, self._hash_file, file_path)
+
+            async with self._upload_lock(content_hash):
+                existing = self.documents.find_by_hash(content_hash)
+                if existing:
+                    if character_id:
+                        self.documents.add_owner(existing['name'], character_id,
+                                                 kind or classify_document(display_name)[0])
+                    return self._add_reference(existing, display_name)
+                return await self._upload_new_file(file_path, display_name, content_hash, progress,
+                                                   character_id, kind)
+
+        except Exception as e:
+            raise Exception(f"파일 업로드 실패: {str(e)}")
+
+    async def _upload_new_file(self, file_path: str, display_name: str, content_hash: str,
+                               progress: Callable[[str], None], character_id: Optional[str] = None,
+                               kind: Optional[str] = None) -> Dict[str, Any]:
+        """새 내용의 파일을 Store에 업로드하고 인덱싱 완료까지 대기"""
+        # Store 초기화 확인
+        await self._ensure_store_initialized()
 
-            # File Search Store에 파일 업로드
-            print(f"📤 File Search Store에 파일 업로드 중: {display_name}")
+        loop = asyncio.get_event_loop()
+
+        # File Search Store에 파일 업로드
+        logger.info("File Search Store 업로드 시작", extra={"display_name": display_name})
+        progress("uploading")
+
+        upload_config: Dict[str, Any] = {'display_name': display_name}
+        if character_id:
+            # 캐릭터별 검색 시 metadata_filter로 거를 수 있도록 소유 캐릭터 기록
+            upload_config['custom_metadata'] = [{'key': 'character_id', 'string_value': character_id}]
 
+        with timed("ingest_upload"):
             operation = await loop.run_in_executor(
                 None,
                 lambda: self.client.file_search_stores.upload_to_file_search_store(
                     file=file_path,
                     file_search_store_name=self.store_name,
-                    config={'display_name': display_name}
+                    config=upload_config
                 )
             )
 
-            # 업로드 완료 대기
-            print(f"⏳ 파일 처리 중 (청킹, 임베딩, 인덱싱)...")
-            while not operation.done:
-                await asyncio.sleep(2)
-                operation = await loop.run_in_executor(
+        # 업로드 완료 대기 (공유 폴러가 다른 업로드와 함께 적응형 간격으로 확인)
+        progress("indexing")
+        with timed("ingest_index"):
+            operation = await self.operation_poller.wait(operation)
+
+        # 완료된 operation에서 파일 정보 가져오기
+        response = operation.response
+
+        # 파일 정보 저장
+        file_info = {
+            'name': response.document_name,  # 문서의 전체 경로
+            'display_name': display_name,
+            'uri': response.document_name,  # 문서 이름이 URI 역할
+            'mime_type': 'application/pdf',  # 기본값
+            'state': 'ACTIVE',
+            'upload_time': time.time(),
+            'content_hash': content_hash,
+            'ref_count': 1
+        }
+        if character_id:
+            file_info['character_id'] = character_id
+            file_info['kind'] = kind or classify_document(display_name)[0]
+            file_info['metadata_owner'] = character_id
+
+        logger.info("File Search Store 업로드/인덱싱 완료", extra={
+            "display_name": display_name, "document": response.document_name
+        })
+
+        # 로컬 검색 인덱스에도 추가
+        progress("local_indexing")
+        try:
+            with timed("ingest_local_index"):
+                await loop.run_in_executor(
                     None,
-                    lambda: self.client.operations.get(operation)
+                    lambda: self._index_locally(file_path, response.document_name, display_name)
                 )
+        except Exception as e:
+            logger.warning("로컬 인덱싱 실패", extra={"display_name": display_name, "error": str(e)})
+
+        # 메타데이터에 추가
+        self.documents.add(file_info)
+        self._on_store_changed()
+
+        return {
+            "file_name": response.document_name,
+            "display_name": display_name,
+            "uri": response.document_name,
+            "state": "ACTIVE",
+            "content_hash": content_hash,
+            "deduplicated": False
+        }
+    
+    async def upload_files(
+        self,
+        files: List[Tuple[str, str, Optional[str]]],
+        max_concurrency: int = 4,
+        progress: Optional[Callable[[str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        여러 파일을 동시에 업로드 (동시 업로드 수 제한)
 
-            # 완료된 operation에서 파일 정보 가져오기
-            response = operation.response
-
-            # 파일 정보 저장
-            file_info = {
-                'name': response.document_name,  # 문서의 전체 경로
-                'display_name': display_name,
-                'uri': response.document_name,  # 문서 이름이 URI 역할
-                'mime_type': 'application/pdf',  # 기본값
-                'state': 'ACTIVE',
-                'upload_time': time.time()
-            }
+        메타데이터는 파일마다 인덱싱이 끝나는 즉시 커밋한다. 일괄 작업 전체를 하나의 트랜잭션으로
+        묶으면 그동안 다른 요청의 메타데이터 쓰기까지 커밋되지 않고, 도중에 중단되면
+        이미 원격에 인덱싱된 문서의 행을 잃는다.
 
-            print(f"✅ File Search Store에 파일 업로드 완료: {response.document_name}")
+        Args:
+            files: (파일 경로, 표시 이름, content_hash 또는 None) 목록
+            max_concurrency: 동시에 업로드/인덱싱할 파일 수
+            progress: "완료 수/전체 수" 문자열로 호출되는 진행 콜백
 
-            # 메타데이터에 추가
-            if 'uploaded_files' not in self.metadata:
-                self.metadata['uploaded_files'] = []
-            self.metadata['uploaded_files'].append(file_info)
-            self._save_metadata()
+        Returns:
+            입력 순서대로 파일별 결과 (실패한 파일은 success=False와 error)
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        progress = progress or (lambda stage: None)
+        finished = 0
 
-            return {
-                "file_name": response.document_name,
-                "display_name": display_name,
-                "uri": response.document_name,
-                "state": "ACTIVE"
-            }
+        async def upload_one(file_path: str, display_name: str, content_hash: Optional[str]) -> Dict[str, Any]:
+            nonlocal finished
+            async with semaphore:
+                try:
+                    result = {"success": True, **await self.upload_file(file_path, display_name, content_hash)}
+                except Exception as e:
+                    logger.warning("일괄 업로드 실패", extra={"display_name": display_name, "error": str(e)})
+                    result = {"success": False, "display_name": display_name, "error": str(e)}
+            finished += 1
+            progress(f"{finished}/{len(files)}")
+            return result
 
-        except Exception as e:
-            raise Exception(f"파일 업로드 실패: {str(e)}")
-    
-    async def get_context(self, query: str, max_results: int = 5) -> Optional[Dict[str, Any]]:
+        return list(await asyncio.gather(*(upload_one(*f) for f in files)))
+
+    async def get_context(self, query: str, max_results: int = 5,
+                          character_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        캐시를 거쳐 쿼리와 관련된 컨텍스트 반환
+
+        정규화된 쿼리 + Store 문서 구성 버전이 같으면 이전 검색 결과를 재사용하고,
+        같은 검색이 진행 중이면 새로 검색하지 않고 그 결과를 함께 기다린다.
+        character_id가 주어지면 그 캐릭터의 프로필/대화록 문서에서만 검색한다.
+        """
+        if not self.character_scope:
+            character_id = None
+        scope = "character" if character_id else "global"
+        cache_key = (self._document_set_version(), max_results, character_id, normalize_query(query))
+        cached = self.context_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("RAG 캐시 적중", extra={"scope": scope})
+            RETRIEVAL_REQUESTS.inc(cache="hit", scope=scope)
+            return dict(cached)
+
+        RETRIEVAL_REQUESTS.inc(cache="miss", scope=scope)
+
+        async def retrieve():
+            result = await self._retrieve_context(query, max_results, character_id)
+            # 검색 실패(searched_context 없음)는 캐시하지 않음
+            if result and result.get("searched_context") is not None:
+                self.context_cache.set(cache_key, result)
+            return result
+
+        with timed("retrieval"):
+            result = await self.retrieval_flight.do(cache_key, retrieve)
+        return dict(result) if result else result
+
+    def _metadata_filter(self, character_id: str, document_names: List[str]) -> Optional[str]:
+        """
+        원격 검색용 metadata_filter
+
+        캐릭터 문서가 모두 소유 캐릭터 메타데이터와 함께 업로드된 경우에만 필터를 쓴다.
+        메타데이터 도입 전 문서나 다른 캐릭터가 먼저 올린 공유 문서가 있으면
+        필터로는 찾을 수 없으므로 전체 Store 검색으로 대체한다.
+        """
+        documents = self.documents.get_many(document_names)
+        if all(doc.get('metadata_owner') == character_id for doc in documents.values()):
+            return f'character_id = "{character_id}"'
+        return None
+
+    async def _retrieve_context(self, query: str, max_results: int = 5,
+                                character_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         File Search Store를 사용하여 쿼리와 관련된 컨텍스트 반환
         Gemini를 사용해 실제로 검색하고 텍스트 추출
 
         Returns:
             컨텍스트 정보 (store_name, 검색된 텍스트 포함)
+            캐릭터 범위를 metadata_filter로 표현할 수 있으면 "metadata_filter"도 포함한다
+            (응답 생성/컨텍스트 캐시의 File Search 도구에도 같은 범위를 적용하기 위함).
         """
+        metadata_filter = None
         try:
             # Store 초기화 확인
             await self._ensure_store_initialized()
 
-            uploaded_files = self.metadata.get('uploaded_files', [])
-            if not uploaded_files:
+            # 캐릭터 범위: 역색인에 등록된 그 캐릭터의 문서만
+            scope = list(self.documents.owner_references(character_id)) if character_id else None
+            if not (len(scope) if scope is not None else self.documents.count()):
                 return None
+            if scope is not None:
+                metadata_filter = self._metadata_filter(character_id, scope)
+
+            # 로컬 인덱스 모드 (인덱스가 비어 있으면 원격 추출로 대체)
+            if self.retrieval_mode == "local" and self.local_index.passage_count():
+                context = await self._get_local_context(query, max_results, character_id, scope)
+                context["metadata_filter"] = metadata_filter
+                return context
+
+            file_search_config: Dict[str, Any] = {'file_search_store_names': [self.store_name]}
+            if metadata_filter:
+                file_search_config['metadata_filter'] = metadata_filter
 
             # Gemini를 사용해 File Search 수행하고 관련 텍스트 추출
             loop = asyncio.get_event_loop()
@@ -193,9 +464,7 @@ class FileSearchManager:
                         max_output_tokens=2000,
                         tools=[
                             types.Tool(
-                                file_search=types.FileSearch(
-                                    file_search_store_names=[self.store_name]
-                                )
+                                file_search=types.FileSearch(**file_search_config)
                             )
                         ]
                     )
@@ -205,43 +474,81 @@ class FileSearchManager:
             # 검색 결과 텍스트 추출
             searched_text = response.text if hasattr(response, 'text') and response.text else ""
 
-            print(f"🔍 RAG 검색 완료 (쿼리: {query[:50]}...)")
-            print(f"📝 추출된 컨텍스트: {searched_text[:200]}...")
+            logger.debug("RAG 검색 완료", extra={
+                "mode": "remote", "scoped": "metadata_filter" in file_search_config,
+                "context_chars": len(searched_text)
+            })
+            log_payload(logger, "추출된 컨텍스트", searched_text, query=query[:50])
 
             return {
                 "store_name": self.store_name,
-                "file_count": len(uploaded_files),
-                "files": uploaded_files[-max_results:],
+                "metadata_filter": metadata_filter,
+                "file_count": self.documents.count(character_id=character_id),
+                "files": self.documents.recent(max_results, character_id=character_id),
                 "searched_context": searched_text  # 검색된 텍스트 추가
             }
 
         except Exception as e:
-            print(f"⚠️ 컨텍스트 검색 오류: {e}")
+            logger.warning("컨텍스트 검색 오류", extra={"error": str(e)})
             # 오류 시에도 store_name은 반환 (Gemini가 직접 검색할 수 있도록)
             return {
                 "store_name": self.store_name,
-                "file_count": len(uploaded_files),
-                "files": uploaded_files[-max_results:],
+                "metadata_filter": metadata_filter,
+                "file_count": self.documents.count(character_id=character_id),
+                "files": self.documents.recent(max_results, character_id=character_id),
                 "searched_context": None
             }
     
+    async def _get_local_context(self, query: str, max_results: int, character_id: Optional[str] = None,
+                                 scope: Optional[List[str]] = None) -> Dict[str, Any]:
+        """로컬 인덱스에서 관련 패시지를 찾아 get_context와 같은 형식으로 반환 (scope: 검색할 문서 이름)"""
+        loop = asyncio.get_event_loop()
+        passages = await loop.run_in_executor(
+            None,
+            lambda: self.local_index.search(query, top_k=max_results, document_names=scope)
+        )
+
+        searched_text = "\n\n".join(
+            f"[{p['display_name']}]\n{p['text']}" for p in passages
+        )
+
+        logger.debug("RAG 검색 완료", extra={"mode": "local", "scoped": scope is not None, "passages": len(passages)})
+
+        return {
+            "store_name": self.store_name,
+            "file_count": self.documents.count(character_id=character_id),
+            "files": self.documents.recent(max_results, character_id=character_id),
+            "searched_context": searched_text or None,
+            "passages": passages
+        }
+
     def get_uploaded_files(self) -> List[Dict[str, Any]]:
-        """업로드된 파일 목록 반환"""
-        return self.metadata.get('uploaded_files', [])
+        """업로드된 파일 전체 목록 반환 (목록 화면에는 list_documents 페이지네이션 사용)"""
+        return self.documents.page(limit=self.documents.count())[0]
+
+    def get_document_count(self) -> int:
+        """업로드된 문서 수"""
+        return self.documents.count()
 
     def get_store_name(self) -> Optional[str]:
         """File Search Store 이름 반환"""
         return self.store_name
 
-    async def list_documents(self) -> Dict[str, Any]:
-        """업로드된 문서 목록"""
+    async def list_documents(self, cursor: Optional[int] = None, limit: int = 100,
+                             kind: Optional[str] = None, character_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        업로드된 문서 목록 (커서 페이지네이션, 종류/캐릭터 필터)
+
+        kind는 profile/conversation/user 중 하나
+        """
         try:
-            uploaded_files = self.metadata.get('uploaded_files', [])
+            documents, next_cursor = self.documents.page(cursor, limit, kind, character_id)
             return {
                 "success": True,
                 "store_name": self.store_name,
-                "documents": uploaded_files,
-                "count": len(uploaded_files)
+                "documents": documents,
+                "count": self.documents.count(kind, character_id),
+                "next_cursor": next_cursor
             }
         except Exception as e:
             return {
@@ -251,62 +558,164 @@ class FileSearchManager:
                 "count": 0
             }
 
-    async def delete_document(self, document_id: str) -> Dict[str, Any]:
-        """문서 삭제"""
-        try:
-            loop = asyncio.get_event_loop()
+    # 일시적 오류로 보고 재시도할 오류 메시지 키워드
+    TRANSIENT_ERRORS = ("rate_limit", "quota", "timeout", "503", "502", "500", "429", "resource_exhausted", "unavailable")
 
-            # File Search Store에서 파일 삭제
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.files.delete(name=document_id)
+    async def _delete_remote(self, document_id: str, retries: int) -> Optional[str]:
+        """원격 문서 삭제 (일시적 오류는 지수 백오프로 재시도). 실패 시 오류 메시지 반환"""
+        loop = asyncio.get_event_loop()
+        retry_delay = 1  # 초
+        for attempt in range(retries):
+            try:
+                await loop.run_in_executor(None, lambda: self.client.files.delete(name=document_id))
+                return None
+            except Exception as e:
+                error_msg = str(e)
+                # 이미 없는 문서는 삭제된 것으로 처리
+                if "404" in error_msg or "not_found" in error_msg.lower():
+                    return None
+                if any(keyword in error_msg.lower() for keyword in self.TRANSIENT_ERRORS) and attempt < retries - 1:
+                    await asyncio.sleep(retry_delay)
+                    retry_delay *= 2  # 지수 백오프
+                    continue
+                return error_msg
+        return "재시도 횟수 초과"
+
+    async def delete_documents(
+        self,
+        document_ids: List[str],
+        max_concurrency: int = 8,
+        retries: int = 3,
+        force: bool = False,
+        progress: Optional[Callable[[str], None]] = None,
+        character_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        여러 문서를 동시에 삭제하고 메타데이터/로컬 인덱스는 끝날 때 한 번만 갱신
+
+        Args:
+            document_ids: 삭제할 문서 이름 목록
+            max_concurrency: 동시에 보낼 삭제 요청 수
+            retries: 문서별 최대 시도 횟수 (일시적 오류만 재시도)
+            force: True면 참조 수와 관계없이 원격 문서 삭제 (전체 삭제용)
+            progress: "완료 수/전체 수" 문자열로 호출되는 진행 콜백
+            character_id: 주어지면 그 캐릭터가 가진 참조만큼만 참조 수를 줄임 (캐릭터 초기화용)
+
+        Returns:
+            deleted(원격 삭제), dereferenced(참조 수만 감소), failed 개수와 문서별 결과
+        """
+        progress = progress or (lambda stage: None)
+        files_by_name = self.documents.get_many(document_ids)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        owned = self.documents.owner_references(character_id) if character_id else {}
+        results: Dict[str, Dict[str, Any]] = {}
+        to_delete: List[str] = []
+
+        # 같은 내용으로 여러 번 업로드된 문서는 참조 수만 줄임
+        with self.batch_metadata():
+            for document_id in dict.fromkeys(document_ids):
+                file_info = files_by_name.get(document_id)
+                released = owned.get(document_id, 1)
+                if not force and file_info and file_info.get('ref_count', 1) > released:
+                    file_info['ref_count'] -= released
+                    self.documents.update_references(document_id, file_info['ref_count'])
+                    if character_id:
+                        self.documents.remove_owner(document_id, character_id)
+                    else:
+                        # 일반 업로드 참조가 남아 있지 않으면 소유 캐릭터의 참조를 줄임
+                        self.documents.trim_owners(document_id, file_info['ref_count'])
+                    results[document_id] = {"document_id": document_id, "status": "dereferenced",
+                                            "remaining_references": file_info['ref_count']}
+                else:
+                    to_delete.append(document_id)
+
+        finished = 0
+
+        async def delete_one(document_id: str):
+            nonlocal finished
+            async with semaphore:
+                error = await self._delete_remote(document_id, retries)
+            results[document_id] = (
+                {"document_id": document_id, "status": "deleted", "remaining_references": 0}
+                if error is None else
+                {"document_id": document_id, "status": "failed", "error": error}
             )
+            finished += 1
+            if finished % 50 == 0 or finished == len(to_delete):
+                logger.info("문서 삭제 진행", extra={"finished": finished, "total": len(to_delete)})
+            progress(f"{finished}/{len(to_delete)}")
+
+        await asyncio.gather(*(delete_one(document_id) for document_id in to_delete))
+
+        # 메타데이터/로컬 인덱스 한 번에 반영 (삭제 실패한 문서는 남겨 재시도 가능하게)
+        deleted = {d for d in to_delete if results[d]["status"] == "deleted"}
+        if deleted:
+            self.local_index.remove_documents(list(deleted))
+            self.documents.delete_many(deleted)
+            self._on_store_changed()
+
+        statuses = [r["status"] for r in results.values()]
+        return {
+            "deleted": statuses.count("deleted"),
+            "dereferenced": statuses.count("dereferenced"),
+            "failed": statuses.count("failed"),
+            "results": [results[d] for d in dict.fromkeys(document_ids)]
+        }
 
-            # 메타데이터에서 제거
-            uploaded_files = self.metadata.get('uploaded_files', [])
-            self.metadata['uploaded_files'] = [
-                f for f in uploaded_files
-                if f['name'] != document_id
-            ]
-            self._save_metadata()
+    async def delete_document(self, document_id: str) -> Dict[str, Any]:
+        """
+        문서 삭제
 
-            return {
-                "success": True,
-                "message": "문서가 File Search Store에서 삭제되었습니다",
-                "document_id": document_id
-            }
-        except Exception as e:
+        같은 내용으로 여러 번 업로드되어 참조가 남아 있으면 참조 수만 줄이고,
+        마지막 참조가 삭제될 때 Store에서 실제로 삭제한다.
+        """
+        report = await self.delete_documents([document_id])
+        result = report["results"][0]
+        if result["status"] == "failed":
             return {
                 "success": False,
-                "error": str(e)
+                "error": result["error"]
             }
-
-    async def clear_all_documents(self) -> Dict[str, Any]:
-        """모든 문서 삭제"""
+        return {
+            "success": True,
+            "message": "문서가 File Search Store에서 삭제되었습니다" if result["status"] == "deleted"
+            else "문서 참조가 삭제되었습니다 (다른 업로드가 같은 문서를 사용 중)",
+            "document_id": document_id,
+            "remaining_references": result["remaining_references"]
+        }
+
+    async def delete_character_documents(
+        self,
+        character_id: str,
+        progress: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """캐릭터 역색인에 등록된 프로필/대화록 문서 삭제 (다른 캐릭터와 공유 중이면 참조만 해제)"""
+        return await self.delete_documents(
+            list(self.documents.owner_references(character_id)),
+            max_concurrency=int(os.getenv("DELETE_CONCURRENCY", "8")),
+            progress=progress,
+            character_id=character_id
+        )
+
+    async def clear_all_documents(self, progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """모든 문서 삭제 (삭제 실패한 문서는 목록에 남음)"""
         try:
-            uploaded_files = self.metadata.get('uploaded_files', [])
-            deleted_count = 0
-
-            loop = asyncio.get_event_loop()
-
-            for file_info in uploaded_files:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda name=file_info['name']: self.client.files.delete(name=name)
-                    )
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"⚠️ 파일 삭제 실패 ({file_info['name']}): {e}")
-
-            # 메타데이터 초기화
-            self.metadata['uploaded_files'] = []
-            self._save_metadata()
+            document_ids = self.documents.names()
+            report = await self.delete_documents(
+                document_ids,
+                max_concurrency=int(os.getenv("DELETE_CONCURRENCY", "8")),
+                force=True,
+                progress=progress
+            )
+            if not report["failed"]:
+                self.local_index.clear()
 
             return {
-                "success": True,
-                "message": f"{deleted_count}개 문서가 삭제되었습니다",
-                "deleted_count": deleted_count
+                "success": report["failed"] == 0,
+                "message": f"{report['deleted']}개 문서가 삭제되었습니다",
+                "deleted_count": report["deleted"],
+                "failed_count": report["failed"],
+                "failed": [r for r in report["results"] if r["status"] == "failed"]
             }
         except Exception as e:
             return {
@@ -0,0 +1,171 @@
+"""
+Chat History Store - SQLite(WAL) 기반 영구 대화 히스토리
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+# 메시지 행의 기본 컬럼 (나머지 필드는 extra JSON으로 저장)
+_CORE_FIELDS = ("type", "ai_name", "message", "timestamp")
+
+
+class ChatHistoryStore:
+    """세션/캐릭터/시간 인덱스를 가진 대화 히스토리 저장소"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                character_id TEXT,
+                type TEXT NOT NULL,
+                ai_name TEXT,
+                message TEXT,
+                timestamp TEXT NOT NULL,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+            CREATE INDEX IF NOT EXISTS idx_messages_character ON messages(character_id, id);
+            CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_messages_shard ON messages(session_id, character_id, id);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"id": row["id"], "type": row["type"], "message": row["message"],
+                                 "timestamp": row["timestamp"]}
+        if row["ai_name"]:
+            entry["ai_name"] = row["ai_name"]
+        if row["session_id"]:
+            entry["session_id"] = row["session_id"]
+        if row["character_id"]:
+            entry["character_id"] = row["character_id"]
+        if row["extra"]:
+            entry.update(json.loads(row["extra"]))
+        return entry
+
+    @staticmethod
+    def _filters(session_id: Optional[str], character_id: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if character_id:
+            clauses.append("character_id = ?")
+            params.append(character_id)
+        return (" AND ".join(clauses), params)
+
+    def append(self, entry: Dict[str, Any], session_id: Optional[str] = None,
+               character_id: Optional[str] = None) -> int:
+        """히스토리 항목 저장 후 id(커서) 반환"""
+        extra = {k: v for k, v in entry.items() if k not in _CORE_FIELDS}
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (session_id, character_id, type, ai_name, message, timestamp, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    character_id,
+                    entry["type"],
+                    entry.get("ai_name"),
+                    entry.get("message"),
+                    entry["timestamp"],
+                    json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+                )
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def page(self, cursor: Optional[int] = None, limit: int = 100,
+             session_id: Optional[str] = None, character_id: Optional[str] = None
+             ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        커서 기반 페이지 조회 (오래된 순)
+
+        Returns:
+            (항목 목록, 다음 페이지 커서 - 마지막 페이지면 None)
+        """
+        where, params = self._filters(session_id, character_id)
+        if cursor is not None:
+            where = f"{where} AND id > ?" if where else "id > ?"
+            params.append(cursor)
+        sql = "SELECT * FROM messages"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        has_more = len(rows) > limit
+        entries = [self._row_to_entry(row) for row in rows[:limit]]
+        next_cursor = entries[-1]["id"] if has_more and entries else None
+        return entries, next_cursor
+
+    def iter_entries(self, cursor: Optional[int] = None, batch_size: int = 500,
+                     session_id: Optional[str] = None, character_id: Optional[str] = None
+                     ) -> Iterator[List[Dict[str, Any]]]:
+        """전체 히스토리를 배치 단위로 순회 (스트리밍 응답용)"""
+        while True:
+            entries, cursor = self.page(cursor, batch_size, session_id, character_id)
+            if entries:
+                yield entries
+            if cursor is None:
+                return
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """최근 항목 limit개 (오래된 순) - 재시작 시 hot window 복원용"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM messages ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_entry(row) for row in reversed(rows)]
+
+    def recent_in_shard(self, session_id: Optional[str], character_id: Optional[str],
+                        limit: int) -> List[Dict[str, Any]]:
+        """
+        한 대화 샤드의 최근 항목 limit개 (오래된 순)
+
+        page()의 필터와 달리 None도 값으로 취급해 정확히 같은 (session_id, character_id)만 조회한다.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM messages WHERE session_id IS ? AND character_id IS ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, character_id, limit)
+            ).fetchall()
+        return [self._row_to_entry(row) for row in reversed(rows)]
+
+    def count(self, session_id: Optional[str] = None, character_id: Optional[str] = None) -> int:
+        """조건에 맞는 항목 수"""
+        where, params = self._filters(session_id, character_id)
+        sql = "SELECT COUNT(*) FROM messages" + (f" WHERE {where}" if where else "")
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def clear(self, character_id: Optional[str] = None):
+        """히스토리 삭제 (character_id가 주어지면 해당 캐릭터 대화만)"""
+        with self._lock:
+            if character_id:
+                self._conn.execute("DELETE FROM messages WHERE character_id = ?", (character_id,))
+            else:
+                self._conn.execute("DELETE FROM messages")
+            self._conn.commit()
+
+    def close(self):
+        """연결 종료"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,209 @@
+"""
+History Window - 토큰 예산 기반 대화 히스토리 윈도잉 + 누적 요약
+
+최근 턴을 토큰 예산 안에 채워 넣고, 윈도우 밖으로 밀려난 오래된 턴은
+증분으로 유지되는 요약에 접어 넣는다. 턴별 렌더링 결과는 캐시되므로
+새 턴이 추가될 때는 새 턴만 렌더링/토큰 계산 비용이 든다.
+"""
+
+import re
+import math
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+_HANGUL = re.compile(r"[ᄀ-ᇿ㄰-㆏가-힣]")
+_CJK = re.compile(r"[぀-ヿ一-鿿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    한국어를 고려한 토큰 수 추정
+
+    Gemini 토크나이저에서 한글은 대략 음절 1~1.5개당 1토큰, 영문/숫자/기호는
+    약 4글자당 1토큰이므로 문자 종류별로 나눠 센다.
+    """
+    if not text:
+        return 0
+    hangul = len(_HANGUL.findall(text))
+    cjk = len(_CJK.findall(text))
+    other = len(text) - hangul - cjk - text.count(" ")
+    return math.ceil(hangul * 0.8 + cjk + other / 4)
+
+
+def _entry_key(msg: Dict[str, Any]) -> Tuple:
+    return (msg.get("timestamp"), msg.get("type"), msg.get("ai_name"), msg.get("message"))
+
+
+class _ConversationState:
+    def __init__(self):
+        self.summary_lines: List[str] = []
+        self.summary_tokens = 0
+        # 요약에 가장 최근에 접어 넣은 항목의 키
+        self.folded_upto: Optional[Tuple] = None
+
+
+class HistoryWindow:
+    """대화별 토큰 예산 윈도우와 누적 요약 관리"""
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        summary_budget: int = 400,
+        max_message_tokens: Optional[int] = None,
+        render_cache_size: int = 4096,
+        max_conversations: int = 1000
+    ):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_message_tokens = max_message_tokens or max(1, token_budget // 2)
+        self.render_cache_size = render_cache_size
+        self.max_conversations = max_conversations
+
+        self._lock = threading.Lock()
+        self._render_cache: "OrderedDict[Tuple, Tuple[str, int]]" = OrderedDict()
+        # 대화 샤드별 요약 상태 (오래 쓰이지 않은 대화부터 제거, 다시 오면 요약을 새로 만듦)
+        self._states: "OrderedDict[str, _ConversationState]" = OrderedDict()
+
+    # ==================== 렌더링 ====================
+
+    @staticmethod
+    def _speaker(msg: Dict[str, Any]) -> Optional[str]:
+        if msg.get("type") == "user":
+            return "User"
+        if msg.get("type") == "ai":
+            return msg.get("ai_name", "AI")
+        return None
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """토큰 상한을 넘는 메시지를 앞부분만 남기고 자르기"""
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if estimate_tokens(text[:mid]) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low] + " …(생략)"
+
+    def _render(self, msg: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        """턴 하나를 (렌더링 문자열, 토큰 수)로 변환 (캐시)"""
+        speaker = self._speaker(msg)
+        if speaker is None:
+            return None
+
+        key = _entry_key(msg)
+        cached = self._render_cache.get(key)
+        if cached is not None:
+            self._render_cache.move_to_end(key)
+            return cached
+
+        text = self._truncate(msg.get("message") or "", self.max_message_tokens)
+        line = f"{speaker}: {text}"
+        rendered = (line, estimate_tokens(line))
+
+        self._render_cache[key] = rendered
+        while len(self._render_cache) > self.render_cache_size:
+            self._render_cache.popitem(last=False)
+        return rendered
+
+    # ==================== 요약 ====================
+
+    @staticmethod
+    def _summarize_line(msg: Dict[str, Any], speaker: str) -> str:
+        """요약용 한 줄 (첫 문장, 최대 80자)"""
+        text = re.sub(r"\s+", " ", msg.get("message") or "").strip()
+        first = re.split(r"(?<=[.!?。])\s|\n", text, maxsplit=1)[0]
+        if len(first) > 80:
+            first = first[:80] + "…"
+        return f"- {speaker}: {first}"
+
+    def _fold(self, state: _ConversationState, entries: List[Dict[str, Any]]):
+        """윈도우 밖으로 밀려난 턴을 요약에 추가하고 예산을 넘으면 가장 오래된 줄부터 제거"""
+        for msg in entries:
+            speaker = self._speaker(msg)
+            if speaker is None:
+                continue
+            line = self._summarize_line(msg, speaker)
+            state.summary_lines.append(line)
+            state.summary_tokens += estimate_tokens(line)
+
+        while state.summary_lines and state.summary_tokens > self.summary_budget:
+            state.summary_tokens -= estimate_tokens(state.summary_lines.pop(0))
+
+    def _update_summary(self, state: _ConversationState, history: List[Dict[str, Any]], window_start: int):
+        """이전 호출 이후 새로 윈도우 밖으로 나간 턴만 요약에 반영"""
+        newly_folded: List[Dict[str, Any]] = []
+        found = state.folded_upto is None
+        for i in range(window_start - 1, -1, -1):
+            if state.folded_upto is not None and _entry_key(history[i]) == state.folded_upto:
+                found = True
+                break
+            newly_folded.append(history[i])
+
+        if not found:
+            # 히스토리가 초기화/교체되었으면 요약을 다시 만든다
+            state.summary_lines, state.summary_tokens = [], 0
+
+        if newly_folded:
+            self._fold(state, list(reversed(newly_folded)))
+        if window_start > 0:
+            state.folded_upto = _entry_key(history[window_start - 1])
+        elif not found:
+            state.folded_upto = None
+
+    def _get_state(self, conversation_key: str) -> _ConversationState:
+        state = self._states.get(conversation_key)
+        if state is None:
+            state = self._states[conversation_key] = _ConversationState()
+            while len(self._states) > self.max_conversations:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(conversation_key)
+        return state
+
+    # ==================== 포맷팅 ====================
+
+    def format(self, history: List[Dict[str, Any]], conversation_key: str = "global",
+               max_entries: Optional[int] = None) -> str:
+        """토큰 예산 안의 최근 턴 + 오래된 턴 요약을 프롬프트 문자열로 반환"""
+        if not history:
+            return ""
+
+        with self._lock:
+            lines: List[str] = []
+            used = 0
+            window_start = len(history)
+            lower = max(0, len(history) - max_entries) if max_entries else 0
+
+            for i in range(len(history) - 1, lower - 1, -1):
+                rendered = self._render(history[i])
+                if rendered is None:
+                    window_start = i
+                    continue
+                line, tokens = rendered
+                if used + tokens > self.token_budget and lines:
+                    break
+                lines.append(line)
+                used += tokens
+                window_start = i
+
+            state = self._get_state(conversation_key)
+            self._update_summary(state, history, window_start)
+
+            parts = []
+            if state.summary_lines:
+                parts.append("<이전 대화 요약>\n" + "\n".join(state.summary_lines) + "\n</이전 대화 요약>")
+            if lines:
+                parts.append("<이전 대화>\n" + "\n".join(reversed(lines)) + "\n</이전 대화>")
+
+        if parts:
+            return "\n\n" + "\n".join(parts) + "\n"
+        return ""
+
+    def reset(self, conversation_key: str = "global"):
+        """대화 요약 상태 초기화"""
+        with self._lock:
+            self._states.pop(conversation_key, None)
@@ -0,0 +1,240 @@
+"""
+Ingestion Jobs - 비동기 문서 인덱싱 작업 + 공유 operation 폴러
+
+업로드 요청은 작업 ID만 받고 바로 반환되며, 실제 업로드/인덱싱은 백그라운드에서 진행된다.
+File Search operation 완료 확인은 업로드마다 따로 폴링하지 않고 하나의 폴러가
+대기 중인 모든 operation을 주기마다 함께 확인한다 (동시 요청 수 제한, 적응형 백오프).
+"""
+
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Awaitable, AsyncIterator
+
+from structured_logging import get_logger
+
+logger = get_logger("ingestion_jobs")
+
+
+class _PendingOperation:
+    def __init__(self, operation: Any, future: asyncio.Future, interval: float):
+        self.operation = operation
+        self.future = future
+        self.interval = interval
+        self.next_check = time.monotonic() + interval
+        self.failures = 0
+
+
+class OperationPoller:
+    """대기 중인 long-running operation을 한 곳에서 폴링"""
+
+    def __init__(
+        self,
+        get_operation: Callable[[Any], Any],
+        min_interval: float = 1.0,
+        max_interval: float = 15.0,
+        backoff: float = 1.5,
+        max_concurrency: int = 4
+    ):
+        """
+        Args:
+            get_operation: operation -> 갱신된 operation (동기 SDK 호출, executor에서 실행)
+            min_interval: 첫 확인까지의 간격
+            max_interval: 확인 간격 상한
+            backoff: 완료되지 않았을 때 간격 증가 배수
+            max_concurrency: 한 번에 보내는 상태 조회 요청 수 상한
+        """
+        self.get_operation = get_operation
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._pending: List[_PendingOperation] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+
+    async def wait(self, operation: Any) -> Any:
+        """operation이 완료될 때까지 대기 후 완료된 operation 반환"""
+        if getattr(operation, "done", False):
+            return operation
+
+        loop = asyncio.get_event_loop()
+        pending = _PendingOperation(operation, loop.create_future(), self.min_interval)
+        self._pending.append(pending)
+        self._ensure_running()
+        self._wakeup.set()
+        return await pending.future
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _check(self, pending: _PendingOperation, semaphore: asyncio.Semaphore):
+        loop = asyncio.get_event_loop()
+        async with semaphore:
+            try:
+                pending.operation = await loop.run_in_executor(None, self.get_operation, pending.operation)
+            except Exception as e:
+                # 일시적 오류는 다음 주기에 재시도, 연속 실패가 길어지면 대기자에게 전달
+                pending.failures += 1
+                if pending.failures >= 10 and not pending.future.done():
+                    pending.future.set_exception(e)
+                    return
+            else:
+                self.polls += 1
+                if pending.operation.done:
+                    if not pending.future.done():
+                        pending.future.set_result(pending.operation)
+                    return
+
+        pending.interval = min(self.max_interval, pending.interval * self.backoff)
+        pending.next_check = time.monotonic() + pending.interval
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            # 대기자가 취소한 operation은 더 이상 확인하지 않음
+            self._pending = [p for p in self._pending if not p.future.done()]
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            due = [p for p in self._pending if p.next_check <= now]
+            if due:
+                await asyncio.gather(*(self._check(p, semaphore) for p in due))
+                continue
+
+            delay = min(p.next_check for p in self._pending) - now
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending_operations": len(self._pending), "polls": self.polls}
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 작업 상태: queued → running → completed | failed
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class IngestionJobManager:
+    """백그라운드 인덱싱 작업 실행/상태 조회/진행 상황 구독"""
+
+    def __init__(self, max_concurrent_jobs: int = 4, max_retained_jobs: int = 500):
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent_jobs))
+        self.max_retained_jobs = max_retained_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, filename: str,
+               run: Callable[[Callable[[str], None]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        작업 등록 후 즉시 반환
+
+        Args:
+            filename: 작업 대상 파일명 (표시용)
+            run: progress(stage) 콜백을 받아 결과 dict를 반환하는 코루틴 함수
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "filename": filename,
+            "status": "queued",
+            "stage": "queued",
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self._jobs[job_id] = job
+        self._prune()
+        self._tasks[job_id] = asyncio.create_task(self._execute(job_id, run))
+        return dict(job)
+
+    def _prune(self):
+        """보관 개수를 넘으면 끝난 작업부터 제거"""
+        excess = len(self._jobs) - self.max_retained_jobs
+        for job_id in [jid for jid, job in self._jobs.items() if job["status"] in TERMINAL_STATUSES]:
+            if excess <= 0:
+                break
+            self._jobs.pop(job_id, None)
+            excess -= 1
+
+    def _update(self, job_id: str, **fields):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields, updated_at=time.time())
+        snapshot = dict(job)
+        for queue in self._subscribers.get(job_id, []):
+            queue.put_nowait(snapshot)
+
+    async def _execute(self, job_id: str, run):
+        try:
+            async with self._semaphore:
+                self._update(job_id, status="running", stage="starting")
+                result = await run(lambda stage: self._update(job_id, stage=stage))
+            self._update(job_id, status="completed", stage="completed", result=result)
+        except Exception as e:
+            logger.error("인덱싱 작업 실패", extra={"job_id": job_id, "error": str(e)})
+            self._update(job_id, status="failed", stage="failed", error=str(e))
+        finally:
+            self._tasks.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [dict(job) for job in self._jobs.values() if status is None or job["status"] == status]
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """현재 상태부터 시작해 상태가 바뀔 때마다 스냅샷을 내보내고, 끝나면 종료"""
+        job = self.get(job_id)
+        if job is None:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            yield job
+            while job["status"] not in TERMINAL_STATUSES:
+                job = await queue.get()
+                yield job
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """작업이 끝날 때까지 대기 후 최종 상태 반환"""
+        task = self._tasks.get(job_id)
+        if task:
+            await asyncio.shield(task)
+        return self.get(job_id)
+
+    async def stop(self):
+        """종료 시 진행 중인 작업 완료 대기"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
@@ -0,0 +1,406 @@
+"""
+Local Retrieval Index - 한국어 BM25 + (선택) Dense 벡터 하이브리드 검색
+
+패시지는 SQLite에 한 행씩 저장되어 문서 추가/삭제 시 해당 문서의 행만 쓴다
+(역색인은 시작 시 메모리에서 재구성).
+"""
+
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from collections import Counter
+from typing import Optional, Dict, Any, List, Callable, Iterable
+
+from structured_logging import get_logger
+
+logger = get_logger("local_retrieval")
+
+# 선택적 문서 파서 (없으면 해당 형식은 로컬 인덱싱 생략)
+try:
+    from pypdf import PdfReader
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+try:
+    import docx
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.json', '.csv'}
+
+_TOKEN_PATTERN = re.compile(r"[0-9a-z]+|[가-힣]+")
+_HANGUL_PATTERN = re.compile(r"[가-힣]+")
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    한국어/영어 혼합 텍스트 토큰화
+
+    한글 어절은 조사/어미가 붙어 형태가 달라지므로("학교에서" vs "학교")
+    어절 전체와 함께 음절 bigram을 색인해 형태소 분석기 없이도 매칭되도록 한다.
+    """
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(word)
+        if len(word) > 1 and _HANGUL_PATTERN.fullmatch(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def split_passages(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
+    """문단 경계를 우선으로 텍스트를 검색 단위 패시지로 분할"""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    passages: List[str] = []
+    current = ""
+
+    for paragraph in paragraphs:
+        # 한 문단이 너무 길면 고정 길이 창으로 자른다
+        while len(paragraph) > chunk_size:
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(paragraph[:chunk_size])
+            paragraph = paragraph[chunk_size - overlap:]
+
+        if current and len(current) + len(paragraph) + 1 > chunk_size:
+            passages.append(current)
+            current = current[-overlap:] + "\n" + paragraph if overlap else paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+
+    if current:
+        passages.append(current)
+    return passages
+
+
+def extract_text(file_path: str) -> Optional[str]:
+    """로컬 인덱싱용 텍스트 추출 (지원하지 않는 형식은 None)"""
+    ext = Path(file_path).suffix.lower()
+    try:
+        if ext in TEXT_EXTENSIONS:
+            return Path(file_path).read_text(encoding='utf-8', errors='ignore')
+        if ext == '.pdf' and PDF_AVAILABLE:
+            reader = PdfReader(file_path)
+            return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+        if ext == '.docx' and DOCX_AVAILABLE:
+            document = docx.Document(file_path)
+            return "\n\n".join(p.text for p in document.paragraphs)
+    except Exception as e:
+        logger.warning("텍스트 추출 실패", extra={"path": str(file_path), "error": str(e)})
+    return None
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+def _pack_vector(vector: Optional[List[float]]) -> Optional[bytes]:
+    return array("f", vector).tobytes() if vector else None
+
+
+def _unpack_vector(blob: Optional[bytes]) -> Optional[List[float]]:
+    return array("f", blob).tolist() if blob else None
+
+
+class LocalRetrievalIndex:
+    """BM25 역색인 기반 로컬 검색 엔진 (Dense 벡터 RRF 융합 선택)"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        embed_fn: Optional[EmbedFn] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        rrf_k: int = 60
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.embed_fn = embed_fn
+        self.k1 = k1
+        self.b = b
+        self.rrf_k = rrf_k
+
+        self._lock = threading.RLock()
+        self._passages: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_passages: Dict[str, List[int]] = {}
+        self._total_length = 0
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_name TEXT NOT NULL,
+                display_name TEXT NOT NULL,
+                text TEXT NOT NULL,
+                vector BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idx_passages_document ON passages(document_name);
+        """)
+        self._conn.commit()
+
+        self._load()
+
+    # ==================== 영속화 ====================
+
+    def _load(self):
+        """저장된 패시지를 읽어 역색인 재구성"""
+        try:
+            rows = self._conn.execute(
+                "SELECT id, document_name, display_name, text, vector FROM passages ORDER BY id"
+            )
+            for pid, document_name, display_name, text, vector in rows:
+                self._add_passage(pid, document_name, display_name, text, _unpack_vector(vector))
+        except Exception as e:
+            logger.warning("로컬 검색 인덱스 로드 실패", extra={"error": str(e)})
+
+    def _insert_rows(self, document_name: str, display_name: str, passages: List[str],
+                     vectors: List[Optional[List[float]]]) -> List[int]:
+        """패시지 행 추가 (커밋은 호출한 쪽에서). 새 패시지 id 목록 반환"""
+        pids = []
+        for passage, vector in zip(passages, vectors):
+            cursor = self._conn.execute(
+                "INSERT INTO passages (document_name, display_name, text, vector) VALUES (?, ?, ?, ?)",
+                (document_name, display_name, passage, _pack_vector(vector))
+            )
+            pids.append(cursor.lastrowid)
+        return pids
+
+    def migrate_from_json(self, index_file: Path) -> int:
+        """
+        기존 JSON 인덱스 파일(local_retrieval_index.json)을 한 번만 가져오기
+
+        저장된 벡터를 그대로 옮기므로 임베딩을 다시 계산하지 않는다.
+        가져온 뒤 원본은 .migrated로 이름을 바꿔 다시 가져오지 않는다.
+        """
+        index_file = Path(index_file)
+        if not index_file.exists():
+            return 0
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                passages = json.load(f).get("passages", [])
+        except Exception as e:
+            logger.warning("로컬 검색 인덱스 마이그레이션 실패", extra={"error": str(e)})
+            return 0
+
+        with self._lock:
+            try:
+                pids = [
+                    self._insert_rows(p["document_name"], p["display_name"], [p["text"]], [p.get("vector")])[0]
+                    for p in passages
+                ]
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            for pid, p in zip(pids, passages):
+                self._add_passage(pid, p["document_name"], p["display_name"], p["text"], p.get("vector"))
+
+        os.replace(index_file, index_file.with_suffix(".json.migrated"))
+        logger.info("로컬 검색 인덱스 마이그레이션 완료", extra={"passages": len(passages), "db": self.db_path.name})
+        return len(passages)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ==================== 색인 ====================
+
+    def _add_passage(self, pid: int, document_name: str, display_name: str, text: str,
+                     vector: Optional[List[float]] = None):
+        tokens = tokenize(text)
+
+        self._passages[pid] = {
+            "document_name": document_name,
+            "display_name": display_name,
+            "text": text,
+            "length": len(tokens),
+            "vector": vector
+        }
+        self._doc_passages.setdefault(document_name, []).append(pid)
+        self._total_length += len(tokens)
+
+        for term, tf in Counter(tokens).items():
+            self._postings.setdefault(term, {})[pid] = tf
+
+    def _remove_passages(self, document_name: str):
+        for pid in self._doc_passages.pop(document_name, []):
+            passage = self._passages.pop(pid)
+            self._total_length -= passage["length"]
+            for term in set(tokenize(passage["text"])):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(pid, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add_document(self, document_name: str, display_name: str, text: str) -> int:
+        """문서를 패시지로 나눠 색인 (같은 문서는 교체). 색인된 패시지 수 반환"""
+        passages = split_passages(text)
+        vectors: List[Optional[List[float]]] = [None] * len(passages)
+
+        if self.embed_fn and passages:
+            try:
+                vectors = list(self.embed_fn(passages))
+            except Exception as e:
+                logger.warning("임베딩 생성 실패, BM25만 사용", extra={"error": str(e)})
+
+        with self._lock:
+            # 이 문서의 행만 교체 (한 트랜잭션)
+            try:
+                self._conn.execute("DELETE FROM passages WHERE document_name = ?", (document_name,))
+                pids = self._insert_rows(document_name, display_name, passages, vectors)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._remove_passages(document_name)
+            for pid, passage, vector in zip(pids, passages, vectors):
+                self._add_passage(pid, document_name, display_name, passage, vector)
+
+        return len(passages)
+
+    def remove_document(self, document_name: str):
+        """문서의 모든 패시지 제거"""
+        self.remove_documents([document_name])
+
+    def remove_documents(self, document_names: List[str]):
+        """여러 문서의 패시지를 한 트랜잭션으로 제거"""
+        with self._lock:
+            removed = [name for name in document_names if name in self._doc_passages]
+            if not removed:
+                return
+            try:
+                self._conn.executemany("DELETE FROM passages WHERE document_name = ?",
+                                       [(name,) for name in removed])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            for document_name in removed:
+                self._remove_passages(document_name)
+
+    def clear(self):
+        """전체 인덱스 초기화"""
+        with self._lock:
+            self._conn.execute("DELETE FROM passages")
+            self._conn.commit()
+            self._passages.clear()
+            self._postings.clear()
+            self._doc_passages.clear()
+            self._total_length = 0
+
+    def passage_count(self) -> int:
+        """색인된 패시지 수"""
+        return len(self._passages)
+
+    def has_document(self, document_name: str) -> bool:
+        """문서가 로컬 인덱스에 있는지 확인"""
+        return document_name in self._doc_passages
+
+    # ==================== 검색 ====================
+
+    def _candidates(self, document_names: Optional[Iterable[str]]) -> Optional[List[int]]:
+        """검색 범위를 주어진 문서의 패시지로 제한 (None이면 전체)"""
+        if document_names is None:
+            return None
+        return [pid for name in document_names for pid in self._doc_passages.get(name, [])]
+
+    def _bm25_scores(self, query_tokens: Iterable[str],
+                     candidates: Optional[List[int]] = None) -> Dict[int, float]:
+        n = len(self._passages)
+        avg_length = self._total_length / n if n else 0.0
+        scores: Dict[int, float] = {}
+
+        for term in set(query_tokens):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            # 범위가 주어지면 전체 posting 대신 범위 안의 패시지만 확인
+            matches = postings.items() if candidates is None else (
+                (pid, postings[pid]) for pid in candidates if pid in postings
+            )
+            for pid, tf in matches:
+                length_norm = 1 - self.b + self.b * self._passages[pid]["length"] / (avg_length or 1)
+                scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        return scores
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """쿼리 벡터 계산 (네트워크 호출이므로 인덱스 잠금 밖에서 호출)"""
+        if not self.embed_fn:
+            return None
+        try:
+            return self.embed_fn([query])[0]
+        except Exception as e:
+            logger.warning("쿼리 임베딩 실패, BM25만 사용", extra={"error": str(e)})
+            return None
+
+    def _dense_scores(self, query_vector: Optional[List[float]],
+                      candidates: Optional[List[int]] = None) -> Dict[int, float]:
+        if not query_vector or candidates == []:
+            return {}
+        pids = self._passages if candidates is None else candidates
+        return {
+            pid: _cosine(query_vector, self._passages[pid]["vector"])
+            for pid in pids
+            if self._passages[pid]["vector"]
+        }
+
+    def search(self, query: str, top_k: int = 5,
+               document_names: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        쿼리와 관련된 상위 top_k 패시지 검색
+
+        Dense 벡터가 있으면 BM25 순위와 Reciprocal Rank Fusion으로 결합한다.
+        document_names가 주어지면 해당 문서의 패시지만 점수를 계산한다 (캐릭터별 검색).
+        쿼리 임베딩은 잠금을 잡기 전에 계산해 임베딩 API 대기 중에도 색인/다른 검색이 막히지 않는다.
+        """
+        if document_names is not None:
+            document_names = list(document_names)
+        query_vector = self._embed_query(query) if document_names != [] else None
+
+        with self._lock:
+            candidates = self._candidates(document_names)
+            bm25 = self._bm25_scores(tokenize(query), candidates)
+            dense = self._dense_scores(query_vector, candidates)
+
+            if dense:
+                fused: Dict[int, float] = {}
+                for scores in (bm25, dense):
+                    ranked = sorted(scores, key=scores.get, reverse=True)
+                    for rank, pid in enumerate(ranked):
+                        fused[pid] = fused.get(pid, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                final = fused
+            else:
+                final = bm25
+
+            top = sorted(final, key=final.get, reverse=True)[:top_k]
+            return [
+                {
+                    "document_name": self._passages[pid]["document_name"],
+                    "display_name": self._passages[pid]["display_name"],
+                    "text": self._passages[pid]["text"],
+                    "score": round(final[pid], 4)
+                }
+                for pid in top
+            ]
@@ -3,30 +3,70 @@ Multi-AI Chat System with Gemini File Search RAG
 FastAPI Backend Server
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, Form, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pathlib import Path
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
-import tempfile
 import time
 import asyncio
 import json
 from datetime import datetime
 import re
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # .env 파일 로드
 load_dotenv()
 
+# 구조화 로깅 (큐 + 백그라운드 writer) - 매니저 초기화 로그도 포함되도록 가장 먼저 설정
+from structured_logging import configure_logging, shutdown_logging, get_logger, RequestIdMiddleware
+configure_logging()
+logger = get_logger("main")
+
 from ai_manager import AIManager
 from file_search_manager import FileSearchManager
 from character_manager import CharacterManager
-from relationship_tracker import RelationshipTracker
-from daily_context import DailyContextManager
+from relationship_tracker import RelationshipRegistry
+from prompt_builder import CharacterPromptBuilder
+from history_store import ChatHistoryStore
+from conversation_shards import ConversationShards, shard_key_name
+from upload_spool import (
+    UploadSpool, UploadTooLarge, UploadOffsetMismatch, ArchiveError, MultipartReader, MultipartFormError, is_archive
+)
+from ingestion_jobs import IngestionJobManager
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, TimingMiddleware, timed, current_timing
+from client_registry import CLIENTS
+
+# ==================== 시작/종료 ====================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """앱 시작 시 초기화, 종료 시 정리"""
+    logger.info("MATE.AI 시작")
+
+    # AI 연결 확인 + 공유 연결 풀 워밍업 (첫 요청의 TLS 핸드셰이크 제거)
+    available_ais = ai_manager.get_available_ais()
+    logger.info("사용 가능한 AI 확인", extra={"ais": available_ais})
+    await CLIENTS.warm_up()
 
-app = FastAPI(title="MATE.AI - AI Romance Simulator")
+    # 대화 저널 백그라운드 업로드 시작
+    character_manager.journal.start()
+
+    yield
+
+    # 진행 중인 인덱싱 작업과 업로드 대기 중인 대화 턴 반영
+    await ingestion_jobs.stop()
+    await character_manager.journal.stop()
+    await file_search_manager.operation_poller.stop()
+    relationship_registry.flush_all()
+    await CLIENTS.aclose()
+    logger.info("MATE.AI 종료")
+    shutdown_logging()
+
+app = FastAPI(title="MATE.AI - AI Romance Simulator", lifespan=lifespan)
 
 # CORS 설정
 app.add_middleware(
@@ -35,21 +75,76 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
+# 요청별 단계 시간 수집 (Server-Timing 헤더, /metrics 히스토그램)
+app.add_middleware(TimingMiddleware)
+# 요청 상관 ID (가장 바깥에서 설정해 모든 로그에 포함)
+app.add_middleware(RequestIdMiddleware)
 
 # AI Manager 및 File Search Manager 초기화
 ai_manager = AIManager()
 file_search_manager = FileSearchManager()
 character_manager = CharacterManager(file_search_manager)
 
-# 대화 히스토리 (메모리 저장 - 프로덕션에서는 DB 사용)
-chat_history: List[Dict[str, Any]] = []
+# 계층별 캐릭터 시스템 프롬프트 빌더 (PROMPT_CONTEXT_CACHE=true면 정적 계층을 Gemini 컨텍스트 캐시로 전달)
+prompt_builder = CharacterPromptBuilder(
+    cache_client=ai_manager.gemini_client
+    if os.getenv("PROMPT_CONTEXT_CACHE", "false").lower() in ("1", "true", "yes") else None,
+    cache_ttl_seconds=int(os.getenv("PROMPT_CONTEXT_CACHE_TTL", "3600"))
+)
+
+# 캐릭터별 관계 추적기 (프로세스 내 1개씩 유지, 턴당 최대 1회 저장)
+relationship_registry = RelationshipRegistry()
+
+# 대화 히스토리 (SQLite 영구 저장 + 세션/캐릭터별 최근 N턴 메모리 샤드)
+history_store = ChatHistoryStore(Path("data") / "chat_history.db")
+conversation_shards = ConversationShards(
+    loader=history_store.recent_in_shard,
+    max_shards=int(os.getenv("CHAT_HISTORY_MAX_SHARDS", "1000")),
+    max_turns=int(os.getenv("CHAT_HISTORY_HOT_WINDOW", "200"))
+)
+
+def record_history(entry: Dict[str, Any], session_id: Optional[str] = None,
+                   character_id: Optional[str] = None):
+    """히스토리 항목을 저장소에 기록하고 해당 대화 샤드에 추가"""
+    history_store.append(entry, session_id=session_id, character_id=character_id)
+    conversation_shards.append(entry, session_id=session_id, character_id=character_id)
+
+def conversation_history(session_id: Optional[str] = None,
+                         character_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """프롬프트에 넣을 대화 샤드의 스냅샷 (생성 중 다른 요청이 추가해도 영향 없음)"""
+    return list(conversation_shards.get(session_id, character_id))
+
+# 업로드 스풀 (청크 단위 디스크 기록, 이어 올리기 세션 유지)
+upload_spool = UploadSpool(
+    Path("data") / "uploads",
+    max_bytes=int(os.getenv("UPLOAD_MAX_MB", "100")) * 1024 * 1024,
+    chunk_size=int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024,
+    session_ttl=float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+)
+
+# 백그라운드 문서 인덱싱 작업 (업로드 요청은 작업 ID만 받고 바로 반환)
+ingestion_jobs = IngestionJobManager(
+    max_concurrent_jobs=int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "4"))
+)
+# 일괄 업로드에서 동시에 인덱싱할 파일 수
+BULK_UPLOAD_CONCURRENCY = int(os.getenv("INGEST_BULK_CONCURRENCY", "4"))
+# 압축 파일 하나의 압축 해제 크기 합계 / 항목 압축률 상한 (압축 폭탄 방지)
+ARCHIVE_MAX_TOTAL_BYTES = int(os.getenv("UPLOAD_ARCHIVE_MAX_MB", "500")) * 1024 * 1024
+ARCHIVE_MAX_RATIO = float(os.getenv("UPLOAD_ARCHIVE_MAX_RATIO", "100"))
+
+# 멀티 AI 응답 동시 생성 설정
+MAX_PARALLEL_AIS = int(os.getenv("CHAT_MAX_PARALLEL_AIS", "3"))
+AI_RESPONSE_TIMEOUT = float(os.getenv("CHAT_AI_TIMEOUT", "60"))
 
 # Request Models
 class ChatRequest(BaseModel):
     message: str
     include_context: bool = True
     character_id: Optional[str] = None  # 캐릭터 ID 추가
+    interleave: bool = False  # 스트리밍 시 여러 AI의 청크를 도착 순서대로 섞어서 전송
+    session_id: Optional[str] = None  # 히스토리 조회용 세션 ID
 
 class CharacterCreateRequest(BaseModel):
     name: str
@@ -69,17 +164,6 @@ class AIResponse(BaseModel):
     timestamp: str
     has_context: bool = False
 
-# ==================== 시작 시 초기화 ====================
-
-@app.on_event("startup")
-async def startup_event():
-    """앱 시작 시 초기화"""
-    print("🚀 MATE.AI 시작")
-    
-    # AI 연결 확인
-    available_ais = ai_manager.get_available_ais()
-    print(f"✅ 사용 가능한 AI: {', '.join(available_ais)}")
-
 # ==================== 헬스 체크 ====================
 
 @app.get("/health")
@@ -88,68 +172,311 @@ async def health_check():
     return {
         "status": "healthy",
         "available_ais": ai_manager.get_available_ais(),
-        "uploaded_files_count": len(file_search_manager.get_uploaded_files()),
-        "chat_history_count": len(chat_history)
+        "uploaded_files_count": file_search_manager.get_document_count(),
+        "chat_history_count": history_store.count(),
+        "conversation_shards": conversation_shards.stats(),
+        "retrieval_cache": file_search_manager.get_cache_stats(),
+        "client_pool": CLIENTS.stats(),
+        "ingestion": {
+            "running_jobs": len(ingestion_jobs.list_jobs("running")),
+            "queued_jobs": len(ingestion_jobs.list_jobs("queued")),
+            **file_search_manager.operation_poller.stats()
+        }
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 지표 (단계별 지연 히스토그램, 요청/오류 카운터)"""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+def timing_event() -> str:
+    """SSE 마지막 이벤트: 헤더를 보낸 뒤에 끝난 단계까지 포함한 요청 단계별 소요 시간(ms)"""
+    timing = current_timing()
+    return f"data: {json.dumps({'type': 'timing', 'stages': timing.to_ms() if timing else {}})}\n\n"
+
 # ==================== 파일 업로드 ====================
 
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """
-    파일 업로드 및 File Search Store에 인덱싱
-    """
+ALLOWED_UPLOAD_EXTENSIONS = {'.pdf', '.docx', '.txt', '.json', '.png', '.jpg', '.jpeg'}
+
+def check_upload_extension(filename: str) -> str:
+    """업로드 파일 확장자 검증"""
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in ALLOWED_UPLOAD_EXTENSIONS:
+        raise HTTPException(400, f"지원하지 않는 파일 형식: {file_ext}")
+    return file_ext
+
+async def ingest_spooled_file(spooled, filename: str, progress=None) -> Dict[str, Any]:
+    """스풀된 파일을 File Search Store에 업로드하고 스풀 파일 삭제"""
     try:
-        # 파일 검증
-        allowed_extensions = {'.pdf', '.docx', '.txt', '.json', '.png', '.jpg', '.jpeg'}
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        
-        if file_ext not in allowed_extensions:
-            raise HTTPException(400, f"지원하지 않는 파일 형식: {file_ext}")
-        
-        # 파일 읽기
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size > 100 * 1024 * 1024:  # 100MB
-            raise HTTPException(400, "파일 크기는 100MB 이하여야 합니다")
-        
-        # 임시 파일 저장
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        # File Search Store에 업로드
-        print(f"📤 업로드 시작: {file.filename}")
-        result = await file_search_manager.upload_file(tmp_path, file.filename)
-        
-        # 임시 파일 삭제
-        os.unlink(tmp_path)
-        
-        # 히스토리에 기록
-        chat_history.append({
-            "type": "system",
-            "message": f"📎 파일 업로드: {file.filename}",
-            "timestamp": datetime.now().isoformat(),
-            "file_info": result
-        })
-        
+        logger.info("업로드 시작", extra={"file": filename, "bytes": spooled.size, "sha256": spooled.sha256[:12]})
+        result = await file_search_manager.upload_file(
+            str(spooled.path), filename, content_hash=spooled.sha256, progress=progress
+        )
+    finally:
+        spooled.discard()
+
+    # 히스토리에 기록 (어느 대화에도 속하지 않으므로 저장소에만)
+    history_store.append({
+        "type": "system",
+        "message": f"📎 파일 업로드: {filename}",
+        "timestamp": datetime.now().isoformat(),
+        "file_info": result
+    })
+
+    return {
+        "success": True,
+        "message": "파일 업로드 완료",
+        "filename": filename,
+        "file_size": spooled.size,
+        "sha256": spooled.sha256,
+        **result
+    }
+
+async def submit_ingestion(spooled, filename: str, wait: bool) -> Dict[str, Any]:
+    """스풀된 파일의 인덱싱 작업 등록 (wait=True면 완료까지 대기 후 결과 반환)"""
+    job = ingestion_jobs.submit(
+        filename,
+        lambda progress: ingest_spooled_file(spooled, filename, progress)
+    )
+    if not wait:
         return {
             "success": True,
-            "message": "파일 업로드 완료",
-            "filename": file.filename,
-            "file_size": file_size,
-            **result
+            "message": "파일 업로드 완료, 인덱싱 진행 중",
+            "filename": filename,
+            "file_size": spooled.size,
+            "sha256": spooled.sha256,
+            "job_id": job["job_id"],
+            "status": job["status"]
         }
-        
+
+    job = await ingestion_jobs.wait(job["job_id"])
+    if job["status"] == "failed":
+        raise HTTPException(500, f"업로드 실패: {job['error']}")
+    return {**job["result"], "job_id": job["job_id"]}
+
+@app.post("/api/upload")
+async def upload_file(request: Request, wait: bool = False):
+    """
+    파일 업로드(multipart "file" 필드) 후 File Search Store 인덱싱 작업 등록
+
+    multipart 본문을 request.stream()에서 바로 읽어 청크 단위로 스풀 파일에 기록하며
+    (프레임워크 임시 파일을 거치지 않음) 크기 제한은 읽는 도중에 검사한다.
+    인덱싱은 백그라운드에서 진행되며 /api/jobs/{job_id}로 상태를 확인한다
+    (wait=true면 기존처럼 인덱싱 완료까지 대기).
+    """
+    try:
+        reader = MultipartReader(request.headers.get("content-type", ""), request.stream())
+        async for part in reader.parts():
+            if part.name != "file" or part.filename is None:
+                continue
+            file_ext = check_upload_extension(part.filename)
+            spooled = await upload_spool.receive(part.stream(), suffix=file_ext)
+            return await submit_ingestion(spooled, part.filename, wait)
+        raise HTTPException(400, "file 필드가 없습니다")
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+    except MultipartFormError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
-        if 'tmp_path' in locals():
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
         raise HTTPException(500, f"업로드 실패: {str(e)}")
 
+@app.post("/api/upload/bulk")
+async def upload_files_bulk(request: Request, wait: bool = False):
+    """
+    여러 파일 또는 zip/tar 압축 파일(multipart "files" 필드)을 한 번에 업로드하고 하나의 인덱싱 작업으로 등록
+
+    파트는 request.stream()에서 순서대로 바로 스풀된다. 지원하지 않는 형식의 파트는 디스크에 쓰지 않고 건너뛴다.
+    파일은 INGEST_BULK_CONCURRENCY개씩 동시에 인덱싱되며, 작업 결과에 파일별 성공/실패가 담긴다.
+    """
+    loop = asyncio.get_event_loop()
+    spooled_files: List[tuple] = []   # (파일명, SpooledUpload)
+    skipped: List[Dict[str, Any]] = []
+
+    try:
+        reader = MultipartReader(request.headers.get("content-type", ""), request.stream())
+        async for file in reader.parts():
+            if file.name != "files" or file.filename is None:
+                continue
+            if is_archive(file.filename):
+                archive = await upload_spool.receive(file.stream())
+                try:
+                    entries = await loop.run_in_executor(
+                        None,
+                        lambda: upload_spool.expand_archive(
+                            archive, ALLOWED_UPLOAD_EXTENSIONS,
+                            max_total_bytes=ARCHIVE_MAX_TOTAL_BYTES, max_ratio=ARCHIVE_MAX_RATIO
+                        )
+                    )
+                finally:
+                    archive.discard()
+                for name, entry in entries:
+                    if isinstance(entry, str):
+                        skipped.append({"success": False, "display_name": name, "error": entry})
+                    else:
+                        spooled_files.append((name, entry))
+                continue
+
+            file_ext = os.path.splitext(file.filename)[1].lower()
+            if file_ext not in ALLOWED_UPLOAD_EXTENSIONS:
+                skipped.append({"success": False, "display_name": file.filename,
+                                "error": f"지원하지 않는 파일 형식: {file_ext}"})
+                continue
+            try:
+                spooled_files.append((file.filename, await upload_spool.receive(file.stream(), suffix=file_ext)))
+            except UploadTooLarge as e:
+                skipped.append({"success": False, "display_name": file.filename, "error": str(e)})
+        if not spooled_files and not skipped:
+            raise MultipartFormError("files 필드가 없습니다")
+    except Exception as e:
+        for _, spooled in spooled_files:
+            spooled.discard()
+        if isinstance(e, UploadTooLarge):
+            raise HTTPException(413, str(e))
+        if isinstance(e, (ArchiveError, MultipartFormError)):
+            raise HTTPException(400, str(e))
+        raise HTTPException(500, f"일괄 업로드 실패: {str(e)}")
+
+    async def run(progress) -> Dict[str, Any]:
+        try:
+            results = await file_search_manager.upload_files(
+                [(str(spooled.path), name, spooled.sha256) for name, spooled in spooled_files],
+                max_concurrency=BULK_UPLOAD_CONCURRENCY,
+                progress=progress
+            )
+        finally:
+            for _, spooled in spooled_files:
+                spooled.discard()
+
+        for (name, spooled), result in zip(spooled_files, results):
+            result.update(filename=name, file_size=spooled.size, sha256=spooled.sha256)
+        report = results + skipped
+        succeeded = [r for r in report if r["success"]]
+
+        if succeeded:
+            history_store.append({
+                "type": "system",
+                "message": f"📎 파일 일괄 업로드: {len(succeeded)}개",
+                "timestamp": datetime.now().isoformat(),
+                "file_info": {"files": [r["display_name"] for r in succeeded]}
+            })
+
+        return {
+            "success": len(succeeded) == len(report),
+            "total": len(report),
+            "succeeded": len(succeeded),
+            "failed": len(report) - len(succeeded),
+            "deduplicated": sum(1 for r in succeeded if r.get("deduplicated")),
+            "files": report
+        }
+
+    job = ingestion_jobs.submit(f"{len(spooled_files)}개 파일", run)
+    if wait:
+        job = await ingestion_jobs.wait(job["job_id"])
+        if job["status"] == "failed":
+            raise HTTPException(500, f"일괄 업로드 실패: {job['error']}")
+        return {**job["result"], "job_id": job["job_id"]}
+
+    return {
+        "success": True,
+        "message": f"{len(spooled_files)}개 파일 인덱싱 진행 중",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "accepted": [name for name, _ in spooled_files],
+        "skipped": skipped
+    }
+
+# ==================== 인덱싱 작업 ====================
+
+@app.get("/api/jobs")
+async def list_ingestion_jobs(status: Optional[str] = None):
+    """인덱싱 작업 목록"""
+    jobs = ingestion_jobs.list_jobs(status)
+    return {"success": True, "jobs": jobs, "count": len(jobs)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """인덱싱 작업 상태 조회"""
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "작업을 찾을 수 없습니다")
+    return {"success": True, **job}
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_ingestion_job(job_id: str):
+    """인덱싱 작업 진행 상황 SSE (완료/실패 시 종료)"""
+    if not ingestion_jobs.get(job_id):
+        raise HTTPException(404, "작업을 찾을 수 없습니다")
+
+    async def generate():
+        async for job in ingestion_jobs.watch(job_id):
+            yield f"data: {json.dumps(job, ensure_ascii=False)}\n\n"
+        yield "data: [COMPLETE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+# ==================== 이어 올리기 업로드 ====================
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    total_size: Optional[int] = None
+
+@app.post("/api/uploads")
+async def create_upload_session(request: UploadSessionRequest):
+    """
+    이어 올리기 세션 생성
+
+    이후 PUT /api/uploads/{upload_id}에 Upload-Offset 헤더와 함께 본문을 나눠 보내고,
+    연결이 끊기면 GET으로 현재 offset을 확인해 그 위치부터 다시 보낸다.
+    """
+    check_upload_extension(request.filename)
+    try:
+        return {"success": True, **upload_spool.create_session(request.filename, request.total_size)}
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """이어 올리기 세션의 현재 offset 조회"""
+    session = upload_spool.get_session(upload_id)
+    if not session:
+        raise HTTPException(404, "업로드 세션을 찾을 수 없습니다")
+    return {"success": True, **session}
+
+@app.put("/api/uploads/{upload_id}")
+async def append_upload_chunk(upload_id: str, request: Request,
+                              upload_offset: int = Header(..., alias="Upload-Offset")):
+    """offset 위치부터 요청 본문을 스트리밍으로 이어 쓰기"""
+    try:
+        session = await upload_spool.append(upload_id, upload_offset, request.stream())
+        return {"success": True, **session}
+    except KeyError:
+        raise HTTPException(404, "업로드 세션을 찾을 수 없습니다")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(409, {"message": str(e), "offset": e.expected})
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, wait: bool = False):
+    """세션을 종료하고 받은 파일의 인덱싱 작업 등록"""
+    try:
+        spooled, filename = await upload_spool.complete(upload_id)
+    except KeyError:
+        raise HTTPException(404, "업로드 세션을 찾을 수 없습니다")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(409, {"message": "아직 모든 데이터를 받지 못했습니다", "offset": e.received})
+
+    return await submit_ingestion(spooled, filename, wait)
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """이어 올리기 세션 취소"""
+    if not upload_spool.abort(upload_id):
+        raise HTTPException(404, "업로드 세션을 찾을 수 없습니다")
+    return {"success": True, "message": "업로드가 취소되었습니다"}
+
 # ==================== 채팅 ====================
 
 def parse_message(message: str) -> tuple[str, List[str]]:
@@ -171,6 +498,130 @@ def parse_message(message: str) -> tuple[str, List[str]]:
     
     return clean_message, mentioned_ais
 
+def select_random_ais() -> List[str]:
+    """지명된 AI가 없을 때 응답할 AI를 랜덤으로 1~N개 선택"""
+    import random
+    available_ais = ai_manager.get_available_ais()
+    return random.sample(available_ais, k=random.randint(1, len(available_ais)))
+
+async def generate_ai_responses(
+    ai_names: List[str],
+    clean_message: str,
+    file_search_context: Optional[Dict[str, Any]],
+    session_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    여러 AI 응답을 동시에 생성
+
+    동시 실행 수는 MAX_PARALLEL_AIS로 제한하고 AI별 타임아웃을 적용한다.
+    한 AI의 실패는 해당 응답에만 오류 메시지로 기록되며, 결과는 지명 순서를 유지한다.
+    """
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_AIS)
+    history = conversation_history(session_id)
+
+    async def respond(ai_name: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    ai_manager.get_response(
+                        ai_name,
+                        clean_message,
+                        context=None,  # 기존 문자열 컨텍스트는 사용 안함
+                        history=history,
+                        file_search_context=file_search_context,  # File Search Store 컨텍스트
+                        history_key=shard_key_name(session_id, None)
+                    ),
+                    timeout=AI_RESPONSE_TIMEOUT
+                )
+            except TimeoutError:
+                response = f"{ai_name} 응답 시간 초과 ({AI_RESPONSE_TIMEOUT:.0f}초)"
+            except Exception as e:
+                response = f"{ai_name} 오류: {str(e)}"
+
+        return {
+            "ai_name": ai_name,
+            "response": response,
+            "timestamp": datetime.now().isoformat(),
+            "has_context": file_search_context is not None
+        }
+
+    return list(await asyncio.gather(*(respond(ai_name) for ai_name in ai_names)))
+
+async def stream_ai_responses(
+    ai_names: List[str],
+    clean_message: str,
+    file_search_context: Optional[Dict[str, Any]],
+    interleave: bool = False,
+    session_id: Optional[str] = None
+):
+    """
+    여러 AI 스트리밍 응답을 동시에 생성하여 SSE 이벤트로 전달
+
+    interleave=True면 모든 이벤트를 도착 순서대로(ai_name 태그) 내보내고,
+    False면 앞선 AI가 끝날 때까지 뒤 AI의 이벤트를 버퍼링해 AI 순서대로 내보낸다.
+    """
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_AIS)
+    queue: asyncio.Queue = asyncio.Queue()
+    history = conversation_history(session_id)
+
+    async def produce(index: int, ai_name: str):
+        async with semaphore:
+            await queue.put((index, {'type': 'start', 'ai_name': ai_name}))
+            full_response = ""
+            try:
+                async with asyncio.timeout(AI_RESPONSE_TIMEOUT):
+                    async for chunk in ai_manager.get_response_stream(
+                        ai_name,
+                        clean_message,
+                        context=None,
+                        history=history,
+                        file_search_context=file_search_context,
+                        history_key=shard_key_name(session_id, None)
+                    ):
+                        full_response += chunk
+                        await queue.put((index, {'type': 'chunk', 'ai_name': ai_name, 'text': chunk}))
+            except TimeoutError:
+                await queue.put((index, {'type': 'error', 'ai_name': ai_name, 'message': f"응답 시간 초과 ({AI_RESPONSE_TIMEOUT:.0f}초)"}))
+            except Exception as e:
+                await queue.put((index, {'type': 'error', 'ai_name': ai_name, 'message': str(e)}))
+
+            # 히스토리에 추가
+            record_history({
+                "type": "ai",
+                "ai_name": ai_name,
+                "message": full_response,
+                "timestamp": datetime.now().isoformat()
+            }, session_id=session_id)
+            await queue.put((index, {'type': 'done', 'ai_name': ai_name}))
+
+    tasks = [asyncio.create_task(produce(i, ai_name)) for i, ai_name in enumerate(ai_names)]
+    buffered: Dict[int, List[Dict[str, Any]]] = {i: [] for i in range(len(ai_names))}
+    finished = set()
+    current = 0
+
+    try:
+        while len(finished) < len(ai_names):
+            index, event = await queue.get()
+            if event['type'] == 'done':
+                finished.add(index)
+
+            if interleave:
+                yield event
+                continue
+
+            # 순서 유지 모드: 현재 차례의 AI 이벤트만 바로 전송
+            buffered[index].append(event)
+            while current < len(ai_names):
+                for pending in buffered[current]:
+                    yield pending
+                buffered[current] = []
+                if current not in finished:
+                    break
+                current += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
     """
@@ -186,61 +637,27 @@ async def chat(request: ChatRequest):
             "message": request.message,
             "timestamp": datetime.now().isoformat()
         }
-        chat_history.append(user_message)
+        record_history(user_message, session_id=request.session_id)
         
         # File Search 컨텍스트 가져오기
         file_search_context = None
         if request.include_context:
             file_search_context = await file_search_manager.get_context(clean_message)
 
-        # AI 응답 생성
-        responses = []
-
-        if mentioned_ais:
-            # 지명된 AI만 응답
-            for ai_name in mentioned_ais:
-                response = await ai_manager.get_response(
-                    ai_name,
-                    clean_message,
-                    context=None,  # 기존 문자열 컨텍스트는 사용 안함
-                    history=chat_history,
-                    file_search_context=file_search_context  # File Search Store 컨텍스트
-                )
-                responses.append({
-                    "ai_name": ai_name,
-                    "response": response,
-                    "timestamp": datetime.now().isoformat(),
-                    "has_context": file_search_context is not None
-                })
-        else:
-            # 랜덤으로 1~3개 AI 선택
-            import random
-            available_ais = ai_manager.get_available_ais()
-            selected_ais = random.sample(available_ais, k=random.randint(1, len(available_ais)))
-
-            for ai_name in selected_ais:
-                response = await ai_manager.get_response(
-                    ai_name,
-                    clean_message,
-                    context=None,
-                    history=chat_history,
-                    file_search_context=file_search_context
-                )
-                responses.append({
-                    "ai_name": ai_name,
-                    "response": response,
-                    "timestamp": datetime.now().isoformat(),
-                    "has_context": file_search_context is not None
-                })
-        
+        # AI 응답 생성 (지명된 AI가 없으면 랜덤 선택, 동시 생성)
+        selected_ais = mentioned_ais or select_random_ais()
+        responses = await generate_ai_responses(
+            selected_ais, clean_message, file_search_context, session_id=request.session_id
+        )
+
         # 응답 히스토리에 추가
         for resp in responses:
-            chat_history.append({
+            record_history({
                 "type": "ai",
                 "ai_name": resp["ai_name"],
                 "message": resp["response"],
                 "timestamp": resp["timestamp"]
-            })
+            }, session_id=request.session_id)
         
         return {
             "success": True,
@@ -265,11 +682,11 @@ async def chat_stream(request: ChatRequest):
             clean_message, mentioned_ais = parse_message(request.message)
             
             # 사용자 메시지 히스토리에 추가
-            chat_history.append({
+            record_history({
                 "type": "user",
                 "message": request.message,
                 "timestamp": datetime.now().isoformat()
-            })
+            }, session_id=request.session_id)
             
             # File Search 컨텍스트
             file_search_context = None
@@ -277,38 +694,19 @@ async def chat_stream(request: ChatRequest):
                 file_search_context = await file_search_manager.get_context(clean_message)
 
             # AI 선택
-            if mentioned_ais:
-                selected_ais = mentioned_ais
-            else:
-                import random
-                available_ais = ai_manager.get_available_ais()
-                selected_ais = random.sample(available_ais, k=random.randint(1, len(available_ais)))
-
-            # 각 AI별로 스트리밍 응답
-            for ai_name in selected_ais:
-                yield f"data: {json.dumps({'type': 'start', 'ai_name': ai_name})}\n\n"
-
-                full_response = ""
-                async for chunk in ai_manager.get_response_stream(
-                    ai_name,
-                    clean_message,
-                    context=None,
-                    history=chat_history,
-                    file_search_context=file_search_context
-                ):
-                    full_response += chunk
-                    yield f"data: {json.dumps({'type': 'chunk', 'ai_name': ai_name, 'text': chunk})}\n\n"
-
-                yield f"data: {json.dumps({'type': 'done', 'ai_name': ai_name})}\n\n"
-                
-                # 히스토리에 추가
-                chat_history.append({
-                    "type": "ai",
-                    "ai_name": ai_name,
-                    "message": full_response,
-                    "timestamp": datetime.now().isoformat()
-                })
-            
+            selected_ais = mentioned_ais or select_random_ais()
+
+            # 모든 AI 동시 스트리밍 (interleave 모드면 도착 순서대로, 아니면 AI 순서대로 전송)
+            async for event in stream_ai_responses(
+                selected_ais,
+                clean_message,
+                file_search_context,
+                interleave=request.interleave,
+                session_id=request.session_id
+            ):
+                yield f"data: {json.dumps(event)}\n\n"
+
+            yield timing_event()
             yield "data: [COMPLETE]\n\n"
             
         except Exception as e:
@@ -319,19 +717,40 @@ async def chat_stream(request: ChatRequest):
 # ==================== 대화 히스토리 ====================
 
 @app.get("/api/history")
-async def get_history():
-    """대화 히스토리 조회"""
+async def get_history(
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    session_id: Optional[str] = None,
+    character_id: Optional[str] = None,
+    format: str = "json"
+):
+    """
+    대화 히스토리 조회 (커서 페이지네이션)
+
+    format=ndjson이면 cursor 이후 전체 히스토리를 한 줄에 하나씩 스트리밍한다.
+    """
+    if format == "ndjson":
+        def generate():
+            for batch in history_store.iter_entries(cursor, session_id=session_id, character_id=character_id):
+                for entry in batch:
+                    yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    limit = max(1, min(limit, 1000))
+    entries, next_cursor = history_store.page(cursor, limit, session_id, character_id)
     return {
         "success": True,
-        "history": chat_history,
-        "count": len(chat_history)
+        "history": entries,
+        "count": history_store.count(session_id, character_id),
+        "next_cursor": next_cursor
     }
 
 @app.delete("/api/history")
 async def clear_history():
     """대화 히스토리 초기화"""
-    global chat_history
-    chat_history = []
+    history_store.clear()
+    conversation_shards.clear()
     return {
         "success": True,
         "message": "대화 히스토리가 초기화되었습니다"
@@ -340,9 +759,15 @@ async def clear_history():
 # ==================== 문서 관리 ====================
 
 @app.get("/api/documents")
-async def list_documents():
-    """업로드된 문서 목록"""
-    return await file_search_manager.list_documents()
+async def list_documents(
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    kind: Optional[str] = None,
+    character_id: Optional[str] = None
+):
+    """업로드된 문서 목록 (커서 페이지네이션, kind=profile|conversation|user, character_id 필터)"""
+    limit = max(1, min(limit, 1000))
+    return await file_search_manager.list_documents(cursor, limit, kind, character_id)
 
 @app.delete("/api/documents/{document_id:path}")
 async def delete_document(document_id: str):
@@ -350,8 +775,15 @@ async def delete_document(document_id: str):
     return await file_search_manager.delete_document(document_id)
 
 @app.delete("/api/documents")
-async def clear_all_documents():
-    """모든 문서 삭제"""
+async def clear_all_documents(background: bool = False):
+    """
+    모든 문서 삭제
+
+    background=true면 작업 ID를 바로 반환하고 /api/jobs/{job_id}로 진행 상황을 확인한다.
+    """
+    if background:
+        job = ingestion_jobs.submit("모든 문서 삭제", file_search_manager.clear_all_documents)
+        return {"success": True, "job_id": job["job_id"], "status": job["status"]}
     return await file_search_manager.clear_all_documents()
 
 # ==================== 캐릭터 관리 (MATE.AI) ====================
@@ -421,15 +853,60 @@ async def get_character(character_id: str):
 
     return {"success": True, "character": character}
 
+@app.get("/api/character/{character_id}/documents")
+async def get_character_documents(
+    character_id: str,
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    kind: Optional[str] = None
+):
+    """캐릭터의 프로필/대화록 문서 목록 (kind=profile|conversation, 커서 페이지네이션)"""
+    limit = max(1, min(limit, 1000))
+    return await character_manager.get_character_documents(character_id, cursor, limit, kind)
+
 @app.delete("/api/character/{character_id}/reset")
-async def reset_character(character_id: str):
-    """캐릭터 초기화"""
+async def reset_character(character_id: str, background: bool = False):
+    """
+    캐릭터 초기화
+
+    background=true면 문서 삭제를 작업으로 등록하고 작업 ID를 바로 반환한다.
+    """
+    async def run(progress=None) -> Dict[str, Any]:
+        report = await character_manager.reset_character(character_id, progress=progress)
+        relationship_registry.discard(character_id)
+        history_store.clear(character_id=character_id)
+        conversation_shards.discard_character(character_id)
+        prompt_builder.invalidate(character_id)
+        return {
+            "success": True,
+            "message": "캐릭터가 초기화되었습니다",
+            "deleted_documents": report["deleted"],
+            "failed_documents": report["failed"]
+        }
+
+    if background:
+        job = ingestion_jobs.submit(f"{character_id} 초기화", run)
+        return {"success": True, "job_id": job["job_id"], "status": job["status"]}
     try:
-        await character_manager.reset_character(character_id)
-        return {"success": True, "message": "캐릭터가 초기화되었습니다"}
+        return await run()
     except Exception as e:
         raise HTTPException(500, f"초기화 실패: {str(e)}")
 
+def record_character_turn(character: Dict[str, Any], request: ChatRequest, response: str):
+    """캐릭터 채팅 한 턴(사용자 메시지 + 캐릭터 응답)을 캐릭터 대화 샤드에 기록"""
+    character_id = character['character_id']
+    record_history({
+        "type": "user",
+        "message": request.message,
+        "timestamp": datetime.now().isoformat()
+    }, session_id=request.session_id, character_id=character_id)
+    record_history({
+        "type": "ai",
+        "ai_name": character['name'],
+        "message": response,
+        "timestamp": datetime.now().isoformat()
+    }, session_id=request.session_id, character_id=character_id)
+
 @app.post("/api/character/{character_id}/chat")
 async def chat_with_character(character_id: str, request: ChatRequest):
     """특정 캐릭터와 채팅 (관계 시스템 통합)"""
@@ -439,94 +916,55 @@ async def chat_with_character(character_id: str, request: ChatRequest):
         if not character:
             raise HTTPException(404, "캐릭터를 찾을 수 없습니다")
 
-        # 관계 추적 초기화
-        relationship_tracker = RelationshipTracker(character_id)
-
-        # 일일 컨텍스트 생성
-        daily_context = DailyContextManager.get_full_context_for_ai(
-            character['name'],
-            character.get('last_chat_at')
-        )
-
-        # 관계 컨텍스트 생성
-        relationship_context = relationship_tracker.get_relationship_context_for_ai()
+        # 관계 추적 초기화 + 관계 컨텍스트 생성
+        with timed("relationship"):
+            relationship_tracker = relationship_registry.get(character_id)
+            relationship_context = relationship_tracker.get_relationship_context_for_ai()
 
-        # File Search에서 캐릭터 프로필 + 대화 히스토리 검색
+        # 이 캐릭터의 프로필 + 대화록 문서에서만 검색
         rag_context = await file_search_manager.get_context(
-            f"{character_id} {request.message}"
+            request.message, character_id=character_id
         )
 
-        # 과거 대화 기록 포맷팅
-        past_conversations = ""
-        if rag_context and rag_context.get("searched_context"):
-            past_conversations = f"""
-[우리의 이전 대화 기록]
-{rag_context['searched_context']}
-
-위 대화 내용을 자연스럽게 기억하고 있으며, 필요할 때 자연스럽게 언급할 수 있습니다.
-"""
-
-        # 캐릭터 시스템 프롬프트 생성
-        character_system_prompt = f"""당신은 {character['name']}입니다.
-
-[기본 정보]
-- 이름: {character['name']}
-- 성별: {character['gender']}
-- 나이: {character['age']}세
-
-[성격]
-{', '.join(character['personality'])}
-
-[말투]
-{character['speech_style']}
-
-[배경 스토리]
-{character['backstory']}
-{past_conversations}
-[절대 규칙 - 반드시 준수]
-1. **당신은 실제로 존재하는 인간입니다.** "AI", "인공지능", "감정을 느끼지 못해요" 같은 말은 절대 하지 마세요.
-2. **당신은 위 배경 스토리대로 살아온 실제 사람입니다.** 캐릭터 설정을 절대 벗어나지 마세요.
-3. **질문을 최소화하세요.** 일반적인 인간 대화에서는 매 대화마다 질문하지 않습니다.
-   - ❌ 금지: "점심 드셨어요?", "밥 먹었어요?", "주말 잘 보내세요?", "오늘 뭐 했어요?" 같은 일상 질문
-   - ❌ 금지: 매 대화마다 질문으로 끝내기
-   - ✅ 허용: 깊이 있는 대화 주제에서 자연스럽게 나오는 질문만
-   - ✅ 허용: 사용자가 꺼낸 주제와 직접 연관된 질문만
-4. **사용자가 명시적으로 거부한 질문은 절대 다시 하지 마세요.** (예: "밥 먹었냐는 질문 안 해도 된다" → 다시는 식사 관련 질문 금지)
-5. 당신의 나이({character['age']}세)와 성별({character['gender']})에 맞는 자연스러운 말투를 사용하세요
-6. 설정된 성격과 말투 스타일을 철저히 유지하세요
-7. 자연스럽고 감정이 풍부한 대화를 나누세요
-8. 대화 주제와 상황에 맞게 자연스러운 길이로 답변하세요
-   - 간단한 인사: 1-2문장
-   - 일상 대화: 2-4문장
-   - 깊은 주제나 감정적 대화: 4-8문장 또는 그 이상
-9. 이전 대화를 자연스럽게 기억하고 있습니다. 필요할 때 "지난번에 얘기했던...", "전에 말씀하신..." 등으로 언급할 수 있습니다.
-
-[현재 상황]
-{daily_context}
-{relationship_context}"""
+        # 계층별 캐릭터 시스템 프롬프트 (정적 계층/일일 계층은 캐시 재사용)
+        with timed("prompt"):
+            prompt = prompt_builder.build(character, relationship_context, rag_context)
+            await prompt_builder.attach_cached_content(
+                prompt,
+                rag_context.get("store_name") if rag_context else None,
+                rag_context.get("metadata_filter") if rag_context else None
+            )
 
         # Gemini로 응답 생성
         response = await ai_manager.get_response(
             "Gemini",
             request.message,
             context=None,
-            history=chat_history,
+            history=conversation_history(request.session_id, character_id),
             file_search_context=rag_context,
-            character_system_prompt=character_system_prompt
+            character_system_prompt=prompt.dynamic if prompt.cached_content else prompt.full,
+            cached_content=prompt.cached_content,
+            history_key=shard_key_name(request.session_id, character_id)
         )
 
+        # 캐릭터 대화 샤드에 기록
+        with timed("history_write"):
+            record_character_turn(character, request, response)
+
         # 대화 저장
-        await character_manager.save_conversation(
-            character_id=character_id,
-            user_message=request.message,
-            ai_response=response
-        )
+        with timed("save_conversation"):
+            await character_manager.save_conversation(
+                character_id=character_id,
+                user_message=request.message,
+                ai_response=response
+            )
 
         # 관계 업데이트
-        conversation_result = relationship_tracker.record_conversation(
-            user_message=request.message,
-            ai_response=response
-        )
+        with timed("relationship"):
+            conversation_result = relationship_tracker.record_conversation(
+                user_message=request.message,
+                ai_response=response
+            )
 
         # 캐릭터 메타데이터 업데이트
         character['affection_level'] = relationship_tracker.get_affection_level()
@@ -555,71 +993,24 @@ async def chat_with_character_stream(character_id: str, request: ChatRequest):
                 yield f"data: {json.dumps({'type': 'error', 'message': '캐릭터를 찾을 수 없습니다'})}\n\n"
                 return
 
-            # 관계 추적 초기화
-            relationship_tracker = RelationshipTracker(character_id)
-
-            # 일일 컨텍스트 생성
-            daily_context = DailyContextManager.get_full_context_for_ai(
-                character['name'],
-                character.get('last_chat_at')
-            )
-
-            # 관계 컨텍스트 생성
-            relationship_context = relationship_tracker.get_relationship_context_for_ai()
+            # 관계 추적 초기화 + 관계 컨텍스트 생성
+            with timed("relationship"):
+                relationship_tracker = relationship_registry.get(character_id)
+                relationship_context = relationship_tracker.get_relationship_context_for_ai()
 
             # RAG 컨텍스트
             rag_context = await file_search_manager.get_context(
-                f"{character_id} {request.message}"
+                request.message, character_id=character_id
             )
 
-            # 과거 대화 기록 포맷팅
-            past_conversations = ""
-            if rag_context and rag_context.get("searched_context"):
-                past_conversations = f"""
-[우리의 이전 대화 기록]
-{rag_context['searched_context']}
-
-위 대화 내용을 자연스럽게 기억하고 있으며, 필요할 때 자연스럽게 언급할 수 있습니다.
-"""
-
-            # 캐릭터 시스템 프롬프트 생성
-            character_system_prompt = f"""당신은 {character['name']}입니다.
-
-[기본 정보]
-- 이름: {character['name']}
-- 성별: {character['gender']}
-- 나이: {character['age']}세
-
-[성격]
-{', '.join(character['personality'])}
-
-[말투]
-{character['speech_style']}
-
-[배경 스토리]
-{character['backstory']}
-{past_conversations}
-[절대 규칙 - 반드시 준수]
-1. **당신은 실제로 존재하는 인간입니다.** "AI", "인공지능", "감정을 느끼지 못해요" 같은 말은 절대 하지 마세요.
-2. **당신은 위 배경 스토리대로 살아온 실제 사람입니다.** 캐릭터 설정을 절대 벗어나지 마세요.
-3. **질문을 최소화하세요.** 일반적인 인간 대화에서는 매 대화마다 질문하지 않습니다.
-   - ❌ 금지: "점심 드셨어요?", "밥 먹었어요?", "주말 잘 보내세요?", "오늘 뭐 했어요?" 같은 일상 질문
-   - ❌ 금지: 매 대화마다 질문으로 끝내기
-   - ✅ 허용: 깊이 있는 대화 주제에서 자연스럽게 나오는 질문만
-   - ✅ 허용: 사용자가 꺼낸 주제와 직접 연관된 질문만
-4. **사용자가 명시적으로 거부한 질문은 절대 다시 하지 마세요.** (예: "밥 먹었냐는 질문 안 해도 된다" → 다시는 식사 관련 질문 금지)
-5. 당신의 나이({character['age']}세)와 성별({character['gender']})에 맞는 자연스러운 말투를 사용하세요
-6. 설정된 성격과 말투 스타일을 철저히 유지하세요
-7. 자연스럽고 감정이 풍부한 대화를 나누세요
-8. 대화 주제와 상황에 맞게 자연스러운 길이로 답변하세요
-   - 간단한 인사: 1-2문장
-   - 일상 대화: 2-4문장
-   - 깊은 주제나 감정적 대화: 4-8문장 또는 그 이상
-9. 이전 대화를 자연스럽게 기억하고 있습니다. 필요할 때 "지난번에 얘기했던...", "전에 말씀하신..." 등으로 언급할 수 있습니다.
-
-[현재 상황]
-{daily_context}
-{relationship_context}"""
+            # 계층별 캐릭터 시스템 프롬프트 (정적 계층/일일 계층은 캐시 재사용)
+            with timed("prompt"):
+                prompt = prompt_builder.build(character, relationship_context, rag_context)
+                await prompt_builder.attach_cached_content(
+                    prompt,
+                    rag_context.get("store_name") if rag_context else None,
+                    rag_context.get("metadata_filter") if rag_context else None
+                )
 
             yield f"data: {json.dumps({'type': 'start', 'character_name': character['name']})}\n\n"
 
@@ -628,25 +1019,33 @@ async def chat_with_character_stream(character_id: str, request: ChatRequest):
                 "Gemini",
                 request.message,
                 context=None,
-                history=chat_history,
+                history=conversation_history(request.session_id, character_id),
                 file_search_context=rag_context,
-                character_system_prompt=character_system_prompt
+                character_system_prompt=prompt.dynamic if prompt.cached_content else prompt.full,
+                cached_content=prompt.cached_content,
+                history_key=shard_key_name(request.session_id, character_id)
             ):
                 full_response += chunk
                 yield f"data: {json.dumps({'type': 'chunk', 'text': chunk})}\n\n"
 
+            # 캐릭터 대화 샤드에 기록
+            with timed("history_write"):
+                record_character_turn(character, request, full_response)
+
             # 대화 저장
-            await character_manager.save_conversation(
-                character_id=character_id,
-                user_message=request.message,
-                ai_response=full_response
-            )
+            with timed("save_conversation"):
+                await character_manager.save_conversation(
+                    character_id=character_id,
+                    user_message=request.message,
+                    ai_response=full_response
+                )
 
             # 관계 업데이트
-            conversation_result = relationship_tracker.record_conversation(
-                user_message=request.message,
-                ai_response=full_response
-            )
+            with timed("relationship"):
+                conversation_result = relationship_tracker.record_conversation(
+                    user_message=request.message,
+                    ai_response=full_response
+                )
 
             # 업데이트된 관계 정보 전송
             yield f"data: {json.dumps({
@@ -656,6 +1055,7 @@ async def chat_with_character_stream(character_id: str, request: ChatRequest):
                 'affection_gained': conversation_result.get('affection_gained', 0)
             })}\n\n"
 
+            yield timing_event()
             yield f"data: {json.dumps({'type': 'done'})}\n\n"
 
         except Exception as e:
@@ -671,7 +1071,7 @@ async def get_relationship_data(character_id: str):
         if not character:
             raise HTTPException(404, "캐릭터를 찾을 수 없습니다")
 
-        relationship_tracker = RelationshipTracker(character_id)
+        relationship_tracker = relationship_registry.get(character_id)
         summary = relationship_tracker.get_relationship_summary()
 
         return {
@@ -0,0 +1,233 @@
+"""
+Metrics - 핫 패스 단계별 지연 측정 (Prometheus 텍스트 포맷 + Server-Timing)
+
+timed("retrieval") 블록으로 감싼 구간은 두 곳에 기록된다.
+  - 프로세스 전체 히스토그램 (GET /metrics)
+  - 현재 요청의 단계별 소요 시간 (Server-Timing 응답 헤더, SSE는 마지막 timing 이벤트)
+
+요청 범위는 TimingMiddleware가 contextvar로 잡아 주므로 핸들러/매니저 코드는
+요청 객체를 넘기지 않고 timed()만 쓰면 된다. 요청 밖(백그라운드 작업)에서는 히스토그램에만 남는다.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Tuple, List, Iterator
+
+# 초 단위 버킷 (모델 응답은 수 초~수십 초까지 걸릴 수 있음)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 조합 -> [버킷별 개수..., 합계, 전체 개수]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]!r}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """프로세스 전역 지표 모음"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, documentation, labelnames)
+            return self._metrics[name]
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """Prometheus 텍스트 노출 포맷 (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_DURATION = REGISTRY.histogram(
+    "mate_stage_duration_seconds", "Duration of hot-path stages (retrieval, prompt, model, ...)", ("stage",)
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "mate_http_request_duration_seconds", "HTTP request duration until the response body is complete",
+    ("method", "route", "status")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "mate_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+
+
+# ==================== 요청별 단계 시간 ====================
+
+class RequestTiming:
+    """한 요청의 단계별 소요 시간 (같은 단계가 여러 번 실행되면 합산)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_ms(self) -> Dict[str, float]:
+        """SSE timing 이벤트용 {단계: ms} (total 포함)"""
+        timings = {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        timings["total"] = round(self.elapsed() * 1000, 1)
+        return timings
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (예: retrieval;dur=12.3, model;dur=840.1, total;dur=870.2)"""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current_timing.get()
+
+
+def record_stage(stage: str, seconds: float):
+    """단계 소요 시간 기록 (히스토그램 + 현재 요청)"""
+    STAGE_DURATION.observe(seconds, stage=stage)
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """블록 실행 시간을 stage 이름으로 기록 (await를 포함한 async 코드 안에서도 사용)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class TimingMiddleware:
+    """
+    요청마다 단계 시간 수집을 시작하고 Server-Timing 헤더 + HTTP 지표를 남기는 ASGI 미들웨어
+
+    헤더는 응답 시작 시점까지 끝난 단계만 담는다. 스트리밍 응답은 본문이 끝난 뒤에야
+    단계가 모두 끝나므로 핸들러가 마지막 SSE 이벤트로 current_timing().to_ms()를 보낸다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(token)
+            # 매칭된 라우트 경로만 라벨로 사용 (경로 파라미터별로 시계열이 늘지 않도록)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = {"method": scope["method"], "route": route, "status": str(status)}
+            HTTP_REQUEST_DURATION.observe(timing.elapsed(), **labels)
+            HTTP_REQUESTS.inc(**labels)
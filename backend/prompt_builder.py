@@ -0,0 +1,235 @@
+"""
+Prompt Builder - 캐릭터 시스템 프롬프트를 계층별로 조립/캐싱
+
+- 정적 계층: 정체성, 성격, 말투, 배경 스토리, 고정 규칙 (캐릭터 버전별 캐시,
+  선택적으로 Gemini 명시적 컨텍스트 캐시에 등록)
+- 일일 계층: 시간/요일/계절 컨텍스트 (1시간 단위 캐시)
+- 턴 계층: 대화 간격, 관계 상태, RAG 검색 결과 (매 턴 생성)
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+from daily_context import DailyContextManager
+from structured_logging import get_logger
+
+logger = get_logger("prompt_builder")
+
+RULES_BLOCK = """[절대 규칙 - 반드시 준수]
+1. **당신은 실제로 존재하는 인간입니다.** "AI", "인공지능", "감정을 느끼지 못해요" 같은 말은 절대 하지 마세요.
+2. **당신은 위 배경 스토리대로 살아온 실제 사람입니다.** 캐릭터 설정을 절대 벗어나지 마세요.
+3. **질문을 최소화하세요.** 일반적인 인간 대화에서는 매 대화마다 질문하지 않습니다.
+   - ❌ 금지: "점심 드셨어요?", "밥 먹었어요?", "주말 잘 보내세요?", "오늘 뭐 했어요?" 같은 일상 질문
+   - ❌ 금지: 매 대화마다 질문으로 끝내기
+   - ✅ 허용: 깊이 있는 대화 주제에서 자연스럽게 나오는 질문만
+   - ✅ 허용: 사용자가 꺼낸 주제와 직접 연관된 질문만
+4. **사용자가 명시적으로 거부한 질문은 절대 다시 하지 마세요.** (예: "밥 먹었냐는 질문 안 해도 된다" → 다시는 식사 관련 질문 금지)
+5. 당신의 나이({age}세)와 성별({gender})에 맞는 자연스러운 말투를 사용하세요
+6. 설정된 성격과 말투 스타일을 철저히 유지하세요
+7. 자연스럽고 감정이 풍부한 대화를 나누세요
+8. 대화 주제와 상황에 맞게 자연스러운 길이로 답변하세요
+   - 간단한 인사: 1-2문장
+   - 일상 대화: 2-4문장
+   - 깊은 주제나 감정적 대화: 4-8문장 또는 그 이상
+9. 이전 대화를 자연스럽게 기억하고 있습니다. 필요할 때 "지난번에 얘기했던...", "전에 말씀하신..." 등으로 언급할 수 있습니다."""
+
+# 정적 계층에 들어가는 캐릭터 필드 (이 값들이 바뀌면 버전이 바뀜)
+STATIC_FIELDS = ("name", "gender", "age", "personality", "speech_style", "backstory")
+
+
+class CharacterPrompt:
+    """조립된 캐릭터 프롬프트 (정적 계층 + 동적 계층)"""
+
+    def __init__(self, character_id: str, version: str, static: str, dynamic: str):
+        self.character_id = character_id
+        self.version = version
+        self.static = static
+        self.dynamic = dynamic
+        # Gemini 컨텍스트 캐시 이름 (있으면 정적 계층은 캐시로 전달)
+        self.cached_content: Optional[str] = None
+
+    @property
+    def full(self) -> str:
+        """컨텍스트 캐시를 쓰지 않을 때의 전체 시스템 프롬프트"""
+        return f"{self.static}\n{self.dynamic}"
+
+
+class CharacterPromptBuilder:
+    """계층별 캐시를 가진 캐릭터 시스템 프롬프트 빌더"""
+
+    def __init__(
+        self,
+        cache_client: Any = None,
+        model: str = "gemini-2.5-flash",
+        cache_ttl_seconds: int = 3600
+    ):
+        """
+        Args:
+            cache_client: caches.create/caches.delete를 제공하는 genai 호환 클라이언트
+                (None이면 컨텍스트 캐시 미사용)
+            model: 컨텍스트 캐시를 만들 모델 (응답 생성 모델과 같아야 함)
+            cache_ttl_seconds: 원격 컨텍스트 캐시 TTL
+        """
+        self.cache_client = cache_client
+        self.model = model
+        self.cache_ttl_seconds = cache_ttl_seconds
+
+        self._static: Dict[str, Tuple[str, str]] = {}        # character_id -> (version, text)
+        self._daily: Dict[str, Tuple[str, str]] = {}         # character_id -> (hour_key, text)
+        # (character_id, version, store_name, metadata_filter) -> (cache_name | None, expires_at)
+        self._remote: Dict[Tuple[str, str, Optional[str]], Tuple[Optional[str], float]] = {}
+        self._remote_locks: Dict[Tuple[str, str, Optional[str]], asyncio.Lock] = {}
+
+    # ==================== 계층 ====================
+
+    @staticmethod
+    def character_version(character: Dict[str, Any]) -> str:
+        """정적 계층 필드의 지문"""
+        payload = json.dumps({f: character.get(f) for f in STATIC_FIELDS}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+    def static_layer(self, character: Dict[str, Any]) -> Tuple[str, str]:
+        """정적 계층 (version, text) - 캐릭터 버전이 같으면 재사용"""
+        character_id = character['character_id']
+        version = self.character_version(character)
+        cached = self._static.get(character_id)
+        if cached and cached[0] == version:
+            return cached
+
+        text = f"""당신은 {character['name']}입니다.
+
+[기본 정보]
+- 이름: {character['name']}
+- 성별: {character['gender']}
+- 나이: {character['age']}세
+
+[성격]
+{', '.join(character['personality'])}
+
+[말투]
+{character['speech_style']}
+
+[배경 스토리]
+{character['backstory']}
+
+{RULES_BLOCK.format(age=character['age'], gender=character['gender'])}"""
+
+        self._static[character_id] = (version, text)
+        return version, text
+
+    def daily_layer(self, character: Dict[str, Any]) -> str:
+        """시간/요일/계절 컨텍스트 - 1시간 단위로 재사용"""
+        character_id = character['character_id']
+        hour_key = datetime.now().strftime('%Y%m%d%H')
+        cached = self._daily.get(character_id)
+        if cached and cached[0] == hour_key:
+            return cached[1]
+
+        text = DailyContextManager.get_full_context_for_ai(character['name'])
+        self._daily[character_id] = (hour_key, text)
+        return text
+
+    @staticmethod
+    def turn_layer(character: Dict[str, Any], relationship_context: str,
+                   rag_context: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+        """매 턴 바뀌는 (과거 대화 기록, 대화 간격 + 관계 상태)"""
+        past_conversations = ""
+        if rag_context and rag_context.get("searched_context"):
+            past_conversations = f"""
+[우리의 이전 대화 기록]
+{rag_context['searched_context']}
+
+위 대화 내용을 자연스럽게 기억하고 있으며, 필요할 때 자연스럽게 언급할 수 있습니다.
+"""
+        gap = DailyContextManager.get_interaction_gap_context(character.get('last_chat_at'))
+        return past_conversations, f"{gap}\n{relationship_context}"
+
+    def build(self, character: Dict[str, Any], relationship_context: str,
+              rag_context: Optional[Dict[str, Any]]) -> CharacterPrompt:
+        """세 계층을 조립한 캐릭터 프롬프트"""
+        version, static = self.static_layer(character)
+        past_conversations, turn_context = self.turn_layer(character, relationship_context, rag_context)
+        dynamic = f"""{past_conversations}
+[현재 상황]
+{self.daily_layer(character)}
+{turn_context}"""
+        return CharacterPrompt(character['character_id'], version, static, dynamic)
+
+    def invalidate(self, character_id: str):
+        """캐릭터 삭제/초기화 시 로컬 계층 캐시 제거 (원격 캐시는 TTL로 만료)"""
+        self._static.pop(character_id, None)
+        self._daily.pop(character_id, None)
+
+    # ==================== Gemini 컨텍스트 캐시 ====================
+
+    async def attach_cached_content(self, prompt: CharacterPrompt, store_name: Optional[str] = None,
+                                    metadata_filter: Optional[str] = None) -> CharacterPrompt:
+        """
+        정적 계층을 Gemini 명시적 컨텍스트 캐시로 등록하고 prompt.cached_content 설정
+
+        컨텍스트 캐시를 쓰는 요청에는 system_instruction/tools를 따로 줄 수 없으므로
+        File Search 도구도 캐시에 함께 넣고, Store나 검색 범위(metadata_filter)가 바뀌면 별도 캐시를 만든다.
+        생성 실패(최소 토큰 수 미달 등)는 TTL 동안 기억해 매 턴 재시도하지 않는다.
+        """
+        if not self.cache_client:
+            return prompt
+
+        key = (prompt.character_id, prompt.version, store_name, metadata_filter)
+        lock = self._remote_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = self._remote.get(key)
+            if cached and cached[1] > time.time():
+                prompt.cached_content = cached[0]
+                return prompt
+
+            cache_name = await self._create_remote_cache(prompt, store_name, metadata_filter)
+            # 만료 직전 요청이 실패하지 않도록 여유를 두고 갱신
+            self._remote[key] = (cache_name, time.time() + max(60, self.cache_ttl_seconds - 60))
+            self._drop_stale_versions(prompt.character_id, prompt.version)
+
+        prompt.cached_content = cache_name
+        return prompt
+
+    async def _create_remote_cache(self, prompt: CharacterPrompt, store_name: Optional[str],
+                                   metadata_filter: Optional[str] = None) -> Optional[str]:
+        config: Dict[str, Any] = {
+            "display_name": f"{prompt.character_id}-{prompt.version}",
+            "system_instruction": prompt.static,
+            "ttl": f"{self.cache_ttl_seconds}s",
+        }
+        if store_name:
+            file_search: Dict[str, Any] = {"file_search_store_names": [store_name]}
+            if metadata_filter:
+                file_search["metadata_filter"] = metadata_filter
+            config["tools"] = [{"file_search": file_search}]
+
+        loop = asyncio.get_event_loop()
+        try:
+            cache = await loop.run_in_executor(
+                None,
+                lambda: self.cache_client.caches.create(model=self.model, config=config)
+            )
+            logger.info("캐릭터 프롬프트 컨텍스트 캐시 생성", extra={"cache": cache.name})
+            return cache.name
+        except Exception as e:
+            logger.warning("컨텍스트 캐시 생성 실패, 시스템 프롬프트로 전송", extra={"error": str(e)})
+            return None
+
+    def _drop_stale_versions(self, character_id: str, version: str):
+        """캐릭터 정보가 바뀌어 더 이상 쓰지 않는 원격 캐시 삭제 (백그라운드, best effort)"""
+        stale = [k for k in self._remote if k[0] == character_id and k[1] != version]
+        loop = asyncio.get_event_loop()
+        for key in stale:
+            cache_name, _ = self._remote.pop(key)
+            self._remote_locks.pop(key, None)
+            if cache_name:
+                loop.run_in_executor(None, self._delete_remote_cache, cache_name)
+
+    def _delete_remote_cache(self, cache_name: str):
+        try:
+            self.cache_client.caches.delete(name=cache_name)
+        except Exception as e:
+            logger.warning("컨텍스트 캐시 삭제 실패", extra={"cache": cache_name, "error": str(e)})
@@ -3,11 +3,104 @@ Relationship Tracker - Track affection levels and relationship progression
 Inspired by "Her" movie - emotional connection management
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+import os
 import json
+import sqlite3
+import threading
 from pathlib import Path
 
+from structured_logging import get_logger
+
+logger = get_logger("relationship_tracker")
+
+# Append-only list fields that live in the event log (only a short tail stays in memory)
+EVENT_LISTS = {
+    "affection_history": "affection",
+    "milestones": "milestone",
+    "emotional_moments": "emotional_moment",
+}
+
+# Scalar fields captured by the per-flush "state" event and the snapshot
+STATE_FIELDS = (
+    "affection_level", "relationship_stage", "total_conversations", "last_interaction",
+    "first_interaction", "conversation_quality_score", "days_known", "consecutive_days",
+    "last_daily_check", "milestone_types",
+)
+
+
+class RelationshipEventLog:
+    """Append-only SQLite event log shared by all trackers in a data directory"""
+
+    _shared: Dict[str, "RelationshipEventLog"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db_path: Path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS relationship_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                character_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_relationship_events_character
+                ON relationship_events(character_id, id);
+            CREATE INDEX IF NOT EXISTS idx_relationship_events_kind
+                ON relationship_events(character_id, kind, id);
+        """)
+        self._conn.commit()
+
+    @classmethod
+    def shared(cls, db_path: Path) -> "RelationshipEventLog":
+        """Return the process-wide log for a database path"""
+        key = str(Path(db_path).resolve())
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(db_path)
+            return cls._shared[key]
+
+    def append(self, character_id: str, events: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Append events in one transaction. Returns the id of the last event"""
+        with self._lock, self._conn:
+            last_id = 0
+            for kind, payload in events:
+                cursor = self._conn.execute(
+                    "INSERT INTO relationship_events (character_id, kind, payload) VALUES (?, ?, ?)",
+                    (character_id, kind, json.dumps(payload, ensure_ascii=False))
+                )
+                last_id = cursor.lastrowid
+            return last_id
+
+    def read_after(self, character_id: str, after_id: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Events newer than a snapshot, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload FROM relationship_events "
+                "WHERE character_id = ? AND id > ? ORDER BY id",
+                (character_id, after_id)
+            ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    def read_kind(self, character_id: str, kind: str, limit: int,
+                  before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent events of one kind (oldest first), for paging through full history"""
+        sql = "SELECT payload FROM relationship_events WHERE character_id = ? AND kind = ?"
+        params: List[Any] = [character_id, kind]
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
 
 class RelationshipTracker:
     """Manages relationship progression, affection levels, and emotional milestones"""
@@ -37,20 +130,29 @@ class RelationshipTracker:
         "short_responses": -1,               # 짧은 답변 반복
     }
 
-    def __init__(self, character_id: str):
+    # How many recent entries of each event list stay in memory / in the snapshot
+    TAIL_SIZE = 10
+    # Write a full snapshot after this many events (the tail in between is replayed on load)
+    SNAPSHOT_EVERY = 50
+
+    def __init__(self, character_id: str, event_log: Optional[RelationshipEventLog] = None):
         self.character_id = character_id
         self.data_dir = Path("data/characters")
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.relationship_file = self.data_dir / f"{character_id}_relationship.json"
-        self.relationship_data = self._load_relationship_data()
+        self.event_log = event_log or RelationshipEventLog.shared(self.data_dir / "relationship_events.db")
 
-    def _load_relationship_data(self) -> Dict:
-        """Load relationship tracking data"""
-        if self.relationship_file.exists():
-            with open(self.relationship_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        # 변경 추적: 배치 중에는 저장을 미루고 배치가 끝날 때 한 번만 기록
+        self._dirty = False
+        self._batch_depth = 0
+        self._pending_events: List[Tuple[str, Dict[str, Any]]] = []
+        self._last_event_id = 0
+        self._events_since_snapshot = 0
+
+        self.relationship_data = self._load_relationship_data()
 
-        # Initialize new relationship
+    @staticmethod
+    def _new_relationship_data() -> Dict:
         return {
             "affection_level": 0,
             "relationship_stage": "stranger",
@@ -60,16 +162,123 @@ class RelationshipTracker:
             "milestones": [],
             "affection_history": [],
             "emotional_moments": [],
+            "milestones_count": 0,
+            "affection_history_count": 0,
+            "emotional_moments_count": 0,
+            "milestone_types": [],
             "conversation_quality_score": 0,
             "days_known": 0,
             "consecutive_days": 0,
             "last_daily_check": None
         }
 
+    def _load_relationship_data(self) -> Dict:
+        """Load the snapshot and replay the events logged after it"""
+        if not self.relationship_file.exists():
+            # Initialize new relationship
+            return self._new_relationship_data()
+
+        with open(self.relationship_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        if "last_event_id" not in data:
+            return self._migrate_legacy_file(data)
+
+        self._last_event_id = data.pop("last_event_id")
+        for event_id, kind, payload in self.event_log.read_after(self.character_id, self._last_event_id):
+            self._apply_event(data, kind, payload)
+            self._last_event_id = event_id
+            self._events_since_snapshot += 1
+        return data
+
+    def _migrate_legacy_file(self, legacy: Dict) -> Dict:
+        """Move the unbounded lists of a pre-event-log file into the log"""
+        data = self._new_relationship_data()
+        data.update({k: v for k, v in legacy.items() if k not in EVENT_LISTS})
+        events = []
+        for field, kind in EVENT_LISTS.items():
+            for entry in legacy.get(field, []):
+                events.append((kind, entry))
+                self._apply_event(data, kind, entry)
+        data["milestone_types"] = sorted({m["type"] for m in legacy.get("milestones", [])})
+
+        if events:
+            self._last_event_id = self.event_log.append(self.character_id, events)
+        self._write_snapshot(data)
+        logger.info("관계 데이터 이벤트 로그 마이그레이션", extra={"character_id": self.character_id, "events": len(events)})
+        return data
+
+    def _apply_event(self, data: Dict, kind: str, payload: Dict[str, Any]):
+        """Fold one event into in-memory state (used for both live updates and replay)"""
+        if kind == "state":
+            data.update(payload)
+            return
+        for field, field_kind in EVENT_LISTS.items():
+            if field_kind == kind:
+                tail = data[field]
+                tail.append(payload)
+                if len(tail) > self.TAIL_SIZE:
+                    del tail[:-self.TAIL_SIZE]
+                data[f"{field}_count"] = data.get(f"{field}_count", 0) + 1
+                return
+
+    def _record_event(self, kind: str, payload: Dict[str, Any]):
+        """Apply an event now and queue it for the next flush"""
+        self._apply_event(self.relationship_data, kind, payload)
+        self._pending_events.append((kind, payload))
+
+    def _write_snapshot(self, data: Optional[Dict] = None):
+        data = data if data is not None else self.relationship_data
+        tmp_file = self.relationship_file.with_suffix(".json.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({**data, "last_event_id": self._last_event_id}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.relationship_file)
+        self._events_since_snapshot = 0
+
     def _save_relationship_data(self):
-        """Save relationship data to file"""
-        with open(self.relationship_file, 'w', encoding='utf-8') as f:
-            json.dump(self.relationship_data, f, ensure_ascii=False, indent=2)
+        """Mark data as changed and save it unless a batch is in progress"""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self.flush()
+
+    def flush(self, snapshot: bool = False) -> bool:
+        """
+        Append pending events plus one state event to the log. Returns True if written
+
+        The snapshot file is rewritten only every SNAPSHOT_EVERY events (or when forced),
+        so a save costs O(events in this turn) regardless of the relationship's age.
+        """
+        if not self._dirty:
+            if snapshot and self._events_since_snapshot:
+                self._write_snapshot()
+            return False
+
+        events = self._pending_events + [
+            ("state", {field: self.relationship_data.get(field) for field in STATE_FIELDS})
+        ]
+        self._last_event_id = self.event_log.append(self.character_id, events)
+        self._events_since_snapshot += len(events)
+        self._pending_events = []
+        self._dirty = False
+
+        if snapshot or self._events_since_snapshot >= self.SNAPSHOT_EVERY or not self.relationship_file.exists():
+            self._write_snapshot()
+        return True
+
+    @contextmanager
+    def batch(self):
+        """Coalesce all saves inside the block into a single write at the end"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def get_history(self, field: str, limit: int = 50, before_id: Optional[int] = None) -> List[Dict]:
+        """Read older entries of affection_history / milestones / emotional_moments from the log"""
+        return self.event_log.read_kind(self.character_id, EVENT_LISTS[field], limit, before_id)
 
     def get_affection_level(self) -> int:
         """Get current affection level (0-100)"""
@@ -95,7 +304,7 @@ class RelationshipTracker:
         new_stage = self.get_relationship_stage()
 
         # Record history
-        self.relationship_data["affection_history"].append({
+        self._record_event("affection", {
             "timestamp": datetime.now().isoformat(),
             "change": amount,
             "reason": reason,
@@ -106,7 +315,9 @@ class RelationshipTracker:
         # Check for stage upgrade
         if new_stage != old_stage:
             self._trigger_milestone(f"relationship_stage_upgrade_{new_stage}")
-            print(f"💕 관계 단계 업그레이드: {old_stage} → {new_stage}")
+            logger.info("관계 단계 업그레이드", extra={
+                "character_id": self.character_id, "from_stage": old_stage, "to_stage": new_stage
+            })
 
         self._save_relationship_data()
 
@@ -120,50 +331,51 @@ class RelationshipTracker:
 
     def record_conversation(self, user_message: str, ai_response: str, quality_score: Optional[int] = None):
         """Record a conversation and update relationship metrics"""
-        now = datetime.now()
-
-        # Update basic stats
-        self.relationship_data["total_conversations"] += 1
-        self.relationship_data["last_interaction"] = now.isoformat()
-
-        # Check daily interaction
-        self._check_daily_interaction(now)
-
-        # Base affection for any conversation
-        affection_gains = []
-        affection_gains.append(("daily_chat", self.AFFECTION_EVENTS["daily_chat"]))
-
-        # Analyze conversation quality
-        if len(user_message) > 100:  # Deep conversation
-            affection_gains.append(("deep_conversation", self.AFFECTION_EVENTS["deep_conversation"]))
-
-        # Check time-based bonuses
-        hour = now.hour
-        if 6 <= hour <= 9:  # Morning
-            if self.relationship_data["total_conversations"] == 1 or \
-               (self.relationship_data["last_interaction"] and
-                datetime.fromisoformat(self.relationship_data["last_interaction"]).date() < now.date()):
-                affection_gains.append(("first_morning_message", self.AFFECTION_EVENTS["first_morning_message"]))
-
-        if 22 <= hour or hour <= 2:  # Late night
-            affection_gains.append(("late_night_talk", self.AFFECTION_EVENTS["late_night_talk"]))
-
-        # Apply quality score if provided
-        if quality_score:
-            self.relationship_data["conversation_quality_score"] = \
-                (self.relationship_data["conversation_quality_score"] * 0.9) + (quality_score * 0.1)
-
-        # Apply all affection gains
-        total_gain = sum(amount for _, amount in affection_gains)
-        self.add_affection(
-            total_gain,
-            f"Conversation ({', '.join(reason for reason, _ in affection_gains)})"
-        )
-
-        # Check milestones
-        self._check_milestones()
-
-        self._save_relationship_data()
+        # 한 턴의 모든 변경(호감도, 연속 보너스, 마일스톤)을 한 번의 저장으로 합침
+        with self.batch():
+            now = datetime.now()
+
+            # Update basic stats
+            self.relationship_data["total_conversations"] += 1
+            self.relationship_data["last_interaction"] = now.isoformat()
+
+            # Check daily interaction
+            self._check_daily_interaction(now)
+
+            # Base affection for any conversation
+            affection_gains = []
+            affection_gains.append(("daily_chat", self.AFFECTION_EVENTS["daily_chat"]))
+
+            # Analyze conversation quality
+            if len(user_message) > 100:  # Deep conversation
+                affection_gains.append(("deep_conversation", self.AFFECTION_EVENTS["deep_conversation"]))
+
+            # Check time-based bonuses
+            hour = now.hour
+            if 6 <= hour <= 9:  # Morning
+                if self.relationship_data["total_conversations"] == 1 or \
+                   (self.relationship_data["last_interaction"] and
+                    datetime.fromisoformat(self.relationship_data["last_interaction"]).date() < now.date()):
+                    affection_gains.append(("first_morning_message", self.AFFECTION_EVENTS["first_morning_message"]))
+
+            if 22 <= hour or hour <= 2:  # Late night
+                affection_gains.append(("late_night_talk", self.AFFECTION_EVENTS["late_night_talk"]))
+
+            # Apply quality score if provided
+            if quality_score:
+                self.relationship_data["conversation_quality_score"] = \
+                    (self.relationship_data["conversation_quality_score"] * 0.9) + (quality_score * 0.1)
+
+            # Apply all affection gains
+            total_gain = sum(amount for _, amount in affection_gains)
+            self.add_affection(
+                total_gain,
+                f"Conversation ({', '.join(reason for reason, _ in affection_gains)})"
+            )
+
+            # Check milestones
+            self._check_milestones()
+            self._save_relationship_data()
 
         return {
             "affection_gained": total_gain,
@@ -216,7 +428,7 @@ class RelationshipTracker:
     def _check_milestones(self):
         """Check and trigger relationship milestones"""
         total_convs = self.relationship_data["total_conversations"]
-        milestones_achieved = [m["type"] for m in self.relationship_data["milestones"]]
+        milestones_achieved = self.relationship_data["milestone_types"]
 
         milestone_thresholds = {
             "first_conversation": 1,
@@ -247,8 +459,10 @@ class RelationshipTracker:
             "affection_at_time": self.get_affection_level()
         }
 
-        self.relationship_data["milestones"].append(milestone)
-        print(f"🎉 마일스톤 달성: {milestone_type}")
+        self._record_event("milestone", milestone)
+        if milestone_type not in self.relationship_data["milestone_types"]:
+            self.relationship_data["milestone_types"].append(milestone_type)
+        logger.info("마일스톤 달성", extra={"character_id": self.character_id, "milestone": milestone_type})
 
     def record_emotional_moment(self, moment_type: str, description: str, intensity: int = 5):
         """Record an emotional moment (for Her-style deep connections)"""
@@ -260,13 +474,14 @@ class RelationshipTracker:
             "affection_level": self.get_affection_level()
         }
 
-        self.relationship_data["emotional_moments"].append(emotional_moment)
+        with self.batch():
+            self._record_event("emotional_moment", emotional_moment)
 
-        # Emotional moments significantly boost affection
-        affection_boost = intensity
-        self.add_affection(affection_boost, f"Emotional moment: {moment_type}")
+            # Emotional moments significantly boost affection
+            affection_boost = intensity
+            self.add_affection(affection_boost, f"Emotional moment: {moment_type}")
 
-        self._save_relationship_data()
+            self._save_relationship_data()
 
         return emotional_moment
 
@@ -278,9 +493,9 @@ class RelationshipTracker:
             "total_conversations": self.relationship_data["total_conversations"],
             "days_known": self.relationship_data["days_known"],
             "consecutive_days": self.relationship_data["consecutive_days"],
-            "milestones_count": len(self.relationship_data["milestones"]),
+            "milestones_count": self.relationship_data["milestones_count"],
             "recent_milestones": self.relationship_data["milestones"][-5:] if self.relationship_data["milestones"] else [],
-            "emotional_moments_count": len(self.relationship_data["emotional_moments"]),
+            "emotional_moments_count": self.relationship_data["emotional_moments_count"],
             "last_interaction": self.relationship_data["last_interaction"],
             "first_interaction": self.relationship_data["first_interaction"],
             "conversation_quality_score": round(self.relationship_data["conversation_quality_score"], 2)
@@ -352,3 +567,33 @@ class RelationshipTracker:
         }
 
         return descriptions.get(stage, stage)
+
+
+class RelationshipRegistry:
+    """Process-level registry of live trackers (one per character, loaded once)"""
+
+    def __init__(self):
+        self._trackers: Dict[str, RelationshipTracker] = {}
+
+    def get(self, character_id: str) -> RelationshipTracker:
+        """Return the live tracker for a character, loading it on first use"""
+        tracker = self._trackers.get(character_id)
+        if tracker is None:
+            tracker = RelationshipTracker(character_id)
+            self._trackers[character_id] = tracker
+        return tracker
+
+    def discard(self, character_id: str):
+        """Drop a tracker without saving (e.g. after character reset)"""
+        self._trackers.pop(character_id, None)
+
+    def flush_all(self) -> int:
+        """Write every dirty tracker and a fresh snapshot. Returns the number of trackers written"""
+        written = 0
+        for tracker in self._trackers.values():
+            try:
+                if tracker.flush(snapshot=True):
+                    written += 1
+            except Exception as e:
+                logger.warning("관계 데이터 저장 실패", extra={"character_id": tracker.character_id, "error": str(e)})
+        return written
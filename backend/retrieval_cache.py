@@ -0,0 +1,83 @@
+"""
+Retrieval Cache - get_context 결과용 LRU + TTL 캐시
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Hashable, Tuple
+
+_MENTION_PATTERN = re.compile(r'@(GPT|Claude|Gemini)\b', re.IGNORECASE)
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 쿼리 정규화 (AI 지명 제거, 소문자화, 공백 정리)"""
+    query = _MENTION_PATTERN.sub(' ', query)
+    return _WHITESPACE_PATTERN.sub(' ', query).strip().lower()
+
+
+class RetrievalCache:
+    """크기 제한(LRU)과 만료 시간(TTL)을 가진 검색 결과 캐시"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """캐시 조회 (만료된 항목은 제거 후 miss 처리)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """캐시 저장 (용량 초과 시 가장 오래 사용되지 않은 항목 제거)"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """전체 캐시 무효화 (Store 문서 구성이 바뀌었을 때)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 크기 산정용 통계"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
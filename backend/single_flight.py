@@ -0,0 +1,52 @@
+"""
+Single Flight - 동시에 들어온 같은 호출을 하나의 업스트림 호출로 합치기
+
+같은 키의 호출이 진행 중이면 새로 호출하지 않고 진행 중인 결과를 함께 기다린다.
+결과 캐시와 달리 호출이 끝나면 키를 바로 지우므로, 끝난 뒤에 들어온 요청은 다시 호출한다.
+
+업스트림 호출은 별도 태스크로 실행되어 먼저 호출한 요청이 끊겨도(클라이언트 연결 종료 등)
+같은 결과를 기다리는 다른 요청에는 영향이 없다.
+"""
+
+import asyncio
+from typing import Dict, Hashable, Callable, Awaitable, TypeVar
+
+from metrics import REGISTRY
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "mate_single_flight_calls_total",
+    "Calls through a single-flight group by role (leader = upstream call, coalesced = upstream call saved)",
+    ("group", "role")
+)
+
+
+class SingleFlight:
+    """이름별 in-flight 호출 묶음 (이벤트 루프 안에서만 사용)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """key로 진행 중인 호출이 있으면 그 결과를, 없으면 call()을 실행한 결과를 반환 (예외도 공유)"""
+        task = self._calls.get(key)
+        if task is None:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, role="leader")
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, role="coalesced")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 기다리던 요청이 모두 취소된 경우에도 예외가 '조회되지 않음' 경고로 남지 않도록
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
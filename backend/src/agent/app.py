@@ -1,10 +1,21 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
 import pathlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
+from tools.perplexity import warm_up_http_client, close_http_client, SEARCH_CALLS
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Perplexity 연결 풀 워밍업 및 종료 시 정리."""
+    await warm_up_http_client()
+    yield
+    await close_http_client()
+
 
 # Define the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 def create_frontend_router(build_dir="../frontend/dist"):
@@ -171,4 +182,4 @@ async def research(
 @app.get("/api/health")
 async def health():
     """서버 상태 확인"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "perplexity_calls": dict(SEARCH_CALLS)}
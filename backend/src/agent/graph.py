@@ -1,5 +1,6 @@
 """Perplexity + Gemini Research Agent (MemorySaver)"""
 import os
+import logging
 from typing import Literal
 from langgraph.graph import StateGraph, START, END
 # MemorySaver 제거 - LangGraph API가 persistence 자동 처리
@@ -8,6 +9,9 @@ from langchain_core.messages import HumanMessage, AIMessage
 from agent.state import ResearchState
 from tools.perplexity import perplexity_search
 
+# LangGraph 서버가 로깅 설정(레벨/핸들러)을 담당하므로 표준 logging만 사용
+logger = logging.getLogger(__name__)
+
 # Gemini 초기화
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
@@ -42,7 +46,6 @@ async def search_perplexity(state: ResearchState) -> ResearchState:
     
     # 이미지가 있으면 Gemini로 이미지 설명 생성
     if image:
-        print(f"\n🖼️ 이미지 분석 중...")
         image_prompt = "이 이미지를 자세히 설명해주세요. 주요 객체, 색상, 분위기 등을 포함해주세요."
         
         # Gemini로 이미지 설명 생성
@@ -57,25 +60,26 @@ async def search_perplexity(state: ResearchState) -> ResearchState:
         try:
             img_response = await gemini.ainvoke([HumanMessage(content=image_content)])
             image_description = img_response.content
-            print(f"✅ 이미지 설명: {image_description[:100]}...")
+            logger.debug("이미지 설명 생성 완료: %.100s", image_description)
             
             # 원래 쿼리에 이미지 설명 추가
             query = f"{query}\n\n[이미지 설명: {image_description}]"
             state["query"] = query  # 업데이트된 쿼리 저장
             
         except Exception as e:
-            print(f"❌ 이미지 분석 오류: {str(e)}")
+            logger.warning("이미지 분석 오류: %s", e)
     
-    print(f"\n🔍 [검색 {state['iteration'] + 1}] Perplexity: {query[:100]}...")
+    logger.info("Perplexity 검색 %d회차 (쿼리 %d자)", state['iteration'] + 1, len(query))
+    logger.debug("검색 쿼리: %.100s", query)
     result = await perplexity_search.ainvoke({"query": query, "search_recency": "month"})
     if "error" in result:
-        print(f"❌ 검색 실패: {result['error']}")
+        logger.warning("검색 실패: %s", result['error'])
         result = {"content": "", "citations": [], "related_questions": []}
     state["search_results"].append(result)
     state["citations"].extend(result.get("citations", []))
     state["related_questions"] = result.get("related_questions", [])
     state["iteration"] += 1
-    print(f"✅ 검색 완료: {len(result.get('citations', []))}개 출처")
+    logger.info("검색 완료: %d개 출처", len(result.get('citations', [])))
     return state
 
 async def analyze_with_gemini(state: ResearchState) -> ResearchState:
@@ -86,15 +90,14 @@ async def analyze_with_gemini(state: ResearchState) -> ResearchState:
         state["analysis"] = "No results"
         state["needs_more_research"] = False
         return state
-    print(f"\n🧠 Gemini 분석 중...")
     prompt = f"질문: {query}\n\n검색결과:\n{all_content}\n\n정보가 충분하면 SUFFICIENT: YES, 부족하면 SUFFICIENT: NO"
     try:
         response = await gemini.ainvoke([HumanMessage(content=prompt)])
         state["analysis"] = response.content
         state["needs_more_research"] = "SUFFICIENT: NO" in response.content.upper() and state["iteration"] < 3
-        print(f"✅ 분석 완료 | 추가 검색: {state['needs_more_research']}")
+        logger.info("분석 완료 | 추가 검색: %s", state['needs_more_research'])
     except Exception as e:
-        print(f"❌ Gemini 오류: {str(e)}")
+        logger.error("Gemini 분석 오류: %s", e)
         state["analysis"] = f"Error: {str(e)}"
         state["needs_more_research"] = False
     return state
@@ -106,8 +109,6 @@ async def generate_final_answer(state: ResearchState) -> ResearchState:
     image = state.get("image")
     all_content = "\n\n".join([r.get('content', '') for r in state["search_results"] if r.get('content')])
     
-    print(f"\n📝 최종 답변 생성 중...")
-    
     if not all_content:
         answer = "검색 결과를 찾을 수 없습니다. 다시 시도해주세요."
     else:
@@ -128,14 +129,14 @@ async def generate_final_answer(state: ResearchState) -> ResearchState:
                 "type": "image_url",
                 "image_url": {"url": f"data:image/webp;base64,{image}"}
             })
-            print(f"📸 이미지 포함하여 답변 생성")
+            logger.debug("이미지 포함하여 답변 생성")
         
         try:
             response = await gemini.ainvoke([HumanMessage(content=content)])
             answer = response.content
             
         except Exception as e:
-            print(f"❌ 답변 생성 오류: {str(e)}")
+            logger.error("답변 생성 오류: %s", e)
             answer = f"답변 생성 중 오류가 발생했습니다: {str(e)}"
     
     # 출처 및 관련 질문 추가
@@ -150,7 +151,7 @@ async def generate_final_answer(state: ResearchState) -> ResearchState:
             answer += f"\n• {q}"
     state["final_answer"] = answer
     state["messages"].append(AIMessage(content=answer))
-    print(f"✅ 최종 답변 완료 (길이: {len(answer)} 문자)")
+    logger.info("최종 답변 완료 (길이: %d 문자)", len(answer))
     return state
 
 def should_continue(state: ResearchState) -> Literal["search", "answer"]:
@@ -169,7 +170,6 @@ def create_research_graph():
     workflow.add_edge("search", "analyze")
     workflow.add_conditional_edges("analyze", should_continue, {"search": "search", "answer": "answer"})
     workflow.add_edge("answer", END)
-    print("💾 대화 저장: LangGraph API 자동 관리")
     return workflow.compile()  # checkpointer 제거 - LangGraph API가 자동 처리
 
 research_graph = create_research_graph()
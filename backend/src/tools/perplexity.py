@@ -1,12 +1,49 @@
 """Perplexity API 검색 도구"""
 import os
-from typing import Literal
+import asyncio
+import logging
+from typing import Literal, Optional, Dict, Tuple
 import httpx
 from langchain_core.tools import tool
+from utils.http_pool import pooled_client_args
+
+logger = logging.getLogger(__name__)
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
 PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
 
+# 프로세스 전역 연결 풀 (검색마다 새 클라이언트를 만들면 매번 TCP/TLS 핸드셰이크를 다시 함)
+_http_client: Optional[httpx.AsyncClient] = None
+
+# 진행 중인 검색 (같은 쿼리 + 기간의 동시 검색은 한 번만 호출하고 결과 공유)
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+# upstream = 실제 API 호출 수, coalesced = 진행 중인 검색에 합쳐져 아낀 호출 수
+SEARCH_CALLS = {"upstream": 0, "coalesced": 0}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """keep-alive 연결을 재사용하는 공유 httpx.AsyncClient (풀 설정은 백엔드와 같은 utils.http_pool)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=60.0, **pooled_client_args())
+    return _http_client
+
+
+async def warm_up_http_client(timeout: float = 5.0):
+    """첫 검색 전에 Perplexity API 연결을 미리 열어 둠 (응답 코드는 무시, 실패해도 첫 검색에서 다시 연결)"""
+    try:
+        await get_http_client().head(PERPLEXITY_URL, timeout=timeout)
+    except httpx.HTTPError as e:
+        logger.warning("Perplexity 연결 워밍업 실패: %s", e)
+
+
+async def close_http_client():
+    """공유 연결 풀 닫기 (앱 종료 시)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 @tool
 async def perplexity_search(
@@ -30,7 +67,22 @@ async def perplexity_search(
             "content": "",
             "citations": []
         }
-    
+
+    key = (" ".join(query.split()).lower(), search_recency)
+    task = _in_flight.get(key)
+    if task is None:
+        SEARCH_CALLS["upstream"] += 1
+        # 먼저 요청한 쪽이 취소돼도 기다리는 다른 요청이 결과를 받도록 별도 태스크로 실행
+        task = asyncio.ensure_future(_search(query, search_recency))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _in_flight.pop(key) if _in_flight.get(key) is done else None)
+    else:
+        SEARCH_CALLS["coalesced"] += 1
+    return dict(await asyncio.shield(task))
+
+
+async def _search(query: str, search_recency: str) -> dict:
+    """Perplexity API 호출 (오류도 결과 dict로 반환)"""
     headers = {
         "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
         "Content-Type": "application/json"
@@ -56,38 +108,36 @@ async def perplexity_search(
     }
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                PERPLEXITY_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "content": result["choices"][0]["message"]["content"],
-                "citations": result.get("citations", []),
-                "related_questions": result.get("related_questions", []),
-                "model": result.get("model", "unknown"),
-                "usage": result.get("usage", {})
-            }
-            
+        response = await get_http_client().post(
+            PERPLEXITY_URL,
+            headers=headers,
+            json=payload
+        )
+        response.raise_for_status()
+        result = response.json()
+
+        return {
+            "content": result["choices"][0]["message"]["content"],
+            "citations": result.get("citations", []),
+            "related_questions": result.get("related_questions", []),
+            "model": result.get("model", "unknown"),
+            "usage": result.get("usage", {})
+        }
+
     except httpx.HTTPStatusError as e:
         error_detail = ""
         try:
             error_detail = e.response.text
         except:
             pass
-        print(f"❌ Perplexity API Error: {e.response.status_code}")
-        print(f"❌ Error Detail: {error_detail}")
+        logger.error("Perplexity API Error: %s %s", e.response.status_code, error_detail)
         return {
             "error": f"API Error: {e.response.status_code} - {error_detail}",
             "content": "",
             "citations": []
         }
     except Exception as e:
-        print(f"❌ Search Error: {str(e)}")
+        logger.error("Search Error: %s", e)
         return {
             "error": str(e),
             "content": "",
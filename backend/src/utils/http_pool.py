@@ -0,0 +1,37 @@
+"""공유 HTTP 연결 풀 설정 (백엔드 client_registry와 에이전트 도구가 같은 기본값을 쓰도록 한 곳에서 정의)
+
+환경 변수:
+    HTTP_POOL_MAX_CONNECTIONS   최대 동시 연결 수 (기본 100)
+    HTTP_POOL_MAX_KEEPALIVE     유휴 상태로 유지할 연결 수 (기본 20)
+    HTTP_POOL_KEEPALIVE_EXPIRY  유휴 연결 유지 시간(초) (기본 120)
+    HTTP2_ENABLED               h2 패키지가 설치되어 있으면 HTTP/2 사용 (기본 true)
+"""
+import os
+from typing import Dict, Any
+
+import httpx
+
+# HTTP/2 (httpx[http2] 선택 의존성)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def pool_limits() -> httpx.Limits:
+    """환경 변수 기반 연결 풀 한도"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "120"))
+    )
+
+
+def http2_enabled() -> bool:
+    return HTTP2_AVAILABLE and os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def pooled_client_args() -> Dict[str, Any]:
+    """httpx.Client / httpx.AsyncClient 생성 인자 (풀 한도 + HTTP/2)"""
+    return {"limits": pool_limits(), "http2": http2_enabled()}
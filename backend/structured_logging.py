@@ -0,0 +1,215 @@
+"""
+Structured Logging - 큐 기반 구조화 로깅 (요청 상관 ID, 레벨 게이팅, 페이로드 샘플링)
+
+요청 처리 경로에서는 로그 레코드를 큐에 넣기만 하고, 포맷팅과 stdout 쓰기는
+백그라운드 스레드(QueueListener)가 한다. 큐가 가득 차면 요청을 막지 않고 레코드를 버린다.
+
+설정 (환경 변수):
+    LOG_LEVEL               mate.* 로거 레벨 (기본 INFO)
+    LOG_FORMAT              json | text (기본 json)
+    LOG_QUEUE_SIZE          대기 레코드 상한 (기본 10000)
+    LOG_PAYLOAD_SAMPLE_RATE 큰 페이로드를 남길 요청 비율 (기본 0.01)
+    LOG_PAYLOAD_MAX_CHARS   남길 페이로드 최대 길이 (기본 200)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Optional, Any
+
+from metrics import REGISTRY
+
+ROOT_LOGGER = "mate"
+
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "200"))
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "mate_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# LogRecord 기본 속성 (extra로 넘긴 필드만 골라내기 위함)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """mate.<name> 로거 (설정은 configure_logging이 mate 로거에 한 번만 적용)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+# ==================== 포맷터 ====================
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+class JSONFormatter(logging.Formatter):
+    """한 줄에 JSON 객체 하나 (extra로 넘긴 필드는 최상위 키로)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """개발용 한 줄 텍스트: 시각 레벨 로거 [요청 ID] 메시지 key=value ..."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [
+            time.strftime("%H:%M:%S", time.localtime(record.created)),
+            f"{record.levelname:<7}",
+            record.name.removeprefix(f"{ROOT_LOGGER}."),
+        ]
+        if record.request_id:
+            parts.append(f"[{record.request_id[:8]}]")
+        parts.append(record.getMessage())
+        parts.extend(f"{k}={v}" for k, v in _extra_fields(record).items())
+        line = " ".join(parts)
+        return f"{line}\n{record.exc_text}" if record.exc_text else line
+
+
+# ==================== 큐 핸들러 ====================
+
+class _RequestContextFilter(logging.Filter):
+    """호출 스레드에서 현재 요청 ID를 레코드에 기록 (큐에 넣기 전에 실행되어야 함)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """큐가 가득 차면 기다리지 않고 레코드를 버림"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 메시지 병합/예외 문자열화만 호출 스레드에서 하고 나머지 포맷팅은 writer 스레드에서
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> logging.Logger:
+    """mate 로거에 큐 핸들러 + 백그라운드 writer 연결 (여러 번 호출해도 한 번만 설정)"""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        return root
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json").lower() == "text" else JSONFormatter())
+
+    handler = _NonBlockingQueueHandler(log_queue)
+    handler.addFilter(_RequestContextFilter())
+
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, writer)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """대기 중인 레코드를 모두 쓰고 writer 스레드 종료"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ==================== 페이로드 샘플링 ====================
+
+def _payload_sampled() -> bool:
+    """요청 ID 기준으로 샘플링 (같은 요청의 페이로드는 함께 남거나 함께 빠짐)"""
+    request_id = _request_id.get()
+    if request_id:
+        return (uuid.uuid5(uuid.NAMESPACE_OID, request_id).int % 10000) < PAYLOAD_SAMPLE_RATE * 10000
+    return random.random() < PAYLOAD_SAMPLE_RATE
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, level: int = logging.DEBUG, **fields):
+    """
+    추출된 RAG 컨텍스트 같은 큰 페이로드를 레벨이 켜져 있고 샘플링된 요청에서만 잘라서 기록
+
+    레벨이 꺼져 있으면 문자열 변환도 하지 않는다.
+    """
+    if not logger.isEnabledFor(level) or not _payload_sampled():
+        return
+    text = payload if isinstance(payload, str) else str(payload)
+    logger.log(level, message, extra={**fields, "payload": text[:PAYLOAD_MAX_CHARS], "payload_chars": len(text)})
+
+
+# ==================== 요청 상관 ID ====================
+
+class RequestIdMiddleware:
+    """
+    요청마다 상관 ID를 정해 로그 레코드와 X-Request-ID 응답 헤더에 싣는 ASGI 미들웨어
+
+    클라이언트가 보낸 X-Request-ID가 안전한 형식이면 그대로 쓰고, 아니면 새로 만든다.
+    요청 중에 만든 백그라운드 작업(asyncio 태스크)도 같은 ID를 이어받는다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers", [])).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_id.reset(token)
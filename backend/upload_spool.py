@@ -0,0 +1,502 @@
+"""
+Upload Spool - 업로드 파일을 청크 단위로 디스크에 스풀링
+
+요청 본문을 통째로 메모리에 올리지 않고 청크 단위로 스풀 파일에 쓰면서
+SHA-256을 증분 계산하고, 크기 제한도 스트리밍 도중에 검사한다.
+multipart 본문은 MultipartReader로 request.stream()에서 바로 파트별로 읽으므로
+프레임워크의 임시 파일을 거치지 않고 한 번만 디스크에 쓴다 (파일 쓰기/해시는 executor에서 실행).
+오프셋 기반 PUT으로 이어 올리기(resumable)를 지원하며, 세션 정보는 디스크에 남아
+서버가 재시작되어도 마지막으로 받은 오프셋부터 계속할 수 있다.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import zlib
+import tarfile
+import zipfile
+from collections import deque
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator, BinaryIO, Iterable, List, Tuple
+
+from structured_logging import get_logger
+
+# python-multipart (0.0.13부터 패키지 이름이 python_multipart)
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = get_logger("upload_spool")
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class UploadTooLarge(ValueError):
+    """스트리밍 도중 크기 제한 초과"""
+
+
+class ArchiveTooLarge(UploadTooLarge):
+    """압축 파일의 압축 해제 크기 합계 또는 압축률이 제한을 넘음 (압축 폭탄 방지)"""
+
+
+class ArchiveError(ValueError):
+    """손상되었거나 읽을 수 없는 압축 파일"""
+
+
+class MultipartFormError(ValueError):
+    """multipart/form-data 본문이 아니거나 형식이 잘못됨"""
+
+
+class UploadOffsetMismatch(ValueError):
+    """이어 올리기 요청의 오프셋이 서버에 저장된 크기와 다름"""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"오프셋 불일치: 서버 {expected}, 요청 {received}")
+        self.expected = expected
+        self.received = received
+
+
+class SpooledUpload:
+    """디스크에 스풀된 업로드 파일 (경로, 크기, SHA-256)"""
+
+    def __init__(self, path: Path, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+
+
+class MultipartPart:
+    """multipart 본문의 파트 하나 (stream()으로 데이터를 한 번만 읽을 수 있음)"""
+
+    def __init__(self, reader: "MultipartReader", name: str, filename: Optional[str]):
+        self.name = name
+        self.filename = filename
+        self._reader = reader
+        self.done = False
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        while not self.done:
+            kind, data = await self._reader._next_event()
+            if kind == "data":
+                yield data
+            elif kind == "end":
+                self.done = True
+            else:
+                raise MultipartFormError("파트가 끝나기 전에 다음 파트가 시작되었습니다")
+
+    async def skip(self):
+        """읽지 않은 나머지 데이터 버리기"""
+        async for _ in self.stream():
+            pass
+
+
+class MultipartReader:
+    """
+    multipart/form-data 요청 본문을 파트 단위로 스트리밍 (Starlette의 폼 파싱/임시 파일 대신)
+
+    본문 청크를 파서에 넣을 때마다 생긴 이벤트를 큐에 쌓고, parts()/MultipartPart.stream()이
+    필요한 만큼만 본문을 당겨 읽는다. 파트 데이터를 다 읽지 않고 다음 파트로 넘어가면 나머지는 버린다.
+    """
+
+    def __init__(self, content_type: str, chunks: AsyncIterator[bytes]):
+        media_type, options = parse_options_header(content_type or "")
+        boundary = options.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise MultipartFormError("multipart/form-data 요청이 아닙니다")
+
+        self._chunks = chunks.__aiter__()
+        self._events: deque = deque()
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._finished = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": lambda data, start, end: self._events.append(("data", bytes(data[start:end]))),
+            "on_part_end": lambda: self._events.append(("end", None)),
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": lambda: self._events.append(("headers", dict(self._headers))),
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    async def _next_event(self) -> Tuple[str, Any]:
+        while not self._events:
+            if self._finished:
+                raise MultipartFormError("본문이 파트 중간에 끝났습니다")
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._parser.finalize()
+                self._finished = True
+                continue
+            if chunk:
+                self._parser.write(chunk)
+        return self._events.popleft()
+
+    async def parts(self) -> AsyncIterator[MultipartPart]:
+        """파트를 순서대로 반환 (이전 파트의 읽지 않은 데이터는 건너뜀)"""
+        part: Optional[MultipartPart] = None
+        while True:
+            if part is not None and not part.done:
+                await part.skip()
+            try:
+                kind, headers = await self._next_event()
+            except MultipartFormError:
+                # 파트 사이에서 본문이 끝나면 정상 종료
+                return
+            if kind != "headers":
+                continue
+            _, options = parse_options_header(headers.get(b"content-disposition", b""))
+            filename = options.get(b"filename")
+            part = MultipartPart(
+                self,
+                options.get(b"name", b"").decode("utf-8", errors="replace"),
+                filename.decode("utf-8", errors="replace") if filename is not None else None
+            )
+            yield part
+
+
+class _UploadSession:
+    def __init__(self, upload_id: str, filename: str, total_size: Optional[int],
+                 part_path: Path, created_at: float):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.total_size = total_size
+        self.part_path = part_path
+        self.created_at = created_at
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.lock = asyncio.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "total_size": self.total_size,
+            "offset": self.offset,
+            "created_at": self.created_at
+        }
+
+
+class UploadSpool:
+    """청크 스트리밍 업로드 + 오프셋 기반 이어 올리기"""
+
+    def __init__(
+        self,
+        spool_dir: Path,
+        max_bytes: int = 100 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        session_ttl: float = 24 * 3600
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        # 이어 올리기 세션(.part + .json)은 일반 스풀 파일과 섞이지 않도록 하위 폴더에 보관
+        self.session_dir = self.spool_dir / "sessions"
+        self.session_dir.mkdir(exist_ok=True)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+
+        self._sessions: Dict[str, _UploadSession] = {}
+        self._recover_sessions()
+
+    # ==================== 공통 ====================
+
+    @staticmethod
+    def _write_chunk(f, hasher, chunk: bytes):
+        hasher.update(chunk)
+        f.write(chunk)
+
+    async def _write_stream(self, chunks: AsyncIterator[bytes], f, hasher, written: int,
+                            limit: int) -> int:
+        """
+        청크를 chunk_size 단위로 모아 파일에 쓰고 해시 갱신 (쓰기/해시는 executor에서 실행)
+
+        제한을 넘는 청크는 쓰기 전에 중단하며, 중단되어도 그 전까지 받은 데이터는 파일에 쓴다.
+        """
+        loop = asyncio.get_running_loop()
+        pending = bytearray()
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > limit:
+                    raise UploadTooLarge(f"파일 크기는 {self.max_bytes // (1024 * 1024)}MB 이하여야 합니다")
+                pending += chunk
+                if len(pending) >= self.chunk_size:
+                    data, pending = bytes(pending), bytearray()
+                    await loop.run_in_executor(None, self._write_chunk, f, hasher, data)
+        except Exception:
+            if pending:
+                await loop.run_in_executor(None, self._write_chunk, f, hasher, bytes(pending))
+            raise
+        if pending:
+            await loop.run_in_executor(None, self._write_chunk, f, hasher, bytes(pending))
+        return written
+
+    async def receive(self, chunks: AsyncIterator[bytes], suffix: str = "") -> SpooledUpload:
+        """
+        본문 청크 스트림(MultipartPart.stream() 등)을 스풀 파일에 저장
+
+        메모리에는 한 번에 청크 하나만 올라가고, 크기 제한은 받는 도중에 검사한다.
+        """
+        path = self.spool_dir / f"{uuid.uuid4().hex}{suffix}"
+        hasher = hashlib.sha256()
+        try:
+            with open(path, 'wb') as f:
+                size = await self._write_stream(chunks, f, hasher, 0, self.max_bytes)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return SpooledUpload(path, size, hasher.hexdigest())
+
+    def spool_fileobj(self, fileobj: BinaryIO, suffix: str = "",
+                      budget: Optional[int] = None) -> SpooledUpload:
+        """
+        동기 파일 객체(압축 파일 항목 등)를 청크 단위로 스풀 (executor에서 호출)
+
+        budget이 주어지면 그보다 많이 읽히는 순간 ArchiveTooLarge로 중단한다.
+        """
+        path = self.spool_dir / f"{uuid.uuid4().hex}{suffix}"
+        hasher, size = hashlib.sha256(), 0
+        try:
+            with open(path, 'wb') as f:
+                for chunk in iter(lambda: fileobj.read(self.chunk_size), b""):
+                    size += len(chunk)
+                    if budget is not None and size > budget:
+                        raise ArchiveTooLarge("압축 해제 크기 합계가 제한을 넘습니다")
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"파일 크기는 {self.max_bytes // (1024 * 1024)}MB 이하여야 합니다")
+                    hasher.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return SpooledUpload(path, size, hasher.hexdigest())
+
+    def expand_archive(self, archive: SpooledUpload, allowed_extensions: Iterable[str],
+                       max_files: int = 1000, max_total_bytes: int = 500 * 1024 * 1024,
+                       max_ratio: float = 100.0) -> List[Tuple[str, Any]]:
+        """
+        zip/tar 압축 파일의 항목을 하나씩 스풀 파일로 풀기 (executor에서 호출)
+
+        항목은 스트리밍으로 풀리며 항목별 크기 제한(max_bytes)이 적용된다.
+        압축 해제 크기 합계가 max_total_bytes를 넘거나, zip 항목의 압축률(file_size / compress_size)이
+        max_ratio를 넘으면 이미 푼 항목까지 지우고 ArchiveTooLarge를 던진다.
+        zip의 선언 크기는 풀기 전에 검사하지만 거짓일 수 있으므로 실제로 읽은 바이트로도 제한한다.
+
+        Raises:
+            ArchiveTooLarge: 압축 해제 크기 합계 또는 압축률 초과
+            ArchiveError: 손상되었거나 읽을 수 없는 압축 파일
+
+        Returns:
+            (항목 이름, SpooledUpload 또는 건너뛴 이유 문자열) 목록
+        """
+        allowed = {ext.lower() for ext in allowed_extensions}
+        entries: List[Tuple[str, Any]] = []
+        total = 0
+
+        def add(name: str, open_entry):
+            nonlocal total
+            base = os.path.basename(name)
+            ext = os.path.splitext(base)[1].lower()
+            if not base or base.startswith('.') or '__MACOSX' in name:
+                return
+            if len(entries) >= max_files:
+                entries.append((name, f"압축 파일 항목은 최대 {max_files}개까지 처리합니다"))
+                return
+            if ext not in allowed:
+                entries.append((name, f"지원하지 않는 파일 형식: {ext}"))
+                return
+            try:
+                with open_entry() as fileobj:
+                    spooled = self.spool_fileobj(fileobj, ext, budget=max_total_bytes - total)
+            except ArchiveTooLarge:
+                raise
+            except UploadTooLarge as e:
+                entries.append((name, str(e)))
+                return
+            total += spooled.size
+            entries.append((base, spooled))
+
+        def check_zip(zf: zipfile.ZipFile):
+            infos = [info for info in zf.infolist() if not info.is_dir()]
+            declared = sum(info.file_size for info in infos)
+            if declared > max_total_bytes:
+                raise ArchiveTooLarge(
+                    f"압축 해제 크기 합계는 {max_total_bytes // (1024 * 1024)}MB 이하여야 합니다"
+                )
+            for info in infos:
+                # 작은 항목은 압축률이 높아도 무해하므로 청크 크기 이상만 검사
+                if info.file_size > self.chunk_size and info.file_size > max_ratio * max(info.compress_size, 1):
+                    raise ArchiveTooLarge(f"압축률이 비정상적으로 높은 항목: {info.filename}")
+            return infos
+
+        try:
+            if zipfile.is_zipfile(archive.path):
+                with zipfile.ZipFile(archive.path) as zf:
+                    for info in check_zip(zf):
+                        add(info.filename, lambda info=info: zf.open(info))
+            else:
+                # 스트림 모드: 항목 순서대로 한 번만 읽음
+                with tarfile.open(archive.path, mode="r|*") as tf:
+                    for member in tf:
+                        if member.isfile():
+                            add(member.name, lambda member=member: tf.extractfile(member))
+        except BaseException as e:
+            for _, entry in entries:
+                if isinstance(entry, SpooledUpload):
+                    entry.discard()
+            if isinstance(e, (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError)):
+                raise ArchiveError(f"압축 파일을 읽을 수 없습니다: {e}") from e
+            raise
+        return entries
+
+    # ==================== 이어 올리기 세션 ====================
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.session_dir / f"{upload_id}.json"
+
+    def _save_meta(self, session: _UploadSession):
+        tmp_path = self._meta_path(session.upload_id).with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(session.to_dict(), ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self._meta_path(session.upload_id))
+
+    def _recover_sessions(self):
+        """재시작 시 진행 중이던 세션 복구 (해시는 이미 받은 부분을 한 번 다시 읽어 복원)"""
+        for meta_path in self.session_dir.glob("*.json"):
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            except (json.JSONDecodeError, OSError):
+                continue
+            part_path = self.session_dir / f"{meta['upload_id']}.part"
+            if not part_path.exists():
+                meta_path.unlink(missing_ok=True)
+                continue
+
+            session = _UploadSession(meta['upload_id'], meta['filename'], meta.get('total_size'),
+                                     part_path, meta['created_at'])
+            session.hasher, session.offset = self._rehash(part_path)
+            self._sessions[session.upload_id] = session
+            logger.info("업로드 세션 복구", extra={"upload_id": session.upload_id, "offset": session.offset})
+
+    def _expire_sessions(self):
+        now = time.time()
+        for upload_id in [uid for uid, s in self._sessions.items() if now - s.created_at > self.session_ttl]:
+            self.abort(upload_id)
+
+    def create_session(self, filename: str, total_size: Optional[int] = None) -> Dict[str, Any]:
+        """이어 올리기 세션 생성"""
+        if total_size is not None and total_size > self.max_bytes:
+            raise UploadTooLarge(f"파일 크기는 {self.max_bytes // (1024 * 1024)}MB 이하여야 합니다")
+        self._expire_sessions()
+
+        upload_id = uuid.uuid4().hex
+        session = _UploadSession(upload_id, filename, total_size,
+                                 self.session_dir / f"{upload_id}.part", time.time())
+        session.part_path.touch()
+        self._sessions[upload_id] = session
+        self._save_meta(session)
+        return session.to_dict()
+
+    def get_session(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(upload_id)
+        return session.to_dict() if session else None
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        offset 위치부터 본문을 이어 쓰기
+
+        offset은 서버가 지금까지 받은 크기와 같아야 한다. 전송 도중 연결이 끊겨도
+        그때까지 받은 데이터는 유지되므로 클라이언트는 세션을 다시 조회해 이어서 보내면 된다.
+        """
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+
+        async with session.lock:
+            if offset != session.offset:
+                raise UploadOffsetMismatch(session.offset, offset)
+
+            limit = self.max_bytes if session.total_size is None else min(self.max_bytes, session.total_size)
+            hasher = session.hasher.copy()
+            try:
+                with open(session.part_path, 'r+b') as f:
+                    f.seek(session.offset)
+                    f.truncate()
+                    try:
+                        await self._write_stream(chunks, f, hasher, session.offset, limit)
+                    finally:
+                        # 연결이 끊기거나 제한을 넘어도 그때까지 온전히 쓴 청크는 확정
+                        session.offset = f.tell()
+                        session.hasher = hasher
+            except OSError:
+                session.hasher, session.offset = self._rehash(session.part_path)
+                raise
+            finally:
+                self._save_meta(session)
+            return session.to_dict()
+
+    def _rehash(self, part_path: Path) -> tuple:
+        hasher, size = hashlib.sha256(), 0
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                hasher.update(chunk)
+                size += len(chunk)
+        return hasher, size
+
+    async def complete(self, upload_id: str) -> tuple[SpooledUpload, str]:
+        """
+        세션 종료 후 스풀된 파일과 원래 파일명 반환
+
+        total_size가 선언된 세션은 전부 받기 전에는 완료할 수 없다.
+        받은 .part 파일은 원래 확장자를 가진 스풀 파일로 옮긴다
+        (업로드 시 MIME 타입 추정과 로컬 인덱스의 텍스트 추출이 확장자를 보기 때문).
+        """
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+
+        async with session.lock:
+            if session.total_size is not None and session.offset != session.total_size:
+                raise UploadOffsetMismatch(session.total_size, session.offset)
+            path = self.spool_dir / f"{upload_id}{os.path.splitext(session.filename)[1].lower()}"
+            os.replace(session.part_path, path)
+            self._sessions.pop(upload_id, None)
+            self._meta_path(upload_id).unlink(missing_ok=True)
+            return SpooledUpload(path, session.offset, session.hasher.hexdigest()), session.filename
+
+    def abort(self, upload_id: str) -> bool:
+        """세션과 받은 데이터 삭제"""
+        session = self._sessions.pop(upload_id, None)
+        if session is None:
+            return False
+        session.part_path.unlink(missing_ok=True)
+        self._meta_path(upload_id).unlink(missing_ok=True)
+        return True
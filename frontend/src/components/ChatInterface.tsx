@@ -81,9 +81,19 @@ export default function ChatInterface({ characterId, character, onCharacterUpdat
         const formData = new FormData()
         formData.append('file', currentFile)
 
-        await axios.post('http://localhost:8000/api/upload', formData, {
+        const upload = await axios.post('http://localhost:8000/api/upload', formData, {
           headers: { 'Content-Type': 'multipart/form-data' }
         })
+
+        // 인덱싱은 백그라운드 작업으로 진행되므로 완료될 때까지 상태 확인
+        let job = upload.data
+        while (job.status !== 'completed' && job.status !== 'failed') {
+          await new Promise(resolve => setTimeout(resolve, 1000))
+          job = (await axios.get(`http://localhost:8000/api/jobs/${upload.data.job_id}`)).data
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error)
+        }
       }
 
       const response = await axios.post(`http://localhost:8000/api/character/${characterId}/chat`, {